@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the rate of attribute reads on document objects, which are resolved
+from the JSON by models.ResponseObject.__getattr__.
+
+For comparison the previous lookup, which built the list of fields on every
+read and processed object fields (e.g. authors) on every read, is also timed.
+"""
+
+import sys
+from timeit import default_timer as ctime
+
+sys.path.append('..')
+
+from mendeley import models
+from library_data import make_documents
+
+N_DOCS = 10000
+ATTRIBUTES = ['title', 'year', 'source', 'abstract', 'file_attached']
+OBJECT_ATTRIBUTES = ['authors', 'identifiers']
+N_READS = 5
+
+
+class ListLookupDocument(models.ClientDocument):
+    """
+    The lookup used before field sets were precomputed.
+    """
+
+    def __getattr__(self, name):
+        if name in self.fields():
+            value = self.json.get(name)
+            if value is None:
+                return None
+            elif name in self.object_fields:
+                return self.object_fields[name](value)
+            else:
+                return value
+        else:
+            raise AttributeError(name)
+
+
+def time_reads(docs, attributes):
+    """
+    Returns reads per second
+    """
+    t1 = ctime()
+    for doc in docs:
+        for i in range(N_READS):
+            for name in attributes:
+                getattr(doc, name)
+    return len(docs) * N_READS * len(attributes) / (ctime() - t1)
+
+
+def main():
+    raw = make_documents(N_DOCS)
+
+    print('%12s %18s %18s %8s' % ('attributes', 'old (reads/s)', 'current (reads/s)', 'speedup'))
+    for label, attributes in [('plain', ATTRIBUTES), ('object', OBJECT_ATTRIBUTES)]:
+        old_rate = time_reads([ListLookupDocument(x, None) for x in raw], attributes)
+        new_rate = time_reads([models.ClientDocument(x, None) for x in raw], attributes)
+        print('%12s %18.0f %18.0f %7.1fx' % (label, old_rate, new_rate, new_rate / old_rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the rate (documents per second) at which document JSON is converted
+to a DataFrame by client_library._raw_to_data_frame. For comparison the
+previous implementation, which parsed each value separately using
+Series.apply, is also timed.
+"""
+
+import sys
+from timeit import default_timer as ctime
+
+sys.path.append('..')
+
+import pandas as pd
+
+from mendeley import client_library
+from library_data import make_documents
+
+N_DOCS = [1000, 10000, 100000]
+N_REPEATS = 3
+
+
+def apply_raw_to_data_frame(raw, include_json=True):
+    df = pd.DataFrame(raw)
+    df.set_index('id', inplace=True)
+
+    if include_json:
+        df['json'] = raw
+
+    df['created'] = df['created'].apply(client_library.parse_datetime)
+    df['last_modified'] = df['last_modified'].apply(client_library.parse_datetime)
+    df['issn'] = df['identifiers'].apply(client_library.parse_issn)
+    df['pmid'] = df['identifiers'].apply(client_library.parse_pmid)
+    df['doi'] = df['identifiers'].apply(client_library.parse_doi)
+
+    return df
+
+
+def time_fcn(fcn, raw):
+    """
+    Returns the best rate out of N_REPEATS runs
+    """
+    best = None
+    for i in range(N_REPEATS):
+        t1 = ctime()
+        fcn(raw)
+        elapsed = ctime() - t1
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return len(raw) / best
+
+
+def main():
+    print('%8s %18s %18s %8s' % ('n_docs', 'apply (docs/s)', 'current (docs/s)', 'speedup'))
+    for n in N_DOCS:
+        raw = make_documents(n)
+        old_rate = time_fcn(apply_raw_to_data_frame, raw)
+        new_rate = time_fcn(client_library._raw_to_data_frame, raw)
+        print('%8d %18.0f %18.0f %7.1fx' % (n, old_rate, new_rate, new_rate / old_rate))
+
+
+if __name__ == '__main__':
+    main()
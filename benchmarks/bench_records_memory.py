@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the memory used to hold all documents of a library as:
+
+    raw      - the JSON dicts returned by the API
+    objects  - models.AllDocument objects, after reading their authors
+               and identifiers (which are cached on the object)
+    records  - client.records.DocumentRecord objects
+
+and the memory used by the in-memory representation of a UserLibrary:
+
+    frame    - a DataFrame with a column for each value of the JSON
+    library  - the DataFrame of client_library.DATA_FRAME_COLUMNS held by
+               UserLibrary.docs, plus the records
+
+Memory is measured with tracemalloc, as the increase in allocated memory
+while the documents are created. For the objects the raw JSON they hold is
+included, since that is what a library of document objects keeps in memory.
+"""
+
+import gc
+import sys
+import tracemalloc
+
+sys.path.append('..')
+
+from mendeley import client_library
+from mendeley import models
+from mendeley.client.records import DocumentRecord
+from library_data import make_documents
+
+N_DOCS = [1000, 10000, 100000]
+
+
+def measure(fcn):
+    """
+    Returns (result, bytes allocated)
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = fcn()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def make_objects(n):
+    docs = [models.AllDocument(x, None) for x in make_documents(n)]
+    for doc in docs:
+        doc.authors
+        doc.identifiers
+    return docs
+
+
+def make_records(n):
+    raw = make_documents(n)
+    return [DocumentRecord(x) for x in raw]
+
+
+def make_frame(n):
+    return client_library._raw_to_data_frame(make_documents(n), include_json=False)
+
+
+def make_library(n):
+    raw = make_documents(n)
+    docs = client_library._raw_to_data_frame(raw, include_json=False,
+                                             columns=client_library.DATA_FRAME_COLUMNS)
+    return docs, [DocumentRecord(x) for x in raw]
+
+
+def main():
+    mb = 1024.0 * 1024.0
+    print('%8s %10s %14s %14s %18s' % ('n_docs', 'raw (MB)', 'objects (MB)',
+                                        'records (MB)', 'records vs objects'))
+    for n in N_DOCS:
+        raw, raw_size = measure(lambda: make_documents(n))
+        del raw
+        objects, objects_size = measure(lambda: make_objects(n))
+        del objects
+        # The raw documents are freed once the records have been created
+        records, records_size = measure(lambda: make_records(n))
+        del records
+        print('%8d %10.1f %14.1f %14.1f %17.1fx' % (n, raw_size / mb, objects_size / mb,
+                                                  records_size / mb,
+                                                  objects_size / float(records_size)))
+
+    print('')
+    print('%8s %12s %14s' % ('n_docs', 'frame (MB)', 'library (MB)'))
+    for n in N_DOCS:
+        frame, frame_size = measure(lambda: make_frame(n))
+        del frame
+        library, library_size = measure(lambda: make_library(n))
+        del library
+        print('%8d %12.1f %14.1f' % (n, frame_size / mb, library_size / mb))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Compares decoding a page of documents after the entire response has been
+received with decoding the documents as the response is received
+(stream=True), using a local mock of the Mendeley API.
+
+Peak memory is measured with tracemalloc. The mock server runs in the same
+process, so its allocations (the same for both modes) are included.
+"""
+
+import sys
+import tracemalloc
+from timeit import default_timer as ctime
+
+sys.path.append('..')
+
+from mendeley.mock_server import MockServer
+
+PAGE_SIZES = [500, 5000]
+N_REPEATS = 3
+
+
+def measure(m, page_size, stream):
+    """
+    Returns (best time, largest peak memory in MB)
+    """
+    best_time = None
+    peak = 0
+    for i in range(N_REPEATS):
+        tracemalloc.start()
+        t1 = ctime()
+        doc_set = m.documents.get(limit=page_size, view='all', stream=stream)
+        for json in doc_set.iter_page_json():
+            pass
+        elapsed = ctime() - t1
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        if best_time is None or elapsed < best_time:
+            best_time = elapsed
+
+    return best_time, peak / 1e6
+
+
+def main():
+    print('%10s %10s %12s %14s' % ('page size', 'stream', 'time (s)', 'peak (MB)'))
+    for page_size in PAGE_SIZES:
+        with MockServer(n_documents=page_size, max_page_size=page_size) as server:
+            m = server.get_api()
+            for stream in [False, True]:
+                elapsed, peak = measure(m, page_size, stream)
+                print('%10d %10s %12.3f %14.1f' % (page_size, stream, elapsed, peak))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Measures syncing of the client library, iteration over a DocumentSet and
+construction of document objects, using a local mock of the Mendeley API
+(see mendeley.mock_server).
+
+For each library size the following are timed:
+
+    full sync   - UserLibrary creation, i.e. retrieval of all documents
+    update sync - UserLibrary.sync() after 1% of the documents have been
+                  modified, and a few added, trashed and deleted
+    iteration   - iterating over all documents of a DocumentSet (view='all'),
+                  as objects (with and without prefetching) and as JSON
+                  (iter_json)
+    models      - constructing models.AllDocument from JSON (no requests)
+
+LATENCY is added to every request to approximate requests over a network.
+
+The UserLibrary save files are written to the configured save path, as
+usual, and are removed afterwards.
+"""
+
+import os
+import sys
+from timeit import default_timer as ctime
+
+sys.path.append('..')
+
+from mendeley import models
+from mendeley.client_library import UserLibrary
+from mendeley.mock_server import MockServer, make_documents
+
+N_DOCS = [1000, 10000, 100000]
+LATENCY = 0.02
+PAGE_SIZE = 500
+
+
+def time_full_sync(server):
+    m = server.get_api(user_name='benchmark_%d' % len(server.documents))
+    t1 = ctime()
+    lib = UserLibrary(api=m)
+    return lib, ctime() - t1
+
+
+def time_update_sync(server, lib):
+    n = len(server.documents)
+    server.modify_documents(max(1, n // 100))
+    server.add_documents(10)
+    server.trash_documents(5)
+    server.delete_documents(5)
+
+    t1 = ctime()
+    lib.sync()
+    return ctime() - t1
+
+
+def time_iteration(server, prefetch, as_json=False):
+    m = server.get_api()
+    t1 = ctime()
+    doc_set = m.documents.get(limit=PAGE_SIZE, view='all', prefetch=prefetch)
+    if as_json:
+        n = sum(1 for json in doc_set.iter_json())
+    else:
+        n = sum(1 for doc in doc_set)
+    return n / (ctime() - t1)
+
+
+def time_models(raw):
+    t1 = ctime()
+    for json in raw:
+        models.AllDocument(json, None)
+    return len(raw) / (ctime() - t1)
+
+
+def remove_library(lib):
+    lib.store.close()
+    for file_path in [lib.file_path, lib.store.data_frame_path]:
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+
+
+def main():
+    print('%8s %14s %12s %14s %19s %19s %16s' % ('n_docs', 'full sync (s)', 'update (s)',
+                                                'iter (docs/s)', 'iter pf=2 (docs/s)',
+                                                'iter_json (docs/s)', 'models (docs/s)'))
+    for n in N_DOCS:
+        with MockServer(n_documents=n, latency=LATENCY) as server:
+            lib, full_time = time_full_sync(server)
+            try:
+                update_time = time_update_sync(server, lib)
+            finally:
+                remove_library(lib)
+
+            iter_rate = time_iteration(server, 0)
+            prefetch_rate = time_iteration(server, 2)
+            json_rate = time_iteration(server, 0, as_json=True)
+
+        model_rate = time_models(make_documents(n))
+
+        print('%8d %14.2f %12.2f %14.0f %19.0f %19.0f %16.0f' % (n, full_time, update_time,
+                                                               iter_rate, prefetch_rate,
+                                                               json_rate, model_rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""
+Generation of fake document JSON for the benchmarks. The documents are
+structured like those returned by the API with view='all'. The same documents
+are served by mendeley.mock_server.MockServer.
+"""
+
+from mendeley.mock_server import format_time, make_document, make_documents
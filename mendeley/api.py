@@ -50,20 +50,25 @@ Errors
 """
 
 #Standard Library
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import mimetypes
 from os.path import basename
 from datetime import datetime
 import json
 
-#Third party
-import requests
-
 #Local Imports
 from . import auth
+from . import cache
+from . import json_stream
 from . import models
+from . import transfer
 from . import utils
 from .errors import *
+from .identifiers import NORMALIZERS
+from .transport import Transport
+
+cld = utils.get_list_class_display
 
 PY2 = int(sys.version[0]) == 2
 
@@ -106,18 +111,40 @@ class API(object):
         
     """
 
-    def __init__(self, user_name=None):
+    def __init__(self, user_name=None, transport=None, access_token=None,
+                 catalog_cache=None, response_cache=None):
         """
         Parameters
         ----------
         user_name : string (default None)
             - None : then the default user is loaded via config.DefaultUser
             - 'public' : then the public API is accessed
+        transport : mendeley.transport.Transport (default None)
+            Handles sending requests, including retrying failed requests and
+            rate limiting. If None, a transport with the default retry policy
+            and no rate limiting is used.
+        access_token : auth._Authorization (default None)
+            Authorization to use instead of retrieving one for user_name, e.g.
+            from mendeley.mock_server.MockServer.get_api
+        catalog_cache : mendeley.cache.TTLCache (default None)
+            Cache of catalog entries used by catalog_many. If None, a cache
+            saved in the package's save folder is created when first needed.
+        response_cache : mendeley.cache.ResponseCache (default None)
+            If passed in, GET responses from the endpoints in its policies
+            (e.g. definitions and catalog) are cached and revalidated with
+            conditional requests. If None, responses are not cached.
         
         """
 
-        self.s = requests.Session()
-        if user_name == 'public':
+        if transport is None:
+            transport = Transport()
+        self.transport = transport
+        self.s = transport.session
+        if access_token is not None:
+            self.public_only = user_name == 'public'
+            token = access_token
+            self.user_name = token.user_name
+        elif user_name == 'public':
             self.public_only = True
             token = auth.retrieve_public_authorization()
             self.user_name = 'public'
@@ -132,6 +159,8 @@ class API(object):
         self.access_token = token
         self.last_response = None
         self.last_params = None
+        self.catalog_cache = catalog_cache
+        self.response_cache = response_cache
 
         #TODO: Eventually I'd like to trim this based on user vs public
         self.annotations = Annotations(self)
@@ -146,20 +175,29 @@ class API(object):
         pv = ['public_only', self.public_only, 'user_name', self.user_name]
         return utils.property_values_to_string(pv)
 
-    def make_post_request(self, url, object_fh, params, response_params=None, headers=None, files=None):
-
-        #
-        # http://docs.python-requests.org/en/latest/user/advanced/#streaming-uploads
+    def make_post_request(self, url, object_fh, params, response_params=None, headers=None, files=None,
+                          data=None):
+        """
+        Parameters
+        ----------
+        ...
+        data : file-like object or iterable (default None)
+            If not None, this is sent as the body of the request, in place
+            of the JSON encoded params. This streams the body, see
+            http://docs.python-requests.org/en/latest/user/advanced/#streaming-uploads
+        """
 
         if params is not None:
             return_type = params.pop('_return_type', self.default_return_type)
         else:
             return_type = self.default_return_type
 
-        if files is None:
+        if data is not None:
+            params = data
+        elif files is None:
             params = json.dumps(params)
 
-        r = self.s.post(url, data=params, auth=self.access_token, headers=headers, files=files)
+        r = self.transport.request('POST', url, data=params, auth=self.access_token, headers=headers, files=files)
 
         if not r.ok:
             # if r.status_code != good_status:
@@ -213,10 +251,28 @@ class API(object):
         dev_token = utils.dev_token
         header = {'Development-Token' : dev_token}
 
+        # If streaming, the body is read as it is being decoded, see
+        # handle_return
+        stream = response_params is not None and response_params.get('stream', False)
+
         # NOTE: We make authorization go through the access token. The request
         # will call the access_token prior to sending the request. Specifically
         # the __call__ method is called.
-        r = self.s.get(url, params=params, auth=self.access_token, headers=header)
+        response_cache = self.response_cache
+        ttl = None
+        if response_cache is not None and not stream:
+            ttl = response_cache.get_ttl(url)
+
+        if ttl is None:
+            r = self.transport.request('GET', url, params=params, auth=self.access_token,
+                                       headers=header, stream=stream)
+        else:
+            def send(validators):
+                return self.transport.request('GET', url, params=params, auth=self.access_token,
+                                              headers=dict(header, **validators))
+
+            key = response_cache.get_key(self.user_name, url, params)
+            r = response_cache.get_response(key, ttl, send)
 
         self.last_url = url
         self.last_response = r
@@ -227,7 +283,7 @@ class API(object):
             print(r.text)
             print('')
             # TODO: This should be improved
-            raise Exception('Call failed with status: %d' % (r.status_code))
+            raise CallFailedException('Call failed with status: %d' % (r.status_code))
 
         return self.handle_return(r, return_type, response_params, object_fh)
 
@@ -243,14 +299,14 @@ class API(object):
         if files is None:
             params = json.dumps(params)
 
-        r = self.s.patch(url, data=params, auth=self.access_token, headers=headers, files=files)
+        r = self.transport.request('PATCH', url, data=params, auth=self.access_token, headers=headers, files=files)
 
         if not r.ok:
             # if r.status_code != good_status:
             print(r.text)
             print('')
             # TODO: This should be improved
-            raise Exception('Call failed with status: %d' % (r.status_code))
+            raise CallFailedException('Call failed with status: %d' % (r.status_code))
 
         return self.handle_return(r, return_type, response_params, object_fh)
 
@@ -259,7 +315,16 @@ class API(object):
             if response_params is None:
                 return object_fh(req.json(), self)
             else:
-                return object_fh(req.json(), self, response_params)
+                # The links are passed along with the response rather than
+                # being read from self.last_response, which may have been
+                # replaced by another request (e.g. a prefetching thread)
+                # by the time the object is built.
+                response_params = dict(response_params, links=req.links)
+                if response_params.get('stream', False):
+                    json_data = json_stream.iter_response_array(req)
+                else:
+                    json_data = req.json()
+                return object_fh(json_data, self, response_params)
         elif return_type is 'json':
             return req.json()
         elif return_type is 'raw':
@@ -315,14 +380,158 @@ class API(object):
             url += '/%s/' % id
 
         view = kwargs.get('view')
-        response_params = {'fcn': catalog_fcns[view]}
+        response_params = {'fcn': catalog_fcns[view], 'view': view}
 
         return self.make_get_request(url, models.DocumentSet.create, kwargs, response_params)
 
+    def catalog_many(self, dois=None, pmids=None, issns=None, isbns=None,
+                     arxivs=None, view=None, max_workers=8, use_cache=True,
+                     return_json=False):
+        """
+        Looks up many identifiers in the catalog, making several requests
+        at a time.
+
+        Identifiers are normalized (see identifiers.NORMALIZERS) so that
+        each distinct identifier is only requested once. Results, including
+        identifiers with no matches, are cached in catalog_cache.
+
+        Only one type of identifier may be specified.
+
+        Parameters
+        ----------
+        dois : list
+        pmids : list
+        issns : list
+        isbns : list
+        arxivs : list
+        view : see catalog()
+        max_workers : int (default 8)
+            Maximum number of requests made at the same time.
+        use_cache : bool (default True)
+            If False, all identifiers are requested, although the results
+            are still added to the cache.
+        return_json : bool (default False)
+
+        Returns
+        -------
+        list
+            For each input value, a list of the matching catalog documents
+            (or their JSON if return_json is True). The list is empty if
+            there are no matches.
+
+        Raises
+        ------
+        CallFailedException
+            If any request fails (after any retries).
+
+        Examples
+        --------
+        m = API()
+        results = m.catalog_many(dois=['10.1002/biot.201400046', '10.1038/nrn3241'])
+        """
+        lookup = CatalogLookup(self, view, use_cache, dois=dois, pmids=pmids,
+                               issns=issns, isbns=isbns, arxivs=arxivs)
+
+        if lookup.to_request:
+            n_workers = min(max_workers, len(lookup.to_request))
+            with ThreadPoolExecutor(max_workers=n_workers) as executor:
+                responses = list(executor.map(self._catalog_json, lookup.get_params()))
+            lookup.add_responses(responses)
+
+        return lookup.get_results(return_json)
+
+    def _catalog_json(self, params):
+        return self.make_get_request(BASE_URL + '/catalog', None, params)
+
+    def _get_catalog_cache(self):
+        if self.catalog_cache is None:
+            self.catalog_cache = cache.TTLCache(
+                max_size=10000, file_path=cache.get_default_file_path('catalog'))
+        return self.catalog_cache
+
+
+class CatalogLookup(object):
+    """
+    Tracks the identifiers of a call to catalog_many, which are found in the
+    cache and which need to be requested. The requests themselves are made
+    by the caller (API or AsyncAPI).
+
+    Attributes
+    ----------
+    id_type : string
+        e.g. 'doi'
+    keys : list
+        Normalized identifier of each input value
+    originals : dict
+        Normalized identifier => first input value with that identifier.
+        This is the value that is requested.
+    results : dict
+        Normalized identifier => list of JSON catalog entries
+    to_request : list
+        Normalized identifiers that were not found in the cache
+    """
+
+    def __init__(self, parent, view, use_cache, **kwargs):
+        specified = [(key, value) for key, value in kwargs.items() if value is not None]
+        if len(specified) != 1:
+            raise ValueError('Exactly one type of identifier must be specified')
+        # dois => doi
+        self.id_type = specified[0][0][:-1]
+        values = specified[0][1]
+
+        self.parent = parent
+        self.view = view
+        self.cache = parent._get_catalog_cache()
+
+        normalize = NORMALIZERS[self.id_type]
+        self.keys = [normalize(value) for value in values]
+
+        self.originals = {}
+        for key, value in zip(self.keys, values):
+            self.originals.setdefault(key, value)
+
+        self.results = {}
+        self.to_request = []
+        for key in self.originals:
+            json_data = self.cache.get(self._cache_key(key)) if use_cache else None
+            if json_data is None:
+                self.to_request.append(key)
+            else:
+                self.results[key] = json_data
+
+    def _cache_key(self, key):
+        # The URL keeps results from a mock server separate
+        return '%s|%s|%s|%s' % (BASE_URL, self.view, self.id_type, key)
+
+    def get_params(self):
+        """
+        Returns the request parameters for each identifier in to_request
+        """
+        return [{self.id_type: self.originals[key], 'view': self.view, '_return_type': 'json'}
+                for key in self.to_request]
+
+    def add_responses(self, responses):
+        """
+        Parameters
+        ----------
+        responses : list
+            JSON response for each identifier in to_request
+        """
+        for key, json_data in zip(self.to_request, responses):
+            self.cache.set(self._cache_key(key), json_data)
+            self.results[key] = json_data
+
+    def get_results(self, return_json):
+        if return_json:
+            return [self.results[key] for key in self.keys]
+        fcn = catalog_fcns[self.view]
+        return [[fcn(x, self.parent) for x in self.results[key]] for key in self.keys]
+
 
 class Definitions(object):
     """
-    TODO: These values should presumably only be queried once ...
+    These values rarely change. To avoid requesting them every time, pass a
+    cache.ResponseCache to API.
     """
 
     def __init__(self, parent):
@@ -416,19 +625,183 @@ class Files(object):
         response_params = {'document_id': doc_id}
 
         # Didn't want to deal with make_get_request
-        response = self.parent.s.get(url, params=kwargs, auth=self.parent.access_token)
+        response = self.parent.transport.request('GET', url, params=kwargs, auth=self.parent.access_token)
         json = response.json()[0]
 
         file_id = json['id']
 
         file_url = url + '?id=' + file_id
 
-        file_response = self.parent.s.get(file_url, auth=self.parent.access_token)
+        file_response = self.parent.transport.request('GET', file_url, auth=self.parent.access_token)
 
         return file_id
 
         pass
 
+    def get(self, document_id=None, limit=500, **kwargs):
+        """
+        Returns the information on files, following the pages of results.
+
+        https://api.mendeley.com/apidocs/docs#!/files/getFiles
+
+        Parameters
+        ----------
+        document_id : string (default None)
+            If None, the files of all documents are returned.
+        limit : int (default 500)
+            Number of files per page.
+        **kwargs
+            Other query parameters, e.g. added_since. '_return_type' may
+            be 'json' to return the JSON of each file.
+
+        Returns
+        -------
+        list of models.File
+        """
+        url = BASE_URL + '/files'
+        return_type = kwargs.pop('_return_type', 'object')
+        params = dict(kwargs, document_id=document_id, limit=limit)
+
+        files = []
+        while url is not None:
+            params['_return_type'] = 'response'
+            r = self.parent.make_get_request(url, None, params)
+            files.extend(r.json())
+            url = r.links.get('next', {}).get('url')
+            # The next url includes the query
+            params = {}
+
+        if return_type == 'json':
+            return files
+        return [models.File(x, self.parent) for x in files]
+
+    def upload(self, document_id, source, file_name, content_type='application/pdf',
+               progress=None, chunk_size=transfer.CHUNK_SIZE, _return_type=None):
+        """
+        Attaches a file to a document.
+
+        The content is streamed from the source in blocks rather than being
+        read into memory, using the session of the parent API.
+
+        Parameters
+        ----------
+        document_id : string
+        source : string, bytes, file-like object or iterable of bytes
+            A string is a file path. A file-like object is read from its
+            current position. Iterables (e.g. a generator of chunks) are
+            sent using chunked transfer encoding and the request is not
+            retried on failure, as the content can't be sent again.
+        file_name : string
+            Name of the file in Mendeley, e.g. 'paper.pdf'
+        content_type : string (default 'application/pdf')
+        progress : function (default None)
+            Called as progress(n_bytes_sent, n_bytes_total) as the content is
+            read. n_bytes_total is None for iterables.
+        chunk_size : int
+            Size of the blocks read from file-like objects whose size is
+            unknown.
+        _return_type : {'object','json','raw','response'} (default None)
+            If None the API's default return type is used.
+
+        Returns
+        -------
+        models.File
+            Includes the 'filehash' computed by Mendeley.
+
+        Examples
+        --------
+        m = API()
+        f = m.files.upload(doc_id, '/path/to/paper.pdf', 'paper.pdf')
+        """
+        url, params, headers = self._get_upload_request(document_id, file_name, content_type,
+                                                        _return_type)
+
+        body, opened_file = transfer.get_upload_body(source, progress, chunk_size)
+        try:
+            return self.parent.make_post_request(url, models.File, params,
+                                                 headers=headers, data=body)
+        finally:
+            if opened_file is not None:
+                opened_file.close()
+
+    def _get_upload_request(self, document_id, file_name, content_type, _return_type):
+        """
+        Returns (url, params, headers) for upload()
+        """
+        url = BASE_URL + '/files'
+
+        headers = dict()
+        headers['Content-Type'] = content_type
+        headers['Content-Disposition'] = 'attachment; filename="%s"' % urllib_quote(file_name, safe='')
+        headers['Link'] = '<' + BASE_URL + '/documents/' + document_id + '>; rel="document"'
+
+        params = {}
+        if _return_type is not None:
+            params['_return_type'] = _return_type
+
+        return url, params, headers
+
+    def download(self, file_id, dest, filehash=None, progress=None,
+                 chunk_size=transfer.CHUNK_SIZE, rate_limiter=None):
+        """
+        Downloads the content of a file to disk.
+
+        The content is written in blocks as it is received, to a temporary
+        file that replaces dest once the download is complete.
+
+        Parameters
+        ----------
+        file_id : string or models.File
+            If a File is passed its 'filehash' is used to verify the content.
+        dest : string
+            File path, or an existing directory in which case the file keeps
+            the name it has in Mendeley.
+        filehash : string (default None)
+            SHA-1 of the content. If not None, the content is verified
+            against this.
+        progress : function (default None)
+            Called as progress(n_bytes_received, n_bytes_total).
+            n_bytes_total is None if the server did not send the size.
+        chunk_size : int
+        rate_limiter : transport.TokenBucket (default None)
+            Limits the bandwidth, see transfer.save_response
+
+        Returns
+        -------
+        string
+            Path of the downloaded file
+
+        Raises
+        ------
+        CallFailedException
+        FileHashError
+            The content did not match the filehash. dest is left unchanged.
+
+        Examples
+        --------
+        m = API()
+        f = m.files.upload(doc_id, '/path/to/paper.pdf', 'paper.pdf')
+        m.files.download(f, '/path/to/folder')
+        """
+        url, filehash = self._get_download_url(file_id, filehash)
+
+        # The response is returned before its body has been read
+        r = self.parent.make_get_request(url, None, {'_return_type': 'response'},
+                                         {'stream': True})
+
+        return transfer.save_response(r, dest, filehash, progress, chunk_size, rate_limiter)
+
+    def _get_download_url(self, file_id, filehash):
+        """
+        Returns (url, filehash) for download()
+        """
+        if isinstance(file_id, models.File):
+            if filehash is None:
+                filehash = file_id.json.get('filehash')
+            file_id = file_id.file_id
+
+        return BASE_URL + '/files/' + file_id, filehash
+
     def link_file(self, file, params, file_url=None):
         """
 
@@ -437,6 +810,8 @@ class Files(object):
         file : dict
             Of form {'file' : Buffered Reader for file}
             The buffered reader was made by opening the pdf using open().
+            The raw content of the file and file paths are also accepted,
+            see upload()
         params : dict
             Includes the following:
             'title' = paper title
@@ -448,27 +823,11 @@ class Files(object):
         Returns
         -------
         Object specified by params['_return_type'].
-            Generally models.LinkedFile object
+            Generally models.File object
 
         """
-        base_url = 'https://api.mendeley.com'
-        url = base_url + '/files'
-
-        # Extract info from params
-        title = params['title']
-        doc_id = params['id']
-        object_fh = models.File
-
-        # Get rid of spaces in filename
-        filename = urllib_quote(title) + '.pdf'
-        filename = filename.replace('/', '%2F')
-
-        headers = dict()
-        headers['Content-Type'] = 'application/pdf'
-        headers['Content-Disposition'] = 'attachment; filename=%s' % filename
-        headers['Link'] = '<' + base_url + '/documents/' + doc_id + '>; rel="document"'
-
-        API.make_post_request(API(), url, object_fh, params, headers=headers, files=file)
+        return self.upload(params['id'], file['file'], params['title'] + '.pdf',
+                           _return_type=params.get('_return_type'))
 
     def link_file_from_url(self, file, params, file_url):
         """
@@ -487,26 +846,12 @@ class Files(object):
         Returns
         -------
         Object specified by params['_return_type'].
-            Generally models.LinkedFile object
+            Generally models.File object
 
         """
-        base_url = 'https://api.mendeley.com'
-        url = base_url + '/files'
-
-        # Extract info from params
-        title = params['title']
-        doc_id = params['id']
-        object_fh = models.LinkedFile
-
-        # Get rid of spaces in filename
-        filename = title.replace(' ', '_') + '.pdf'
-
-        headers = dict()
-        headers['Content-Type'] = 'application/pdf'
-        headers['Content-Disposition'] = 'attachment; filename=%s' % filename
-        headers['Link'] = '<' + base_url + '/documents/' + doc_id + '>; rel="document"'
-
-        API.make_post_request(API(), url, object_fh, params, headers=headers, files=file)
+        file_name = params['title'].replace(' ', '_') + '.pdf'
+        return self.upload(params['id'], file['file'], file_name,
+                           _return_type=params.get('_return_type'))
 
     def delete(self):
         # TODO: make this work
@@ -542,7 +887,7 @@ class Trash(object):
         group_id : string
             The id of the group that the document belongs to. If not supplied 
             returns users documents.
-        modified_since : string
+        modified_since : string or datetime
             Returns only documents modified since this timestamp. Should be 
             supplied in ISO 8601 format.
         limit : string or int (default 20)
@@ -562,17 +907,33 @@ class Trash(object):
             - 'created'
             - 'last_modified'
             - 'title'
+        prefetch : int (default 0)
+            Number of pages to request in the background, ahead of the page
+            currently being consumed, when iterating over the returned
+            DocumentSet. See models.DocumentSet.iter_pages
+        stream : bool (default False)
+            If True, the documents of each page are decoded as the response
+            is received, rather than after all of it has been received. See
+            models.DocumentSet.iter_page_json
         """
 
         url = BASE_URL + '/trash'
+        stream = kwargs.pop('stream', False)
         if 'id' in kwargs:
             id = kwargs.pop('id')
             url += '/%s/' % id
+            # Only pages of documents are streamed
+            stream = False
+
+        convert_datetime_to_string(kwargs, 'modified_since')
 
         view = kwargs.get('view')
+        prefetch = kwargs.pop('prefetch', 0)
 
         limit = kwargs.get('limit', 20)
-        response_params = {'fcn': document_fcns[view], 'view': view, 'limit': limit}
+        response_params = {'fcn': document_fcns[view], 'view': view,
+                           'limit': limit, 'prefetch': prefetch,
+                           'stream': stream}
 
         # TODO: When returning deleted_since, the format changes and the fcn
         # called should change
@@ -580,6 +941,54 @@ class Trash(object):
         return self.parent.make_get_request(url, models.DocumentSet.create, kwargs, response_params)
 
 
+class BulkResult(object):
+    """
+    Result of a single item of a bulk request, e.g. Documents.create_many
+
+    Attributes
+    ----------
+    data :
+        The input for the item
+    value :
+        The result of the request (e.g. a models.Document), or None if the
+        request failed.
+    error : Exception or None
+    """
+
+    def __init__(self, data, value=None, error=None):
+        self.data = data
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        pv = ['data', cld(self.data),
+              'value', cld(self.value),
+              'error', None if self.error is None else repr(self.error)]
+        return utils.property_values_to_string(pv)
+
+
+def _run_many(fcn, items, max_workers):
+    """
+    Calls fcn(item) for each item using a pool of threads, returning a
+    BulkResult for each item. Failures are recorded rather than raised.
+    """
+    def run(item):
+        try:
+            return BulkResult(item, fcn(item))
+        except Exception as e:
+            return BulkResult(item, error=e)
+
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(run, items))
+
+
 class Documents(object):
     def __init__(self, parent):
         self.parent = parent
@@ -623,30 +1032,58 @@ class Documents(object):
             - 'created'
             - 'last_modified'
             - 'title'
+        prefetch : int (default 0)
+            Number of pages to request in the background, ahead of the page
+            currently being consumed, when iterating over the returned
+            DocumentSet. See models.DocumentSet.iter_pages
+        stream : bool (default False)
+            If True, the documents of each page are decoded as the response
+            is received, rather than after all of it has been received. See
+            models.DocumentSet.iter_page_json
+        page_url : string
+            URL of a page from a previous request, i.e. a 'next' link. The
+            query is taken from the URL, so only 'view' and 'limit' should
+            also be passed (to describe the returned page).
 
         Examples
         --------
         from mendeley import API
         m = API()
         d = m.documents.get(limit=1)
+
+        # Get the following page later on
+        next_url = d.links['next']['url']
+        d2 = m.documents.get(page_url=next_url, limit=1)
         
         """
 
         url = BASE_URL + '/documents'
+        stream = kwargs.pop('stream', False)
         if 'id' in kwargs:
             id = kwargs.pop('id')
             url += '/%s/' % id
+            # Only pages of documents are streamed
+            stream = False
+
+        page_url = kwargs.pop('page_url', None)
 
         convert_datetime_to_string(kwargs, 'modified_since')
         convert_datetime_to_string(kwargs, 'deleted_since')
 
         view = kwargs.get('view')
+        prefetch = kwargs.pop('prefetch', 0)
 
         if 'deleted_since' in kwargs:
             view = 'deleted'
 
         limit = kwargs.get('limit', 20)
-        response_params = {'fcn': document_fcns[view], 'view': view, 'limit': limit}
+        response_params = {'fcn': document_fcns[view], 'view': view,
+                           'limit': limit, 'prefetch': prefetch,
+                           'stream': stream}
+
+        if page_url is not None:
+            url = page_url
+            kwargs = dict((k, v) for k, v in kwargs.items() if k == '_return_type')
 
         return self.parent.make_get_request(url, models.DocumentSet.create, kwargs, response_params)
 
@@ -689,6 +1126,14 @@ class Documents(object):
             - 'created'
             - 'last_modified'
             - 'title'
+        prefetch : int (default 0)
+            Number of pages to request in the background, ahead of the page
+            currently being consumed, when iterating over the returned
+            DocumentSet. See models.DocumentSet.iter_pages
+        stream : bool (default False)
+            If True, the documents of each page are decoded as the response
+            is received, rather than after all of it has been received. See
+            models.DocumentSet.iter_page_json
 
         Examples
         --------
@@ -699,20 +1144,26 @@ class Documents(object):
         """
 
         url = BASE_URL + '/documents'
+        stream = kwargs.pop('stream', False)
         if 'id' in kwargs:
             id = kwargs.pop('id')
             url += '/%s/' % id
+            # Only pages of documents are streamed
+            stream = False
 
         convert_datetime_to_string(kwargs, 'modified_since')
         convert_datetime_to_string(kwargs, 'deleted_since')
 
         view = kwargs.get('view')
+        prefetch = kwargs.pop('prefetch', 0)
 
         if 'deleted_since' in kwargs:
             view = 'deleted'
 
         limit = kwargs.get('limit', 20)
-        response_params = {'fcn': document_fcns[view], 'view': view, 'limit': limit}
+        response_params = {'fcn': document_fcns[view], 'view': view,
+                           'limit': limit, 'prefetch': prefetch,
+                           'stream': stream}
 
         return self.parent.make_get_request(url, models.DocumentSet.create, kwargs, response_params)
 
@@ -763,6 +1214,43 @@ class Documents(object):
 
         return self.parent.make_post_request(url, models.Document, doc_data, headers=headers)
 
+    def create_many(self, docs_data, max_workers=8, return_json=False):
+        """
+        Creates many documents, making several requests at a time over the
+        connections of the API's transport.
+
+        A failed request doesn't stop the others. Each request is retried
+        as configured by the transport.
+
+        Parameters
+        ----------
+        docs_data : list of dicts
+            See create()
+        max_workers : int (default 8)
+            Maximum number of requests made at the same time. Values above
+            transport.Transport.DEFAULT_POOL_SIZE open extra connections.
+        return_json : bool (default False)
+
+        Returns
+        -------
+        list of BulkResult
+            In the order of docs_data. The value of each successful result
+            is the created models.Document (or its JSON).
+
+        Examples
+        --------
+        m = API()
+        results = m.documents.create_many([{'title': 'Paper 1', 'type': 'journal'},
+                                           {'title': 'Paper 2', 'type': 'journal'}])
+        failed = [x for x in results if not x.ok]
+        """
+        return_type = 'json' if return_json else 'object'
+
+        def create(doc_data):
+            # A copy as the return type is removed from the params
+            return self.create(dict(doc_data, _return_type=return_type))
+
+        return _run_many(create, docs_data, max_workers)
 
     def create_from_file(self, file_path):
         """
@@ -797,15 +1285,44 @@ class Documents(object):
 
         return self.parent.make_patch_request(url, models.Document, new_data, headers=headers)
 
-    def move_to_trash(self, doc_id):
+    def update_many(self, updates, max_workers=8, return_json=False):
+        """
+        Updates many documents, making several requests at a time. See
+        create_many()
+
+        Parameters
+        ----------
+        updates : list of (doc_id, new_data)
+        max_workers : int (default 8)
+        return_json : bool (default False)
 
+        Returns
+        -------
+        list of BulkResult
+            In the order of updates. The value of each successful result is
+            the updated models.Document (or its JSON).
+        """
+        return_type = 'json' if return_json else 'object'
+
+        def update(item):
+            doc_id, new_data = item
+            return self.update(doc_id, dict(new_data, _return_type=return_type))
+
+        return _run_many(update, updates, max_workers)
+
+    def move_to_trash(self, doc_id):
+        """
+        https://api.mendeley.com/apidocs#!/documents/trashDocument
+        """
         url = BASE_URL + '/documents/' + doc_id + '/trash'
 
         headers = dict()
         headers['Content-Type'] = 'application/vnd.mendeley-document.1+json'
 
-        resp =  self.parent.s.post(url, headers=headers, auth = self.parent.access_token)
-        return
+        # The response has no body
+        r = self.parent.transport.request('POST', url, headers=headers, auth=self.parent.access_token)
+        if not r.ok:
+            raise CallFailedException('Call failed with status: %d' % (r.status_code))
 
 
 class MetaData(object):
@@ -0,0 +1,664 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides an asyncio version of mendeley.api.API. The same
+methods are available (documents, trash, folders, files, definitions and
+catalog) but each one returns a coroutine that needs to be awaited.
+
+Requests are made using aiohttp. The HTTP session (and thus its connection
+pool) can be shared between instances, allowing requests for multiple users to
+be in flight at the same time from a single event loop.
+
+General Usage
+-------------
+import asyncio
+from mendeley.async_api import AsyncAPI
+
+async def main():
+    async with AsyncAPI() as m:
+        doc_set = await m.documents.get(limit=500, view='all')
+        async for doc in doc_set:
+            print(doc.title)
+
+asyncio.get_event_loop().run_until_complete(main())
+
+Sharing a connection pool between users
+---------------------------------------
+async def main():
+    async with aiohttp.ClientSession() as session:
+        m1 = AsyncAPI(session=session)
+        m2 = AsyncAPI(user_name='testing', session=session)
+        d1, d2 = await asyncio.gather(m1.documents.get(), m2.documents.get())
+
+Requires
+--------
+aiohttp
+
+See Also
+--------
+mendeley.api
+
+"""
+
+#Standard Library
+import asyncio
+import functools
+import json
+
+#Local Imports
+from . import api
+from . import auth
+from . import models
+from . import transfer
+from . import transport
+from . import utils
+from .api import API, Annotations, Definitions, Documents, Files, Folders, Trash
+from .errors import *
+from .optional import aiohttp
+
+
+class AsyncAPI(API):
+    """
+    Asyncio version of mendeley.api.API
+
+    The methods of API that make requests (e.g. catalog, documents.get) are
+    reused as is. They return the coroutines created by the request methods
+    of this class.
+
+    Attributes
+    ----------
+    default_return_type : {'object','json','raw','response'}
+        This is the default type to return from methods.
+    max_connections : int
+        Maximum number of simultaneous connections when this instance creates
+        its own session.
+    retry_policy : mendeley.transport.RetryPolicy
+    rate_limiter : mendeley.transport.TokenBucket or None
+    last_response :
+    last_params :
+
+    """
+
+    def __init__(self, user_name=None, session=None, max_connections=100,
+                 retry_policy=None, rate_limiter=None, catalog_cache=None,
+                 access_token=None):
+        """
+        Parameters
+        ----------
+        user_name : string (default None)
+            - None : then the default user is loaded via config.DefaultUser
+            - 'public' : then the public API is accessed
+        session : aiohttp.ClientSession (default None)
+            Session to make requests with. If None, a session is created when
+            the first request is made, and closed by close().
+        max_connections : int (default 100)
+        retry_policy : mendeley.transport.RetryPolicy (default None)
+            If None, the default policy is used.
+        rate_limiter : mendeley.transport.TokenBucket (default None)
+            May be shared with other (sync or async) API instances.
+        catalog_cache : mendeley.cache.TTLCache (default None)
+            See API
+        access_token : auth._Authorization (default None)
+            See API
+
+        """
+
+        # NOTE: Retrieving the token is blocking but only happens once
+        if access_token is not None:
+            self.public_only = user_name == 'public'
+            token = access_token
+            self.user_name = token.user_name
+        elif user_name == 'public':
+            self.public_only = True
+            token = auth.retrieve_public_authorization()
+            self.user_name = 'public'
+        else:
+            self.public_only = False
+            token = auth.retrieve_user_authorization(user_name)
+            self.user_name = token.user_name
+
+        self._session = session
+        self._owns_session = session is None
+        self.max_connections = max_connections
+
+        if retry_policy is None:
+            retry_policy = transport.RetryPolicy()
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
+
+        self.default_return_type = 'object'
+
+        self.access_token = token
+        self.last_response = None
+        self.last_params = None
+        self.catalog_cache = catalog_cache
+
+        self.annotations = Annotations(self)
+        self.definitions = Definitions(self)
+        self.documents = _AsyncDocuments(self)
+        self.folders = Folders(self)
+        self.files = _AsyncFiles(self)
+        self.trash = Trash(self)
+
+    @property
+    def s(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        """
+        Closes the session if it was created by this instance.
+        """
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def get_auth_headers(self):
+        """
+        Renewing the token is blocking, so when a renewal is needed it is
+        done in the default executor.
+        """
+        token = self.access_token
+        if token.token_expiring:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, token.get_auth_headers)
+        else:
+            return token.get_auth_headers()
+
+    async def make_request(self, method, url, params=None, data=None, headers=None,
+                           stream=False):
+        """
+        Makes a request and returns the response with the body already read.
+
+        Failed requests are retried according to retry_policy.
+
+        Parameters
+        ----------
+        stream : bool (default False)
+            If True, the body of a successful response is not read. The
+            caller needs to read it (e.g. from response.content) and then
+            release the response.
+
+        Raises
+        ------
+        CallFailedException
+        """
+
+        if headers is None:
+            headers = {}
+        else:
+            headers = dict(headers)
+
+        policy = self.retry_policy
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                wait = self.rate_limiter.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+            # Retrieved on each attempt as the token may expire during
+            # a long wait
+            headers.update(await self.get_auth_headers())
+
+            try:
+                r = await self.s.request(method, url, params=params, data=data, headers=headers)
+                if not stream or r.status >= 400:
+                    try:
+                        await r.read()
+                    finally:
+                        r.release()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if not policy.should_retry(method, attempt) or not _rewind_data(data):
+                    raise
+                wait = policy.get_wait(attempt)
+            else:
+                if r.status < 400 or not policy.should_retry(method, attempt, r.status):
+                    break
+
+                retry_after = transport.get_retry_after(r.headers)
+                wait = policy.get_wait(attempt, retry_after)
+                # As with transport.Transport, a body that can't be sent
+                # again is not retried
+                if wait is None or not _rewind_data(data):
+                    break
+
+                if r.status == 429 and retry_after is not None and \
+                        self.rate_limiter is not None:
+                    self.rate_limiter.pause(retry_after)
+
+            attempt += 1
+            await asyncio.sleep(wait)
+
+        self.last_url = url
+        self.last_response = r
+        self.last_params = params
+
+        if not r.ok:
+            print(await r.text())
+            print('')
+            raise CallFailedException('Call failed with status: %d' % (r.status))
+
+        return r
+
+    async def catalog_many(self, dois=None, pmids=None, issns=None, isbns=None,
+                           arxivs=None, view=None, max_workers=8, use_cache=True,
+                           return_json=False):
+        """
+        See Also
+        --------
+        .api.API.catalog_many
+        """
+        lookup = api.CatalogLookup(self, view, use_cache, dois=dois, pmids=pmids,
+                                   issns=issns, isbns=isbns, arxivs=arxivs)
+
+        if lookup.to_request:
+            semaphore = asyncio.Semaphore(max_workers)
+
+            async def request(params):
+                async with semaphore:
+                    return await self._catalog_json(params)
+
+            responses = await asyncio.gather(*[request(x) for x in lookup.get_params()])
+            lookup.add_responses(responses)
+
+        return lookup.get_results(return_json)
+
+    async def make_get_request(self, url, object_fh, params, response_params=None):
+        """
+        See Also
+        --------
+        .api.API.make_get_request
+        """
+
+        if params is None:
+            params = {}
+        else:
+            params = dict((k, v) for k, v in params.items() if v)
+
+        return_type = params.pop('_return_type', self.default_return_type)
+
+        header = {'Development-Token': utils.dev_token}
+
+        # Only a response that is returned as is can be read by the caller
+        stream = return_type == 'response' and response_params is not None and \
+            response_params.get('stream', False)
+
+        r = await self.make_request('GET', url, params=params, headers=header, stream=stream)
+
+        return await self.handle_return(r, return_type, response_params, object_fh)
+
+    async def make_post_request(self, url, object_fh, params, response_params=None, headers=None,
+                                files=None, data=None):
+
+        if data is None:
+            params, return_type = self._get_body(params, files)
+        else:
+            # Raw content (e.g. an upload) is sent in place of the params
+            return_type = (params or {}).pop('_return_type', self.default_return_type)
+            params = data
+
+        r = await self.make_request('POST', url, data=params, headers=headers)
+
+        return await self.handle_return(r, return_type, response_params, object_fh)
+
+    async def make_patch_request(self, url, object_fh, params, response_params=None, headers=None, files=None):
+
+        params, return_type = self._get_body(params, files)
+
+        r = await self.make_request('PATCH', url, data=params, headers=headers)
+
+        return await self.handle_return(r, return_type, response_params, object_fh)
+
+    def _get_body(self, params, files):
+        """
+        Returns the request body and the return type for post/patch requests.
+        """
+        if params is not None:
+            return_type = params.pop('_return_type', self.default_return_type)
+        else:
+            return_type = self.default_return_type
+
+        if files is None:
+            return json.dumps(params), return_type
+
+        data = aiohttp.FormData()
+        if params is not None:
+            for key, value in params.items():
+                data.add_field(key, str(value))
+        for key, value in files.items():
+            data.add_field(key, value)
+
+        return data, return_type
+
+    async def handle_return(self, req, return_type, response_params, object_fh):
+        if return_type == 'object':
+            object_fh = _get_async_object_fh(object_fh)
+            if response_params is None:
+                return object_fh(await req.json(content_type=None), self)
+            else:
+                response_params = dict(response_params, links=_get_links(req))
+                return object_fh(await req.json(content_type=None), self, response_params)
+        elif return_type == 'json':
+            return await req.json(content_type=None)
+        elif return_type == 'raw':
+            return await req.text()
+        elif return_type == 'response':
+            return req
+        else:
+            raise Exception('No match found for return type')
+
+    def __repr__(self):
+        pv = ['public_only', self.public_only, 'user_name', self.user_name]
+        return utils.property_values_to_string(pv)
+
+
+class AsyncDocumentSet(models.DocumentSet):
+    """
+    DocumentSet returned by AsyncAPI. Iteration over all pages requires
+    'async for'.
+
+    Examples
+    --------
+    doc_set = await m.documents.get(limit=500)
+    async for doc in doc_set:
+        print(doc.title)
+
+    async for page in doc_set.iter_pages(prefetch=2):
+        print(len(page.docs))
+    """
+
+    def __iter__(self):
+        raise TypeError("'async for' is needed to iterate over an AsyncDocumentSet")
+
+    async def __aiter__(self):
+        async for page in self.iter_pages():
+            for single_doc in page.docs:
+                yield single_doc
+
+    async def iter_json(self, prefetch=None):
+        """
+        See Also
+        --------
+        .models.DocumentSet.iter_json
+        """
+        async for page in self.iter_pages(prefetch):
+            for json in page.iter_page_json():
+                yield json
+
+    async def iter_pages(self, prefetch=None):
+        """
+        See Also
+        --------
+        .models.DocumentSet.iter_pages
+        """
+        if prefetch is None:
+            prefetch = self.prefetch
+
+        if prefetch > 0:
+            # As in models._PagePrefetcher, a slot is taken before a page is
+            # requested and returned when the page is consumed
+            pages = asyncio.Queue()
+            slots = asyncio.Semaphore(prefetch)
+            producer = asyncio.ensure_future(self._retrieve_pages(pages, slots))
+            try:
+                yield self
+                while True:
+                    page, error = await pages.get()
+                    slots.release()
+                    if error is not None:
+                        raise error
+                    elif page is None:
+                        return
+                    yield page
+            finally:
+                producer.cancel()
+        else:
+            page = self
+            while page:
+                yield page
+                page = await page.next_page()
+
+    async def _retrieve_pages(self, pages, slots):
+        page = self
+        while page is not None:
+            await slots.acquire()
+            try:
+                page = await page.next_page()
+                pages.put_nowait((page, None))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                page = None
+                pages.put_nowait((None, e))
+
+    async def next_page(self):
+        if 'next' not in self.links:
+            return None
+        else:
+            next_url = self.links['next']['url']
+            return await self.api.make_get_request(next_url, self.__class__, None, self.response_params)
+
+
+class _AsyncDocuments(Documents):
+
+    async def move_to_trash(self, doc_id):
+
+        url = api.BASE_URL + '/documents/' + doc_id + '/trash'
+
+        headers = dict()
+        headers['Content-Type'] = 'application/vnd.mendeley-document.1+json'
+
+        await self.parent.make_request('POST', url, headers=headers)
+
+    async def create_many(self, docs_data, max_workers=8, return_json=False):
+        """
+        See Also
+        --------
+        .api.Documents.create_many
+        """
+        return_type = 'json' if return_json else 'object'
+
+        def create(doc_data):
+            # A copy as the return type is removed from the params
+            return self.create(dict(doc_data, _return_type=return_type))
+
+        return await _run_many(create, docs_data, max_workers)
+
+    async def update_many(self, updates, max_workers=8, return_json=False):
+        """
+        See Also
+        --------
+        .api.Documents.update_many
+        """
+        return_type = 'json' if return_json else 'object'
+
+        def update(item):
+            doc_id, new_data = item
+            return self.update(doc_id, dict(new_data, _return_type=return_type))
+
+        return await _run_many(update, updates, max_workers)
+
+
+async def _run_many(fcn, items, max_workers):
+    """
+    Awaits fcn(item) for each item, with at most max_workers requests in
+    flight, returning an api.BulkResult for each item. Failures are
+    recorded rather than raised. See api._run_many
+    """
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def run(item):
+        async with semaphore:
+            try:
+                return api.BulkResult(item, await fcn(item))
+            except Exception as e:
+                return api.BulkResult(item, error=e)
+
+    return list(await asyncio.gather(*[run(x) for x in items]))
+
+
+class _AsyncFiles(Files):
+
+    async def get_single(self, **kwargs):
+        """
+        Returns the id of the first file matching the query.
+
+        See Also
+        --------
+        .api.Files.get_single
+        """
+        url = api.BASE_URL + '/files'
+
+        # Unlike requests, aiohttp doesn't drop None values
+        params = dict((k, v) for k, v in kwargs.items() if v is not None)
+
+        r = await self.parent.make_request('GET', url, params=params)
+        json = await r.json(content_type=None)
+
+        return json[0]['id']
+
+    async def get(self, document_id=None, limit=500, **kwargs):
+        """
+        See Also
+        --------
+        .api.Files.get
+        """
+        url = api.BASE_URL + '/files'
+        return_type = kwargs.pop('_return_type', 'object')
+        params = dict(kwargs, document_id=document_id, limit=limit)
+
+        files = []
+        while url is not None:
+            params['_return_type'] = 'response'
+            r = await self.parent.make_get_request(url, None, params)
+            files.extend(await r.json(content_type=None))
+            url = _get_links(r).get('next', {}).get('url')
+            # The next url includes the query
+            params = {}
+
+        if return_type == 'json':
+            return files
+        return [models.File(x, self.parent) for x in files]
+
+    async def upload(self, document_id, source, file_name, content_type='application/pdf',
+                     progress=None, chunk_size=transfer.CHUNK_SIZE, _return_type=None):
+        """
+        See Also
+        --------
+        .api.Files.upload
+        """
+        url, params, headers = self._get_upload_request(document_id, file_name, content_type,
+                                                        _return_type)
+
+        body, opened_file = transfer.get_upload_body(source, progress, chunk_size)
+        if hasattr(body, '__len__'):
+            # Otherwise chunked transfer encoding is used
+            headers['Content-Length'] = '%d' % len(body)
+        try:
+            return await self.parent.make_post_request(url, models.File, params, headers=headers,
+                                                       data=_UploadBody(body, chunk_size))
+        finally:
+            if opened_file is not None:
+                opened_file.close()
+
+    async def download(self, file_id, dest, filehash=None, progress=None,
+                       chunk_size=transfer.CHUNK_SIZE, rate_limiter=None):
+        """
+        See Also
+        --------
+        .api.Files.download
+        """
+        url, filehash = self._get_download_url(file_id, filehash)
+
+        r = await self.parent.make_get_request(url, None, {'_return_type': 'response'},
+                                               {'stream': True})
+
+        try:
+            dest = transfer.get_download_path(dest, r.headers, r.url)
+            writer = transfer.DownloadWriter(dest, filehash, progress, r.content_length)
+            try:
+                async for chunk in r.content.iter_chunked(chunk_size):
+                    if rate_limiter is not None:
+                        wait = rate_limiter.reserve(len(chunk))
+                        if wait > 0:
+                            await asyncio.sleep(wait)
+                    writer.write(chunk)
+                writer.finish()
+            except:
+                writer.abort()
+                raise
+        finally:
+            r.release()
+
+        return dest
+
+
+class _UploadBody(object):
+    """
+    Content of an upload (see transfer.get_upload_body), sent by aiohttp as
+    an async iterable. Blocks are read in the default executor so that
+    reading a file doesn't block the event loop.
+    """
+
+    def __init__(self, body, chunk_size):
+        self.body = body
+        self.chunk_size = chunk_size
+
+    def rewind(self):
+        """
+        Returns whether the content can be sent again, see make_request
+        """
+        if not hasattr(self.body, 'seek'):
+            return False
+        self.body.seek(0)
+        return True
+
+    async def __aiter__(self):
+        loop = asyncio.get_event_loop()
+        if hasattr(self.body, 'read'):
+            read = functools.partial(self.body.read, self.chunk_size)
+        else:
+            chunks = iter(self.body)
+            read = functools.partial(next, chunks, b'')
+
+        while True:
+            chunk = await loop.run_in_executor(None, read)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _rewind_data(data):
+    if isinstance(data, _UploadBody):
+        return data.rewind()
+    return True
+
+
+def _get_async_object_fh(object_fh):
+    """
+    Document sets are built as AsyncDocumentSet so that following pages are
+    requested asynchronously.
+    """
+    if object_fh is models.DocumentSet:
+        return AsyncDocumentSet
+    elif object_fh == models.DocumentSet.create:
+        return AsyncDocumentSet.create
+    else:
+        return object_fh
+
+
+def _get_links(req):
+    """
+    Converts the parsed Link header from aiohttp to the format used by
+    requests, i.e. {rel: {'url': url, 'rel': rel}}
+    """
+    return dict((str(rel), {'url': str(link['url']), 'rel': str(rel)})
+                for rel, link in req.links.items())
@@ -23,6 +23,13 @@ import pickle
 import os
 import sys
 import datetime
+import tempfile
+import threading
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
 
 
 #Third Party
@@ -44,6 +51,50 @@ def _print_error(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
 
+#Renewal locks
+#-------------------------------------
+#One lock per user (shared by all authorization objects for that user in this
+#process) so that only one thread renews a token when it expires. These are
+#kept out of the objects since the objects are pickled.
+_renewal_locks = {}
+_renewal_locks_lock = threading.Lock()
+
+def _get_renewal_lock(user_name):
+    with _renewal_locks_lock:
+        if user_name not in _renewal_locks:
+            _renewal_locks[user_name] = threading.Lock()
+        return _renewal_locks[user_name]
+
+
+class _FileLock(object):
+    """
+    Exclusive lock on a file, used to keep multiple processes from renewing
+    the same token at the same time. The lock is released when the file is
+    closed, including if the process exits.
+    """
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.file_path, 'a')
+        if os.name == 'nt':
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if os.name == 'nt':
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self.file.close()
+            self.file = None
+
+
 """
 -------------------------------------------------------------------------------
 These are methods that other modules might want to access directly.
@@ -89,6 +140,19 @@ class _Authorization(AuthBase):
     # - get_file_path()
     # - renew_token_if_necessary()
     
+    Renewal
+    -------
+    Renewal is safe to request from multiple threads (and thus coroutines,
+    see AsyncAPI.get_auth_headers) and processes. Only one thread per user
+    renews the token, the others wait for it and then use the new token.
+    Processes coordinate using a lock file next to the saved credentials,
+    and a process that finds a newer token on disk uses it rather than
+    renewing again.
+
+    Once the token is within BACKGROUND_RENEW_TIME of expiring it is renewed
+    in a background thread, so that requests normally don't wait on
+    renewal.
+
     Attributes
     ----------
     token_expired : 
@@ -111,6 +175,10 @@ class _Authorization(AuthBase):
     #Default value: check if there is less than 1 minute
     RENEW_TIME = datetime.timedelta(minutes = 1) 
     
+    #Tokens expiring within this time are renewed in a background thread,
+    #while the current token continues to be used
+    BACKGROUND_RENEW_TIME = datetime.timedelta(minutes = 5)
+    
     AUTH_URL = 'https://api-oauth2.mendeley.com/oauth/token'   
    
     @staticmethod
@@ -136,14 +204,105 @@ class _Authorization(AuthBase):
       
         return time_diff.total_seconds() < 0 
         
+    @property
+    def token_expiring(self):
+        """
+        Determine if the token has expired or will expire within RENEW_TIME.
+        """
+        
+        return self._expires_within(self.RENEW_TIME)
+        
+    def _expires_within(self, time_delta):
+        return datetime.datetime.now(pytz.utc) + time_delta > self.expires
+        
     def renew_token_if_necessary(self):
       
         """
         Renews the access token if it has expired or is about to expire.
+        
+        If the token expires within BACKGROUND_RENEW_TIME (but not within
+        RENEW_TIME) a background renewal is started and this returns
+        immediately.
         """
       
-        if datetime.datetime.now(pytz.utc) + self.RENEW_TIME > self.expires:
+        if self.token_expiring:
+            with _get_renewal_lock(self.user_name):
+                #Another thread may have renewed the token while we waited
+                self._renew_locked(self.RENEW_TIME)
+        elif self._expires_within(self.BACKGROUND_RENEW_TIME):
+            lock = _get_renewal_lock(self.user_name)
+            #If the lock is held a renewal is already in progress
+            if lock.acquire(False):
+                thread = threading.Thread(target=self._renew_in_background, args=(lock,))
+                thread.daemon = True
+                thread.start()
+                
+    def _renew_in_background(self, lock):
+        try:
+            self._renew_locked(self.BACKGROUND_RENEW_TIME)
+        except Exception as e:
+            #The token will be renewed when a request needs it
+            _print_error("Background renewal of the token for %s failed: %s" % (self.user_name, e))
+        finally:
+            lock.release()
+            
+    def _renew_locked(self, time_delta):
+        """
+        Renews the token if it expires within time_delta. The renewal lock
+        for the user must be held.
+        """
+        if not self._expires_within(time_delta):
+            return
+            
+        lock_path = self.get_lock_path()
+        if lock_path is None:
             self.renew_token()
+            return
+            
+        with _FileLock(lock_path):
+            #Another process may have renewed the token
+            self._load_newer_token()
+            if self._expires_within(time_delta):
+                self.renew_token()
+                
+    def get_lock_path(self):
+        """
+        Path of the file locked while renewing the token, or None if
+        renewal doesn't need to be coordinated with other processes.
+        """
+        return self.get_file_path(self.user_name, create_folder_if_no_exist = True) + '.lock'
+        
+    def _load_newer_token(self):
+        """
+        Replaces the token with the one on disk if the one on disk expires
+        later, i.e. if another process has renewed it.
+        """
+        load_path = self.get_file_path(self.user_name)
+        if not os.path.isfile(load_path):
+            return
+        
+        with open(load_path, 'rb') as f:
+            saved = pickle.load(f)
+            
+        if saved.expires > self.expires:
+            for name in ['access_token', 'token_type', 'refresh_token', 'expires']:
+                if hasattr(saved, name):
+                    setattr(self, name, getattr(saved, name))
+            
+    def get_auth_headers(self):
+        
+        """
+        Returns the headers needed to authorize a request, renewing the token
+        first if necessary.
+        
+        See Also
+        --------
+        .async_api.AsyncAPI
+        """
+        
+        self.renew_token_if_necessary()
+        
+        return {'Authorization': "bearer " + self.access_token}
             
     def __call__(self,r):
         
@@ -160,9 +319,7 @@ class _Authorization(AuthBase):
         """
         #Called before request is sent
           
-        self.renew_token_if_necessary()
-        
-        r.headers['Authorization'] =  "bearer " + self.access_token
+        r.headers.update(self.get_auth_headers())
         
         return r 
                 
@@ -201,10 +358,20 @@ class _Authorization(AuthBase):
         
         """
         Saves the class instance to disk.
+        
+        The file is replaced in a single step, so other processes never
+        load a partially written file.
         """
         save_path = self.get_file_path(self.user_name,create_folder_if_no_exist = True)
-        with open(save_path, "wb") as f:
-            pickle.dump(self,f)
+        save_folder_path = os.path.dirname(save_path)
+        fd, temp_path = tempfile.mkstemp(dir=save_folder_path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(self,f)
+            os.replace(temp_path, save_path)
+        except:
+            os.remove(temp_path)
+            raise
 
 class _PublicAuthorization(_Authorization):
     
@@ -454,8 +621,6 @@ class _UserAuthorization(_Authorization):
             _print_error("------------------------------------")
             #This assumes we are loading from disk ...
             _print_error("The current solution is to delete the saved credentials")
-            import pdb
-            pdb.set_trace()
             raise errors.AuthException('TODO: Fix me, request failed ...')
       
         self.init_json_attributes(r.json())      
@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+Caching of responses from the API.
+
+TTLCache holds a limited number of values in memory, discarding the least
+recently used when full, and optionally writes values to a SQLite file so
+that they are kept between sessions. Values expire after a fixed time, both
+in memory and on disk.
+
+ResponseCache uses a TTLCache to store entire GET responses, along with
+their validators (ETag and Last-Modified). A stored response is used as is
+for a time that depends on the endpoint, after which it is revalidated with
+a conditional request. If the server responds with 304 (Not Modified) the
+stored response is used again.
+
+This is intended for data that rarely changes, such as catalog entries and
+definitions.
+
+See Also
+--------
+mendeley.api.API.catalog_many
+mendeley.api.API.make_get_request
+
+"""
+
+#Standard Library
+from collections import OrderedDict
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+#Third Party Imports
+import requests
+
+#Local Imports
+from . import utils
+
+cld = utils.get_list_class_display
+
+PY2 = int(sys.version[0]) == 2
+
+if PY2:
+    from urllib import urlencode
+    from urlparse import urlparse
+else:
+    from urllib.parse import urlencode, urlparse
+
+DAY = 24 * 60 * 60
+
+DEFAULT_TTL = 7 * DAY
+
+# Seconds a response is used before being revalidated, by path prefix.
+# Responses from other endpoints are not cached.
+DEFAULT_POLICIES = {'/academic_statuses': 7 * DAY,
+                    '/subject_areas': 7 * DAY,
+                    '/document_types': 7 * DAY,
+                    '/identifier_types': 7 * DAY,
+                    '/catalog': DAY}
+
+# Response headers that are stored with the body
+STORED_HEADERS = ['Content-Type', 'ETag', 'Last-Modified', 'Link', 'Mendeley-Count']
+
+
+class TTLCache(object):
+    """
+    Attributes
+    ----------
+    max_size : int
+        Maximum number of values held in memory. See max_file_size for the
+        limit on the number of values on disk.
+    ttl : float
+        Seconds after which a value expires.
+    file_path : string or None
+        SQLite file the values are written to. If None, values are only held
+        in memory.
+    max_file_size : int or None
+        Maximum number of values in the file. When exceeded, the values that
+        were set longest ago are removed. If None, values are only removed
+        from the file once they expire.
+    n_hits : int
+    n_misses : int
+
+    Examples
+    --------
+    cache = TTLCache(max_size=1000, ttl=3600)
+    cache.set('doi:10.1000/test', [{'title': 'Test'}])
+    value = cache.get('doi:10.1000/test')
+    """
+
+    def __init__(self, max_size=1000, ttl=DEFAULT_TTL, file_path=None,
+                 max_file_size=None):
+        """
+        Parameters
+        ----------
+        max_size : int (default 1000)
+        ttl : float (default DEFAULT_TTL)
+        file_path : string (default None)
+        max_file_size : int (default None)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.file_path = file_path
+        self.max_file_size = max_file_size
+        self.n_hits = 0
+        self.n_misses = 0
+
+        # key => (time set, value), most recently used last
+        self.entries = OrderedDict()
+
+        # Lookups are made from worker threads, see API.catalog_many
+        self.lock = threading.RLock()
+
+        if file_path is None:
+            self.db = None
+        else:
+            self.db = sqlite3.connect(file_path, check_same_thread=False)
+            with self.lock, self.db:
+                self.db.execute('CREATE TABLE IF NOT EXISTS cache ('
+                                'key TEXT PRIMARY KEY, time REAL, value TEXT)')
+                self.db.execute('CREATE INDEX IF NOT EXISTS cache_time ON cache (time)')
+                # Expired values would otherwise never be removed
+                self.db.execute('DELETE FROM cache WHERE time < ?',
+                                (time.time() - ttl,))
+
+    def __len__(self):
+        """
+        Number of values in memory.
+        """
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return self._lookup(key) is not None
+
+    def get(self, key, default=None):
+        """
+        Returns the value for key, or default if the key is missing or the
+        value has expired.
+        """
+        entry = self._lookup(key)
+        with self.lock:
+            if entry is None:
+                self.n_misses += 1
+                return default
+            self.n_hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        """
+        Parameters
+        ----------
+        key : string
+        value :
+            Must be JSON serializable if the cache has a file.
+        """
+        now = time.time()
+        with self.lock:
+            self._set_memory(key, (now, value))
+            if self.db is not None:
+                with self.db:
+                    self.db.execute('INSERT OR REPLACE INTO cache (key, time, value) '
+                                    'VALUES (?, ?, ?)', (key, now, json.dumps(value)))
+                    if self.max_file_size is not None:
+                        self.db.execute('DELETE FROM cache WHERE key IN ('
+                                        'SELECT key FROM cache ORDER BY time DESC '
+                                        'LIMIT -1 OFFSET ?)', (self.max_file_size,))
+
+    def remove(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+            if self.db is not None:
+                with self.db:
+                    self.db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.db is not None:
+                with self.db:
+                    self.db.execute('DELETE FROM cache')
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def _lookup(self, key):
+        """
+        Returns (time set, value) or None
+        """
+        expired_time = time.time() - self.ttl
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] >= expired_time:
+                    self.entries.move_to_end(key)
+                    return entry
+                del self.entries[key]
+
+            if self.db is None:
+                return None
+
+            row = self.db.execute('SELECT time, value FROM cache WHERE key = ?',
+                                  (key,)).fetchone()
+            if row is None or row[0] < expired_time:
+                return None
+
+            entry = (row[0], json.loads(row[1]))
+            self._set_memory(key, entry)
+            return entry
+
+    def _set_memory(self, key, entry):
+        entries = self.entries
+        entries[key] = entry
+        entries.move_to_end(key)
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+
+    def __repr__(self):
+        pv = ['max_size', '%d' % self.max_size,
+              'ttl', '%g' % self.ttl,
+              'file_path', self.file_path,
+              'n_entries', '%d' % len(self),
+              'n_hits', '%d' % self.n_hits,
+              'n_misses', '%d' % self.n_misses]
+        return utils.property_values_to_string(pv)
+
+
+class ResponseCache(object):
+    """
+    Cache of GET responses, see the module documentation.
+
+    Attributes
+    ----------
+    policies : dict
+        Path prefix (e.g. '/catalog') => seconds a response is used before
+        it is revalidated. A value of 0 revalidates on every request. When
+        several prefixes match the longest is used.
+    entries : TTLCache
+        Cache key => dict with the body, stored headers, url and the time
+        the response was last received or revalidated.
+    n_fresh : int
+        Number of responses returned from the cache without a request.
+    n_revalidated : int
+        Number of responses returned from the cache after a 304 response.
+
+    Examples
+    --------
+    from mendeley import API
+    from mendeley.cache import ResponseCache
+    m = API(response_cache=ResponseCache())
+    m.definitions.subject_areas()
+    # Not requested again
+    m.definitions.subject_areas()
+    """
+
+    def __init__(self, policies=None, max_size=1000, file_path=None,
+                 max_file_size=10000, max_age=30 * DAY):
+        """
+        Parameters
+        ----------
+        policies : dict (default None)
+            If None, DEFAULT_POLICIES is used.
+        max_size : int (default 1000)
+            Maximum number of responses held in memory.
+        file_path : string (default None)
+            SQLite file the responses are written to, e.g. from
+            get_default_file_path('responses'). If None, responses are only
+            held in memory.
+        max_file_size : int (default 10000)
+            Maximum number of responses in the file.
+        max_age : float (default 30 days)
+            Responses that have not been received or revalidated for this
+            long are discarded rather than revalidated.
+        """
+        if policies is None:
+            policies = DEFAULT_POLICIES
+        self.policies = policies
+        self.entries = TTLCache(max_size=max_size, ttl=max_age, file_path=file_path,
+                                max_file_size=max_file_size)
+        self.n_fresh = 0
+        self.n_revalidated = 0
+
+    def get_ttl(self, url):
+        """
+        Returns the number of seconds responses for url are used before being
+        revalidated, or None if responses for url are not cached.
+        """
+        path = urlparse(url).path.rstrip('/')
+        ttl = None
+        longest = -1
+        for prefix, value in self.policies.items():
+            if path.startswith(prefix) and len(prefix) > longest:
+                ttl = value
+                longest = len(prefix)
+        return ttl
+
+    def get_key(self, user_name, url, params):
+        # Different users may receive different responses
+        return '%s|%s?%s' % (user_name, url, urlencode(sorted(params.items())))
+
+    def get_response(self, key, ttl, send):
+        """
+        Parameters
+        ----------
+        key : string
+            From get_key()
+        ttl : float
+            From get_ttl()
+        send : function
+            Makes the request. It is called with a dict of headers to add
+            to the request (the validators, if any) and returns a
+            requests.Response.
+
+        Returns
+        -------
+        requests.Response
+        """
+        entry = self.entries.get(key)
+        if entry is not None and time.time() - entry['time'] < ttl:
+            self.n_fresh += 1
+            return _to_response(entry)
+
+        headers = {}
+        if entry is not None:
+            stored_headers = entry['headers']
+            if 'ETag' in stored_headers:
+                headers['If-None-Match'] = stored_headers['ETag']
+            if 'Last-Modified' in stored_headers:
+                headers['If-Modified-Since'] = stored_headers['Last-Modified']
+
+        r = send(headers)
+
+        if r.status_code == 304 and entry is not None:
+            entry = dict(entry, time=time.time())
+            self.entries.set(key, entry)
+            self.n_revalidated += 1
+            return _to_response(entry)
+
+        if r.status_code == 200 and 'no-store' not in r.headers.get('Cache-Control', ''):
+            self.entries.set(key, _to_entry(r))
+        return r
+
+    def clear(self):
+        self.entries.clear()
+
+    def close(self):
+        self.entries.close()
+
+    def __repr__(self):
+        pv = ['policies', cld(self.policies),
+              'entries', cld(self.entries),
+              'n_fresh', '%d' % self.n_fresh,
+              'n_revalidated', '%d' % self.n_revalidated]
+        return utils.property_values_to_string(pv)
+
+
+def _to_entry(r):
+    headers = dict((key, r.headers[key]) for key in STORED_HEADERS if key in r.headers)
+    return {'time': time.time(),
+            'url': r.url,
+            'headers': headers,
+            'body': r.text}
+
+
+def _to_response(entry):
+    r = requests.Response()
+    r.status_code = 200
+    r.url = entry['url']
+    r.headers.update(entry['headers'])
+    r.encoding = 'utf-8'
+    r._content = entry['body'].encode('utf-8')
+    # Allows iter_content() on the stored body
+    r._content_consumed = True
+    return r
+
+
+def get_default_file_path(name):
+    """
+    Returns the path of the cache file with the given name, in the package's
+    save folder, e.g. get_default_file_path('catalog')
+    """
+    root_path = utils.get_save_root(['cache'], True)
+    return os.path.join(root_path, name + '.sqlite')
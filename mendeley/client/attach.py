@@ -0,0 +1,454 @@
+# -*- coding: utf-8 -*-
+"""
+Attaching files to many documents at once.
+
+Each item is a (document_id, source) pair, where the source is the path of a
+local file or the URL of a PDF. Items are processed by a pool of worker
+threads, so that downloads from publishers overlap with uploads to Mendeley.
+The number of downloads and uploads in progress at any time are limited
+separately.
+
+Duplicates are skipped rather than uploaded:
+    - a URL that appears in several items is only downloaded once
+    - a file is not attached to a document that already has a file with the
+      same content (SHA-1 'filehash'), either from before or from an
+      earlier item
+
+Failed items are retried a fixed number of times. Before an upload is
+retried the document's files are listed again, as a failed request (e.g. a
+timeout) may still have stored the file. The result of each item
+is appended to a manifest file (JSON lines) as soon as it is known. When the
+pipeline is run again with the same manifest, items that were attached (or
+skipped) are not processed again, so an interrupted run can be resumed.
+
+General Usage
+-------------
+from mendeley import API
+from mendeley.client.attach import AttachmentPipeline
+
+m = API()
+items = [('<document id>', '/path/to/paper.pdf'),
+         ('<document id>', 'https://www.example.com/paper.pdf')]
+pipeline = AttachmentPipeline(m, manifest_path='/path/to/manifest.jsonl')
+results = pipeline.run(items)
+
+See Also
+--------
+mendeley.api.Files.upload
+mendeley.models.Document.add_file
+
+"""
+
+#Standard Library
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+
+#Third Party Imports
+import requests
+
+#Local Imports
+from .. import transfer
+from .. import utils
+from ..optional import MissingModule, rr, pub_objects
+
+fstr = utils.float_or_none_to_string
+
+# Statuses of an AttachResult
+ATTACHED = 'attached'
+DUPLICATE = 'duplicate'     # The document already has a file with the same content
+FAILED = 'failed'
+
+# Items with these statuses are not processed again when resuming
+DONE_STATUSES = (ATTACHED, DUPLICATE)
+
+
+class AttachResult(object):
+    """
+    Result of attaching a single item.
+
+    Attributes
+    ----------
+    document_id : string
+    source : string
+        File path or URL
+    status : {'attached', 'duplicate', 'failed'}
+    file_id : string or None
+        ID of the new file, if attached.
+    filehash : string or None
+    n_attempts : int
+    error : string or None
+        Traceback of the last failed attempt, if failed.
+    resumed : bool
+        True if the result was read from the manifest rather than processed
+        in this run.
+    """
+
+    def __init__(self, document_id, source, status, file_id=None, filehash=None,
+                 n_attempts=0, error=None, resumed=False):
+        self.document_id = document_id
+        self.source = source
+        self.status = status
+        self.file_id = file_id
+        self.filehash = filehash
+        self.n_attempts = n_attempts
+        self.error = error
+        self.resumed = resumed
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['document_id'], data['source'], data['status'],
+                   file_id=data.get('file_id'), filehash=data.get('filehash'),
+                   n_attempts=data.get('n_attempts', 0), error=data.get('error'),
+                   resumed=True)
+
+    def to_dict(self):
+        return {'document_id': self.document_id,
+                'source': self.source,
+                'status': self.status,
+                'file_id': self.file_id,
+                'filehash': self.filehash,
+                'n_attempts': self.n_attempts,
+                'error': self.error,
+                'time': time.time()}
+
+    def __repr__(self):
+        pv = ['document_id', self.document_id,
+              'source', self.source,
+              'status', self.status,
+              'file_id', self.file_id,
+              'filehash', self.filehash,
+              'n_attempts', '%d' % self.n_attempts,
+              'error', None if self.error is None else 'yes',
+              'resumed', self.resumed]
+        return utils.property_values_to_string(pv)
+
+
+class AttachmentPipeline(object):
+    """
+    Attributes
+    ----------
+    api : mendeley.api.API
+    manifest_path : string or None
+    max_downloads : int
+        Maximum number of URLs downloaded at the same time.
+    max_uploads : int
+        Maximum number of files uploaded at the same time.
+    max_attempts : int
+        Number of times an item is tried before it is marked as failed.
+    retry_wait : float
+        Seconds before the first retry of an item, doubled for each retry.
+    resolve_links : bool
+        If True and reference_resolver is installed, the PDF of a URL is
+        retrieved using the publisher's interface, as in
+        Document.add_file(download_file_url=...). Otherwise the URL is
+        downloaded directly.
+    session : requests.Session
+        Used for direct downloads.
+
+    Several runs may be made at the same time with one pipeline. The limits
+    on downloads and uploads are then shared by the runs.
+    """
+
+    def __init__(self, api, manifest_path=None, max_downloads=4, max_uploads=4,
+                 max_attempts=3, retry_wait=1, resolve_links=True, session=None):
+        """
+        Parameters
+        ----------
+        api : mendeley.api.API
+        manifest_path : string (default None)
+            If None, results are not saved and a run can't be resumed.
+        max_downloads : int (default 4)
+        max_uploads : int (default 4)
+        max_attempts : int (default 3)
+        retry_wait : float (default 1)
+        resolve_links : bool (default True)
+        session : requests.Session (default None)
+        """
+        self.api = api
+        self.manifest_path = manifest_path
+        self.max_downloads = max_downloads
+        self.max_uploads = max_uploads
+        self.max_attempts = max_attempts
+        self.retry_wait = retry_wait
+        self.resolve_links = resolve_links
+        if session is None:
+            session = requests.Session()
+        self.session = session
+
+        self.lock = threading.Lock()
+        self._download_semaphore = threading.BoundedSemaphore(max_downloads)
+        self._upload_semaphore = threading.BoundedSemaphore(max_uploads)
+
+    def run(self, items, callback=None):
+        """
+        Attaches the file of each item to its document.
+
+        Parameters
+        ----------
+        items : list of (document_id, source)
+        callback : function (default None)
+            Called with each AttachResult as it becomes known, e.g. to
+            show progress.
+
+        Returns
+        -------
+        list of AttachResult
+            In the order of the items.
+        """
+        items = list(items)
+        done = self.load_manifest()
+
+        results = [None] * len(items)
+        pending = []
+        for i, (doc_id, source) in enumerate(items):
+            result = done.get((doc_id, source))
+            if result is None:
+                pending.append(i)
+            else:
+                results[i] = result
+        if not pending:
+            return results
+
+        state = _RunState([items[i] for i in pending])
+        try:
+            # Filled up front so that a single listing is made rather than
+            # one per document
+            for f in self.api.files.get(_return_type='json'):
+                state.hashes.setdefault(f['document_id'], set()).add(f['filehash'])
+
+            # Enough workers for both stages to run at their limits
+            n_workers = min(len(pending), self.max_downloads + self.max_uploads)
+            with ThreadPoolExecutor(max_workers=n_workers) as executor:
+                futures = dict((executor.submit(self._process, state, items[i][0],
+                                                items[i][1]), i)
+                               for i in pending)
+                for future in as_completed(futures):
+                    result = future.result()
+                    results[futures[future]] = result
+                    if callback is not None:
+                        callback(result)
+        finally:
+            shutil.rmtree(state.temp_dir, ignore_errors=True)
+
+        return results
+
+    def load_manifest(self):
+        """
+        Returns the results of items that are done, from the manifest.
+
+        Returns
+        -------
+        dict
+            (document_id, source) => AttachResult
+        """
+        done = {}
+        if self.manifest_path is None or not os.path.exists(self.manifest_path):
+            return done
+        with open(self.manifest_path) as f:
+            for line in f:
+                try:
+                    result = AttachResult.from_dict(json.loads(line))
+                except ValueError:
+                    # A line that was being written when the run stopped
+                    continue
+                # Failed items are tried again
+                if result.status in DONE_STATUSES:
+                    done[(result.document_id, result.source)] = result
+        return done
+
+    def _save_result(self, result):
+        if self.manifest_path is None:
+            return
+        line = json.dumps(result.to_dict()) + '\n'
+        with self.lock:
+            with open(self.manifest_path, 'a') as f:
+                f.write(line)
+                f.flush()
+
+    #Processing of a single item
+    #--------------------------------------------------------------------------
+    def _process(self, state, doc_id, source):
+        result = AttachResult(doc_id, source, FAILED)
+        # Hashes of the content this item has tried to upload
+        uploaded = set()
+        try:
+            for attempt in range(self.max_attempts):
+                result.n_attempts = attempt + 1
+                try:
+                    self._attach(state, result, uploaded)
+                    result.error = None
+                    break
+                except Exception:
+                    result.error = traceback.format_exc()
+                    if _is_url(source):
+                        self._forget_failed_download(state, source)
+                    if attempt + 1 < self.max_attempts:
+                        time.sleep(self.retry_wait * 2 ** attempt)
+        finally:
+            if _is_url(source):
+                self._release_download(state, source)
+            if result.status == FAILED:
+                # So that other items with the same content can be uploaded
+                with self.lock:
+                    state.hashes.get(doc_id, set()).difference_update(uploaded)
+
+        self._save_result(result)
+        return result
+
+    def _attach(self, state, result, uploaded):
+        doc_id = result.document_id
+        if _is_url(result.source):
+            file_path = self._get_download(state, result.source)
+            file_name = _get_url_file_name(result.source)
+        else:
+            file_path = result.source
+            file_name = os.path.basename(file_path)
+
+        filehash = transfer.compute_filehash(file_path)
+        result.filehash = filehash
+
+        # The hash is reserved before the upload so that the same content
+        # isn't uploaded to a document by two items at once. It stays
+        # reserved by this item until the item is done.
+        with self.lock:
+            hashes = state.hashes.setdefault(doc_id, set())
+            if filehash in hashes and filehash not in uploaded:
+                result.status = DUPLICATE
+                return
+            hashes.add(filehash)
+
+        if filehash in uploaded:
+            # The failed upload may have been stored anyway (e.g. a timeout
+            # after the server received the file)
+            for f in self.api.files.get(document_id=doc_id, _return_type='json'):
+                if f['filehash'] == filehash:
+                    result.file_id = f['id']
+                    result.status = ATTACHED
+                    return
+
+        uploaded.add(filehash)
+        with self._upload_semaphore:
+            f = self.api.files.upload(doc_id, file_path, file_name, _return_type='json')
+
+        result.file_id = f['id']
+        result.status = ATTACHED
+
+    def _get_download(self, state, url):
+        """
+        Returns the path of the downloaded file. Only the first item of a
+        run with a given URL downloads it, the others wait for it.
+        """
+        with self.lock:
+            future = state.downloads.get(url)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                state.downloads[url] = future
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            with self._download_semaphore:
+                file_path = self._download(state, url)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        future.set_result(file_path)
+        return file_path
+
+    def _download(self, state, url):
+        fd, file_path = tempfile.mkstemp(dir=state.temp_dir, suffix='.pdf')
+        os.close(fd)
+
+        if self.resolve_links and not isinstance(rr, MissingModule):
+            pub_dict = rr.resolve_link(url)
+            pub = getattr(pub_objects, pub_dict['object'])(**pub_dict)
+            content = pub.get_pdf_content(url)
+            if content is None:
+                raise IOError('PDF could not be retrieved from %s' % url)
+            with open(file_path, 'wb') as f:
+                f.write(content)
+            return file_path
+
+        r = self.session.get(url, stream=True)
+        if not r.ok:
+            r.close()
+            raise IOError('Download of %s failed with status: %d' % (url, r.status_code))
+        return transfer.save_response(r, file_path)
+
+    def _forget_failed_download(self, state, url):
+        # So that the next attempt downloads the URL again
+        with self.lock:
+            future = state.downloads.get(url)
+            if future is not None and future.done() and future.exception() is not None:
+                del state.downloads[url]
+
+    def _release_download(self, state, url):
+        # The file is removed once no other item needs it
+        with self.lock:
+            state.n_users[url] -= 1
+            if state.n_users[url] > 0:
+                return
+            future = state.downloads.pop(url, None)
+
+        if future is not None and future.done() and future.exception() is None:
+            try:
+                os.remove(future.result())
+            except OSError:
+                pass
+
+    def __repr__(self):
+        pv = ['api', self.api,
+              'manifest_path', self.manifest_path,
+              'max_downloads', '%d' % self.max_downloads,
+              'max_uploads', '%d' % self.max_uploads,
+              'max_attempts', '%d' % self.max_attempts,
+              'retry_wait', fstr(self.retry_wait),
+              'resolve_links', self.resolve_links]
+        return utils.property_values_to_string(pv)
+
+
+class _RunState(object):
+    """
+    State of a single AttachmentPipeline.run(), so that runs made at the
+    same time don't share downloads or temporary files.
+
+    Attributes
+    ----------
+    hashes : dict
+        document_id => set of filehashes of the document's files, including
+        those reserved by items that are being uploaded.
+    downloads : dict
+        URL => Future of the downloaded file path
+    n_users : dict
+        URL => number of items that still need the downloaded file
+    temp_dir : string
+        Folder of the downloaded files, removed at the end of the run.
+    """
+
+    def __init__(self, items):
+        self.hashes = {}
+        self.downloads = {}
+        self.n_users = {}
+        for doc_id, source in items:
+            if _is_url(source):
+                self.n_users[source] = self.n_users.get(source, 0) + 1
+        self.temp_dir = tempfile.mkdtemp(prefix='mendeley_attach_')
+
+
+def _is_url(source):
+    return source.startswith('http://') or source.startswith('https://')
+
+
+def _get_url_file_name(url):
+    name = url.split('?')[0].rstrip('/').split('/')[-1]
+    if not name.lower().endswith('.pdf'):
+        name += '.pdf'
+    return name
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Lookup of documents in the client library by their identifiers (DOI, PMID,
+etc.).
+
+Identifiers are normalized before being indexed, so for example DOIs are
+matched regardless of case (DOIs are case insensitive) or of a leading
+'https://doi.org/'.
+
+See Also
+--------
+mendeley.client_library.Sync
+mendeley.client_library.UserLibrary.get_documents
+
+"""
+
+#Local Imports
+from .. import utils
+from ..identifiers import NORMALIZERS
+
+
+class IdentifierIndex(object):
+    """
+    Maps normalized identifiers to the ids of the documents that have them.
+
+    Attributes
+    ----------
+    lookup : dict
+        Keys are identifier types (see identifiers.NORMALIZERS), values are dicts
+        mapping normalized identifiers to lists of document ids
+    doc_keys : dict
+        Maps each document id to the (type, identifier) pairs that are
+        indexed for it. This allows documents to be removed.
+
+    """
+
+    def __init__(self):
+        self.lookup = dict((key, {}) for key in NORMALIZERS)
+        self.doc_keys = {}
+
+    @classmethod
+    def from_data_frame(cls, df):
+        """
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            Documents parsed by client_library._raw_to_data_frame
+        """
+        self = cls()
+        self.add_data_frame(df)
+        return self
+
+    def __len__(self):
+        return len(self.doc_keys)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_keys
+
+    def add_data_frame(self, df):
+        """
+        Adds (or replaces) the documents in df.
+        """
+        if df is None or len(df) == 0:
+            return
+
+        doc_ids = df.index.tolist()
+        self.remove(doc_ids)
+
+        for id_type, normalize in NORMALIZERS.items():
+            if id_type not in df:
+                continue
+
+            type_lookup = self.lookup[id_type]
+            for doc_id, value in zip(doc_ids, df[id_type].tolist()):
+                # Missing values are '' (or NaN if the column came from
+                # a frame that was missing some of them)
+                if _is_missing(value):
+                    continue
+                key = normalize(str(value))
+                type_lookup.setdefault(key, []).append(doc_id)
+                self.doc_keys.setdefault(doc_id, []).append((id_type, key))
+
+    def add(self, doc_id, identifiers):
+        """
+        Parameters
+        ----------
+        doc_id : string
+        identifiers : dict
+            The 'identifiers' entry of a document's JSON
+        """
+        self.remove([doc_id])
+
+        for id_type, value in identifiers.items():
+            if id_type not in NORMALIZERS or _is_missing(value):
+                continue
+            key = NORMALIZERS[id_type](str(value))
+            self.lookup[id_type].setdefault(key, []).append(doc_id)
+            self.doc_keys.setdefault(doc_id, []).append((id_type, key))
+
+    def remove(self, doc_ids):
+        """
+        Removes documents from the index. Ids that are not in the index are
+        ignored.
+        """
+        for doc_id in doc_ids:
+            keys = self.doc_keys.pop(doc_id, None)
+            if keys is None:
+                continue
+            for id_type, key in keys:
+                ids = self.lookup[id_type][key]
+                ids.remove(doc_id)
+                if len(ids) == 0:
+                    del self.lookup[id_type][key]
+
+    def get_ids(self, id_type, value):
+        """
+        Returns
+        -------
+        list
+            Ids of the documents with the given identifier, in the order in
+            which they were added. The list is empty if there are no matches.
+        """
+        if _is_missing(value):
+            return []
+        key = NORMALIZERS[id_type](str(value))
+        return list(self.lookup[id_type].get(key, []))
+
+    def get_first_ids(self, id_type, values):
+        """
+        Returns the id of the first matching document for each value, or
+        None where there isn't a match.
+        """
+        normalize = NORMALIZERS[id_type]
+        type_lookup = self.lookup[id_type]
+        output = []
+        for value in values:
+            ids = None if _is_missing(value) else type_lookup.get(normalize(str(value)))
+            output.append(ids[0] if ids else None)
+        return output
+
+    def __repr__(self):
+        pv = ['n_documents', '%d' % len(self)]
+        for id_type in sorted(self.lookup):
+            pv += ['n_' + id_type, '%d' % len(self.lookup[id_type])]
+        return utils.property_values_to_string(pv)
+
+
+def _is_missing(value):
+    # value != value is only true for NaN
+    return value is None or value == '' or value != value
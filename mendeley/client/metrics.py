@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+Timings and counts of the work done by a sync of the client library.
+
+Each Sync creates a SyncMetrics, which records the time spent in each phase
+of the sync (spans) along with counters such as the number of requests made
+and the number of documents added. When the sync is done the metrics are
+passed to each registered hook.
+
+Hooks are functions that take a SyncMetrics. The following are provided:
+
+    log_metrics - logs a single line per sync using the logging module
+    PrometheusTextfile - writes the metrics of the last sync of each user in
+                         the Prometheus text format, e.g. for the textfile
+                         collector of the node exporter
+
+General Usage
+-------------
+from mendeley.client import metrics
+
+metrics.add_hook(metrics.log_metrics)
+metrics.add_hook(metrics.PrometheusTextfile('/var/lib/node_exporter/mendeley.prom'))
+metrics.add_hook(lambda m: print(m.to_dict()))
+
+See Also
+--------
+mendeley.client_library.Sync
+
+"""
+
+#Standard Library
+from collections import OrderedDict
+from contextlib import contextmanager
+import logging
+import os
+import tempfile
+import threading
+import time
+from timeit import default_timer as ctime
+
+#Local Imports
+from .. import utils
+
+fstr = utils.float_or_none_to_string
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ['n_requests',       # Includes retries
+            'n_retries',
+            'n_bytes',          # Response bodies, see transport.Transport
+            'n_pages',          # Pages of documents (or trashed documents)
+            'n_docs_parsed',    # Documents converted to rows of Sync.docs
+            'n_docs_added',     # Including documents restored from the trash
+            'n_docs_updated',
+            'n_docs_unchanged', # Returned again but already up to date locally
+            'n_docs_removed']   # Trashed or deleted
+
+_hooks = []
+_hooks_lock = threading.Lock()
+
+
+class SyncMetrics(object):
+    """
+    Attributes
+    ----------
+    user_name : string
+    sync_type : {'full', 'update'}
+    start_time : float
+        time.time() at which the sync started
+    spans : OrderedDict
+        Phase name => seconds. Phases that are run in parallel (e.g. the
+        retrieval steps of an update sync) overlap. 'total' is the duration
+        of the entire sync.
+    counters : OrderedDict
+        Name (see COUNTERS) => value
+    """
+
+    def __init__(self, user_name=None, sync_type=None):
+        self.user_name = user_name
+        self.sync_type = sync_type
+        self.start_time = time.time()
+        self.spans = OrderedDict()
+        self.counters = OrderedDict((x, 0) for x in COUNTERS)
+        # Phases may be run from multiple threads
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name):
+        """
+        Times the enclosed code as the given phase.
+
+        Examples
+        --------
+        with metrics.span('save'):
+            store.save_data_frame(docs, version)
+        """
+        t1 = ctime()
+        try:
+            yield
+        finally:
+            self.add_span(name, ctime() - t1)
+
+    def add_span(self, name, seconds):
+        with self.lock:
+            self.spans[name] = self.spans.get(name, 0) + seconds
+
+    def increment(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def to_dict(self):
+        """
+        Returns a JSON compatible dict of the metrics.
+        """
+        with self.lock:
+            return {'user_name': self.user_name,
+                    'sync_type': self.sync_type,
+                    'start_time': self.start_time,
+                    'spans': dict(self.spans),
+                    'counters': dict(self.counters)}
+
+    def __repr__(self):
+        pv = ['user_name', self.user_name,
+              'sync_type', self.sync_type,
+              'start_time', fstr(self.start_time)]
+        for name, value in self.spans.items():
+            pv += ['time_' + name, fstr(value)]
+        for name, value in self.counters.items():
+            pv += [name, '%d' % value]
+        return utils.property_values_to_string(pv)
+
+
+#Hooks
+#------------------------------------------------------------------------------
+def add_hook(fcn):
+    """
+    Registers a function to be called with the SyncMetrics of every sync.
+    """
+    with _hooks_lock:
+        _hooks.append(fcn)
+
+
+def remove_hook(fcn):
+    with _hooks_lock:
+        _hooks.remove(fcn)
+
+
+def export(metrics):
+    """
+    Passes the metrics to each hook. Errors in a hook are logged rather than
+    raised, so that they don't cause the sync to fail.
+    """
+    with _hooks_lock:
+        hooks = list(_hooks)
+    for fcn in hooks:
+        try:
+            fcn(metrics)
+        except Exception:
+            logger.exception('Sync metrics hook %r failed', fcn)
+
+
+def log_metrics(metrics, level=logging.INFO):
+    """
+    Hook that logs the metrics on a single line.
+    """
+    spans = ' '.join('%s=%0.3fs' % x for x in metrics.spans.items())
+    counters = ' '.join('%s=%d' % x for x in metrics.counters.items())
+    logger.log(level, 'sync user=%s type=%s %s %s', metrics.user_name,
+               metrics.sync_type, spans, counters)
+
+
+def to_prometheus_text(metrics_list):
+    """
+    Returns the metrics in the Prometheus text exposition format.
+
+    Parameters
+    ----------
+    metrics_list : list of SyncMetrics
+        Generally the last sync of each user.
+    """
+    lines = ['# HELP mendeley_sync_phase_seconds Time spent in each phase of the last sync.',
+             '# TYPE mendeley_sync_phase_seconds gauge']
+    for m in metrics_list:
+        for name, value in m.spans.items():
+            lines.append('mendeley_sync_phase_seconds{%s,phase="%s"} %f'
+                         % (_get_labels(m), name, value))
+
+    lines += ['# HELP mendeley_sync_count Counts for the last sync.',
+              '# TYPE mendeley_sync_count gauge']
+    for m in metrics_list:
+        for name, value in m.counters.items():
+            lines.append('mendeley_sync_count{%s,name="%s"} %d'
+                         % (_get_labels(m), name, value))
+
+    lines += ['# HELP mendeley_sync_start_time_seconds Start of the last sync.',
+              '# TYPE mendeley_sync_start_time_seconds gauge']
+    for m in metrics_list:
+        lines.append('mendeley_sync_start_time_seconds{%s} %f' % (_get_labels(m), m.start_time))
+
+    return '\n'.join(lines) + '\n'
+
+
+def _get_labels(metrics):
+    user_name = ('%s' % metrics.user_name).replace('\\', '\\\\').replace('"', '\\"')
+    return 'user="%s",type="%s"' % (user_name, metrics.sync_type)
+
+
+class PrometheusTextfile(object):
+    """
+    Hook that writes the metrics of the last sync of each user to a file,
+    in the Prometheus text format. The file is replaced in a single step so
+    that a partially written file is never read.
+
+    Attributes
+    ----------
+    file_path : string
+    last_metrics : dict
+        user_name => SyncMetrics
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.last_metrics = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, metrics):
+        with self.lock:
+            self.last_metrics[metrics.user_name] = metrics
+            user_names = sorted(self.last_metrics, key=str)
+            text = to_prometheus_text([self.last_metrics[x] for x in user_names])
+
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.file_path)),
+                                             suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+            os.replace(temp_path, self.file_path)
+
+    def __repr__(self):
+        pv = ['file_path', self.file_path,
+              'n_users', '%d' % len(self.last_metrics)]
+        return utils.property_values_to_string(pv)
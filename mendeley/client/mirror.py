@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+Local copies of the files attached to the documents of a library.
+
+Files are stored by content, under their SHA-1 'filehash':
+
+    <root>/objects/ab/ab34...ef.pdf
+
+so that a file attached to several documents is stored (and downloaded)
+once. An index maps the id of each file to its document and hash, which
+makes syncing incremental: only files with ids that are not in the index
+are downloaded. Files of documents that are no longer in the library
+(deleted or in the trash) are removed from the index, and stored files that
+are no longer referenced are deleted.
+
+Downloads run on a pool of threads, optionally sharing a bandwidth limit.
+
+General Usage
+-------------
+from mendeley import client_library
+from mendeley.client.mirror import AttachmentMirror
+
+lib = client_library.UserLibrary()
+mirror = AttachmentMirror(lib, max_workers=4, bytes_per_second=1000000)
+mirror.sync()
+paths = mirror.get_paths('<document id>')
+
+...
+
+lib.sync()
+mirror.sync()
+
+See Also
+--------
+mendeley.api.Files.download
+mendeley.client_library.UserLibrary
+
+"""
+
+#Standard Library
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import tempfile
+import threading
+import traceback
+
+#Local Imports
+from .. import utils
+from ..transport import TokenBucket
+
+cld = utils.get_list_class_display
+
+
+class AttachmentMirror(object):
+    """
+    Attributes
+    ----------
+    library : mendeley.client_library.UserLibrary
+    root_path : string
+    index_path : string
+    index : dict
+        file_id => dict with the document_id, filehash, file_name, mime_type
+        and size of the file. Only files that have been stored are included.
+    max_workers : int
+    rate_limiter : transport.TokenBucket or None
+        Limits the total bandwidth of the downloads.
+    last_sync : dict or None
+        Counts from the last sync, see sync()
+    errors : dict
+        file_id => traceback, for files that could not be downloaded by the
+        last sync. Files listed without a filehash are included with a
+        message, as they can't be stored. These are tried again by the next
+        sync.
+    """
+
+    def __init__(self, library, root_path=None, max_workers=4, bytes_per_second=None):
+        """
+        Parameters
+        ----------
+        library : mendeley.client_library.UserLibrary
+        root_path : string (default None)
+            If None, a folder for the user in the package's save folder is
+            used.
+        max_workers : int (default 4)
+            Maximum number of downloads at the same time.
+        bytes_per_second : float (default None)
+            Total bandwidth of the downloads. If None, this is not limited.
+        """
+        self.library = library
+        if root_path is None:
+            save_name = utils.user_name_to_file_name(library.user_name)
+            root_path = utils.get_save_root(['attachments', save_name], True)
+        self.root_path = root_path
+        self.index_path = os.path.join(root_path, 'index.json')
+        self.max_workers = max_workers
+
+        if bytes_per_second is None:
+            self.rate_limiter = None
+        else:
+            self.rate_limiter = TokenBucket(rate=bytes_per_second)
+
+        self.index = self._load_index()
+        self.last_sync = None
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def get_paths(self, document_id):
+        """
+        Returns the paths of the stored files of a document.
+        """
+        return [self.get_path(x) for x in self.index.values()
+                if x['document_id'] == document_id]
+
+    def get_path(self, file_json):
+        filehash = file_json['filehash']
+        ext = os.path.splitext(file_json.get('file_name') or '')[1].lower()
+        return os.path.join(self.root_path, 'objects', filehash[:2], filehash + ext)
+
+    def sync(self):
+        """
+        Brings the stored files in line with the library. The library itself
+        is not synced, this should generally be done first.
+
+        Returns
+        -------
+        dict
+            - n_files : number of files stored for the library
+            - n_downloaded : number of files downloaded
+            - n_linked : number of new files whose content was already stored
+            - n_removed : number of files removed from the index
+            - n_failed : number of files that could not be downloaded
+        """
+        docs = self.library.docs
+        doc_ids = set() if docs is None or len(docs) == 0 else set(docs.index)
+
+        # Files of documents in the trash are still listed
+        files = [x for x in self.library.api.files.get(_return_type='json')
+                 if x['document_id'] in doc_ids]
+        file_ids = set(x['id'] for x in files)
+
+        removed_ids = [x for x in self.index if x not in file_ids]
+        for file_id in removed_ids:
+            del self.index[file_id]
+
+        # New files, by stored path so that content is only downloaded once
+        self.errors = {}
+        new_files = {}
+        n_linked = 0
+        for file_json in files:
+            if file_json['id'] in self.index:
+                continue
+            if not file_json.get('filehash'):
+                # Files are stored by hash, these are tried again next time
+                self.errors[file_json['id']] = 'File has no filehash'
+                continue
+            path = self.get_path(file_json)
+            if os.path.exists(path):
+                self.index[file_json['id']] = _to_entry(file_json)
+                n_linked += 1
+            else:
+                new_files.setdefault(path, []).append(file_json)
+
+        n_downloaded = 0
+        if new_files:
+            n_workers = min(self.max_workers, len(new_files))
+            with ThreadPoolExecutor(max_workers=n_workers) as executor:
+                for path, ok in zip(new_files, executor.map(self._download, new_files.items())):
+                    if not ok:
+                        continue
+                    n_downloaded += 1
+                    for file_json in new_files[path]:
+                        self.index[file_json['id']] = _to_entry(file_json)
+
+        self._remove_unreferenced()
+        self._save_index()
+
+        self.last_sync = {'n_files': len(self.index),
+                          'n_downloaded': n_downloaded,
+                          'n_linked': n_linked,
+                          'n_removed': len(removed_ids),
+                          'n_failed': len(self.errors)}
+        return self.last_sync
+
+    def _download(self, item):
+        path, files = item
+        file_json = files[0]
+        folder = os.path.dirname(path)
+        if not os.path.isdir(folder):
+            os.makedirs(folder, exist_ok=True)
+        try:
+            self.library.api.files.download(file_json['id'], path,
+                                            filehash=file_json['filehash'],
+                                            rate_limiter=self.rate_limiter)
+        except Exception:
+            with self.lock:
+                for x in files:
+                    self.errors[x['id']] = traceback.format_exc()
+            return False
+        return True
+
+    def _remove_unreferenced(self):
+        paths = set(self.get_path(x) for x in self.index.values())
+        objects_path = os.path.join(self.root_path, 'objects')
+        if not os.path.isdir(objects_path):
+            return
+        for folder in os.listdir(objects_path):
+            folder_path = os.path.join(objects_path, folder)
+            for name in os.listdir(folder_path):
+                path = os.path.join(folder_path, name)
+                if path not in paths:
+                    os.remove(path)
+            if not os.listdir(folder_path):
+                os.rmdir(folder_path)
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def _save_index(self):
+        # Replaced in a single step so that an interrupted write doesn't
+        # lose the index
+        fd, temp_path = tempfile.mkstemp(dir=self.root_path, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(temp_path, self.index_path)
+
+    def __repr__(self):
+        pv = ['library', cld(self.library),
+              'root_path', self.root_path,
+              'index', cld(self.index),
+              'max_workers', '%d' % self.max_workers,
+              'rate_limiter', cld(self.rate_limiter),
+              'last_sync', self.last_sync,
+              'errors', cld(self.errors)]
+        return utils.property_values_to_string(pv)
+
+
+def _to_entry(file_json):
+    return dict((key, file_json.get(key)) for key in
+                ['document_id', 'filehash', 'file_name', 'mime_type', 'size'])
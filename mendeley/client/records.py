@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Compact in-memory representation of the documents in the client library.
+
+A models.Document keeps the full JSON of the document (a dict of dicts and
+lists) along with several other attributes in its __dict__. For a library
+of 100k documents this adds up. A DocumentRecord instead holds a fixed set of
+commonly used values in __slots__. The full document is read from the store
+when needed, see LibraryRecords.get_document()
+
+The records also take the place of the columns of nested JSON (e.g. authors)
+in UserLibrary.docs, which only holds the dates and identifiers of the
+documents. See benchmarks/bench_records_memory.py
+
+See Also
+--------
+mendeley.client_library.UserLibrary.records
+
+"""
+
+#Standard Library
+import sys
+
+#Local Imports
+from .. import models
+from .. import utils
+
+cld = utils.get_list_class_display
+
+if sys.version_info[0] == 2:
+    intern_string = intern
+else:
+    intern_string = sys.intern
+
+
+def _intern(value):
+    return None if value is None else intern_string(value)
+
+
+class DocumentRecord(object):
+    """
+    Summary of a single document.
+
+    Attributes
+    ----------
+    id : string
+    title : string
+    type : string
+    year : int
+    source : string
+    created : string
+        As returned by the API, e.g. '2016-01-01T00:00:00.000Z'
+    last_modified : string
+    authors : tuple of (last_name, first_name) tuples
+    doi : string
+    pmid : string
+    issn : string
+    isbn : string
+    arxiv : string
+    file_attached : bool
+    read : bool
+    starred : bool
+
+    Values missing from the JSON are None.
+    """
+
+    __slots__ = ('id', 'title', 'type', 'year', 'source', 'created',
+                 'last_modified', 'authors', 'doi', 'pmid', 'issn', 'isbn',
+                 'arxiv', 'file_attached', 'read', 'starred')
+
+    # Values taken directly from the JSON
+    _JSON_FIELDS = ('id', 'title', 'year', 'created', 'last_modified',
+                    'file_attached', 'read', 'starred')
+
+    # Values repeated across many documents (as are author names) are
+    # interned so that each value is only stored once
+    _INTERNED_FIELDS = ('type', 'source')
+
+    _IDENTIFIER_FIELDS = ('doi', 'pmid', 'issn', 'isbn', 'arxiv')
+
+    def __init__(self, json):
+        """
+        Parameters
+        ----------
+        json : dict
+            JSON of the document as returned by the API
+        """
+        get = json.get
+        for name in self._JSON_FIELDS:
+            setattr(self, name, get(name))
+
+        for name in self._INTERNED_FIELDS:
+            setattr(self, name, _intern(get(name)))
+
+        identifiers = get('identifiers') or {}
+        for name in self._IDENTIFIER_FIELDS:
+            setattr(self, name, identifiers.get(name))
+
+        authors = get('authors')
+        if authors is None:
+            self.authors = None
+        else:
+            self.authors = tuple((_intern(x.get('last_name')), _intern(x.get('first_name')))
+                                 for x in authors)
+
+    def __repr__(self):
+        pv = []
+        for name in self.__slots__:
+            if name == 'authors':
+                value = 'None' if self.authors is None else '%d authors' % len(self.authors)
+            else:
+                value = getattr(self, name)
+            pv += [name, value]
+        return utils.property_values_to_string(pv)
+
+
+class LibraryRecords(object):
+    """
+    DocumentRecords of all documents in a library, keyed by document id.
+
+    Attributes
+    ----------
+    records : dict
+        Document id => DocumentRecord
+    store : client.store.LibraryStore
+    api : API
+
+    Examples
+    --------
+    records = user_library.records
+    r = records['<document id>']
+    print(r.title, r.doi)
+    doc = records.get_document(r.id)
+    """
+
+    def __init__(self, store, api=None):
+        """
+        Parameters
+        ----------
+        store : client.store.LibraryStore
+            Source of the records, and of the full documents.
+        api : API (default None)
+            Passed to documents created by get_document()
+        """
+        self.store = store
+        self.api = api
+        self.records = dict((x['id'], DocumentRecord(x)) for x in store.iter_raw())
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.records
+
+    def __getitem__(self, doc_id):
+        return self.records[doc_id]
+
+    def __iter__(self):
+        return iter(self.records.values())
+
+    def update(self, new_and_updated=None, removed_ids=None):
+        """
+        Applies the changes found by a sync.
+
+        Parameters
+        ----------
+        new_and_updated : list of dicts
+        removed_ids : list of strings
+        """
+        records = self.records
+        if removed_ids:
+            for doc_id in removed_ids:
+                records.pop(doc_id, None)
+        if new_and_updated:
+            for json in new_and_updated:
+                records[json['id']] = DocumentRecord(json)
+
+    def get_document(self, doc_id):
+        """
+        Returns the full document as a models.AllDocument, from the JSON in
+        the store.
+
+        Raises
+        ------
+        KeyError
+            If the document is not in the library.
+        """
+        json = self.store.get_json(doc_id)
+        if json is None:
+            raise KeyError(doc_id)
+        return models.AllDocument(json, self.api)
+
+    def __repr__(self):
+        pv = ['n_records', '%d' % len(self), 'store', cld(self.store)]
+        return utils.property_values_to_string(pv)
+
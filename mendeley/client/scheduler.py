@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+"""
+Periodic syncing of the client libraries of many users.
+
+SyncScheduler keeps a UserLibrary for each user that is added and syncs it
+every 'interval' seconds. Syncs run on a pool of worker threads. When more
+syncs are due than there are workers, users with a higher priority are
+synced first. All requests share a single rate limiter, so the total rate
+of requests to Mendeley stays within a budget regardless of the number of
+users.
+
+General Usage
+-------------
+from mendeley.client.scheduler import SyncScheduler
+
+scheduler = SyncScheduler(max_workers=4, interval=600, requests_per_second=5)
+scheduler.add_user('user1@example.com', priority=1)
+scheduler.add_user('user2@example.com', interval=3600)
+scheduler.start()
+
+...
+
+print(scheduler.get_state('user1@example.com'))
+scheduler.stop()
+
+Alternatively run_pending() syncs the users that are due and returns once
+they are done, e.g. for use from cron.
+
+See Also
+--------
+mendeley.client_library.UserLibrary
+mendeley.transport.TokenBucket
+
+"""
+
+#Standard Library
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import traceback
+
+#Local Imports
+from .. import utils
+from ..api import API
+from ..client_library import UserLibrary
+from ..transport import TokenBucket, Transport
+
+fstr = utils.float_or_none_to_string
+cld = utils.get_list_class_display
+
+
+class UserSyncState(object):
+    """
+    Scheduling information and results of the last sync for a single user.
+
+    Attributes
+    ----------
+    user_name : string
+    priority : int
+        Users with a higher priority are synced first.
+    interval : float
+        Seconds between the end of a sync and the start of the next one.
+    library : UserLibrary or None
+        None until the first sync, which creates the library.
+    next_sync_time : float
+        time.time() at which the next sync is due
+    is_syncing : bool
+    n_syncs : int
+        Number of successful syncs.
+    n_failures : int
+        Number of failed syncs.
+    last_sync_time : float or None
+        time.time() at which the last successful sync finished
+    last_sync_duration : float or None
+        Seconds taken by the last successful sync.
+    last_sync_type : {'full', 'update'} or None
+    last_changes : dict or None
+        Changes found by the last successful sync:
+            - n_docs : number of documents in the library after the sync
+            - n_new_and_updated : number of new or updated documents
+            - n_removed : number of trashed or deleted documents
+            - n_restored : number of documents restored from the trash
+        For a full sync only n_docs is non-zero.
+    last_error : string or None
+        Traceback of the last failed sync, cleared by a successful sync.
+    """
+
+    def __init__(self, user_name, priority, interval, api=None):
+        self.user_name = user_name
+        self.priority = priority
+        self.interval = interval
+        self.api = api
+        self.library = None
+        self.next_sync_time = time.time()
+        self.is_syncing = False
+        self.n_syncs = 0
+        self.n_failures = 0
+        self.last_sync_time = None
+        self.last_sync_duration = None
+        self.last_sync_type = None
+        self.last_changes = None
+        self.last_error = None
+
+    def __repr__(self):
+        pv = ['user_name', self.user_name,
+              'priority', '%d' % self.priority,
+              'interval', fstr(self.interval),
+              'library', cld(self.library),
+              'next_sync_time', fstr(self.next_sync_time),
+              'is_syncing', self.is_syncing,
+              'n_syncs', '%d' % self.n_syncs,
+              'n_failures', '%d' % self.n_failures,
+              'last_sync_time', fstr(self.last_sync_time),
+              'last_sync_duration', fstr(self.last_sync_duration),
+              'last_sync_type', self.last_sync_type,
+              'last_changes', self.last_changes,
+              'last_error', None if self.last_error is None else 'yes']
+        return utils.property_values_to_string(pv)
+
+
+class SyncScheduler(object):
+    """
+    Attributes
+    ----------
+    max_workers : int
+        Maximum number of syncs run at the same time.
+    interval : float
+        Default seconds between syncs of a user.
+    retry_interval : float
+        Seconds before a failed sync is tried again.
+    rate_limiter : transport.TokenBucket or None
+        Shared by the APIs of all users.
+    states : dict
+        user_name => UserSyncState
+    verbose : bool
+    """
+
+    # Seconds the scheduling thread waits between checks for due syncs when
+    # it isn't woken up by a change
+    POLL_INTERVAL = 1
+
+    def __init__(self, max_workers=4, interval=600, requests_per_second=None,
+                 retry_interval=60, verbose=False):
+        """
+        Parameters
+        ----------
+        max_workers : int (default 4)
+        interval : float (default 600)
+        requests_per_second : float (default None)
+            Total rate of requests for all users. If None, the rate is not
+            limited.
+        retry_interval : float (default 60)
+        verbose : bool (default False)
+            Passed to each UserLibrary
+        """
+        self.max_workers = max_workers
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.verbose = verbose
+
+        if requests_per_second is None:
+            self.rate_limiter = None
+        else:
+            self.rate_limiter = TokenBucket(rate=requests_per_second)
+
+        self.states = {}
+
+        # Guards states and wakes the scheduling thread
+        self.condition = threading.Condition()
+        self.executor = None
+        self._thread = None
+        self._stopping = False
+
+    def add_user(self, user_name=None, priority=0, interval=None, api=None):
+        """
+        Adds a user to be synced. The first sync, which creates the user's
+        UserLibrary, is due immediately.
+
+        Parameters
+        ----------
+        user_name : string (default None)
+            See API
+        priority : int (default 0)
+        interval : float (default None)
+            If None, the scheduler's interval is used.
+        api : API (default None)
+            If passed in this is used instead of creating an API for
+            user_name, e.g. for mendeley.mock_server.MockServer. Its
+            rate limiter is replaced by the scheduler's.
+
+        Returns
+        -------
+        UserSyncState
+        """
+        if interval is None:
+            interval = self.interval
+        if api is not None:
+            user_name = api.user_name
+            if self.rate_limiter is not None:
+                api.transport.rate_limiter = self.rate_limiter
+
+        with self.condition:
+            if user_name in self.states:
+                raise ValueError('User already added: %s' % user_name)
+            state = UserSyncState(user_name, priority, interval, api)
+            self.states[user_name] = state
+            self.condition.notify()
+        return state
+
+    def remove_user(self, user_name):
+        """
+        Stops syncing the user. A sync that is running is allowed to finish.
+        """
+        with self.condition:
+            del self.states[user_name]
+
+    def set_priority(self, user_name, priority):
+        with self.condition:
+            self.states[user_name].priority = priority
+            self.condition.notify()
+
+    def request_sync(self, user_name):
+        """
+        Makes the user's next sync due now.
+        """
+        with self.condition:
+            self.states[user_name].next_sync_time = time.time()
+            self.condition.notify()
+
+    def get_state(self, user_name):
+        return self.states[user_name]
+
+    def get_states(self):
+        """
+        Returns the UserSyncState of each user, ordered by user name.
+        """
+        with self.condition:
+            return [self.states[x] for x in sorted(self.states)]
+
+    #Running
+    #--------------------------------------------------------------------------
+    def start(self):
+        """
+        Starts syncing in a background thread.
+        """
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, wait=True):
+        """
+        Stops starting new syncs. If wait is True, returns once the running
+        syncs have finished.
+        """
+        if self._thread is None:
+            return
+        with self.condition:
+            self._stopping = True
+            self.condition.notify()
+        self._thread.join()
+        self._thread = None
+        self.executor.shutdown(wait=wait)
+        self.executor = None
+
+    def run_pending(self):
+        """
+        Syncs all users whose sync is due, and returns once these syncs are
+        done. This does not use the background thread.
+
+        Returns
+        -------
+        list of UserSyncState
+            The states of the users that were synced.
+        """
+        with self.condition:
+            due = self._get_due_states(len(self.states))
+        if not due:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(due))) as executor:
+            list(executor.map(self._sync, due))
+        return due
+
+    def _run(self):
+        with self.condition:
+            while not self._stopping:
+                n_running = sum(1 for x in self.states.values() if x.is_syncing)
+                for state in self._get_due_states(self.max_workers - n_running):
+                    self.executor.submit(self._sync, state)
+                self.condition.wait(self._get_wait_time())
+
+    def _get_due_states(self, n_max):
+        """
+        Returns up to n_max states that are due, highest priority first, and
+        marks them as syncing. The condition must be held.
+        """
+        if n_max <= 0:
+            return []
+        now = time.time()
+        due = [x for x in self.states.values()
+               if not x.is_syncing and x.next_sync_time <= now]
+        due.sort(key=lambda x: (-x.priority, x.next_sync_time))
+        due = due[:n_max]
+        for state in due:
+            state.is_syncing = True
+        return due
+
+    def _get_wait_time(self):
+        next_times = [x.next_sync_time for x in self.states.values() if not x.is_syncing]
+        if not next_times:
+            return self.POLL_INTERVAL
+        return min(self.POLL_INTERVAL, max(0, min(next_times) - time.time()))
+
+    def _sync(self, state):
+        start_time = time.time()
+        try:
+            self._sync_library(state)
+        except Exception:
+            with self.condition:
+                state.n_failures += 1
+                state.last_error = traceback.format_exc()
+                state.next_sync_time = time.time() + self.retry_interval
+            if self.verbose:
+                print('Sync failed for %s:\n%s' % (state.user_name, state.last_error))
+        else:
+            end_time = time.time()
+            with self.condition:
+                state.n_syncs += 1
+                state.last_error = None
+                state.last_sync_time = end_time
+                state.last_sync_duration = end_time - start_time
+                state.last_changes = _get_changes(state.library)
+                state.last_sync_type = 'full' if \
+                    state.library.sync_result.time_update_sync is None else 'update'
+                state.next_sync_time = end_time + state.interval
+        finally:
+            with self.condition:
+                state.is_syncing = False
+                self.condition.notify()
+
+    def _sync_library(self, state):
+        if state.library is not None:
+            state.library.sync()
+            return
+
+        api = state.api
+        if api is None:
+            api = API(user_name=state.user_name,
+                      transport=Transport(rate_limiter=self.rate_limiter))
+        state.library = UserLibrary(api=api, verbose=self.verbose)
+
+    def __repr__(self):
+        pv = ['max_workers', '%d' % self.max_workers,
+              'interval', fstr(self.interval),
+              'retry_interval', fstr(self.retry_interval),
+              'rate_limiter', cld(self.rate_limiter),
+              'states', cld(self.states),
+              'is_running', self._thread is not None]
+        return utils.property_values_to_string(pv)
+
+
+def _get_changes(library):
+    sync = library.sync_result
+    n_docs = 0 if library.docs is None else len(library.docs)
+    return {'n_docs': n_docs,
+            'n_new_and_updated': len(sync.new_and_updated_raw or []),
+            # removed_ids includes the entire trash on a full trash check
+            'n_removed': int(sync.n_docs_removed),
+            'n_restored': len(sync.restored_ids or [])}
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""
+On disk storage for the client library.
+
+Documents are stored in a SQLite database, keyed by their document id. This
+allows a sync to only write the documents that were added, changed or removed,
+and allows individual documents to be looked up without loading the entire
+library into memory.
+
+See Also
+--------
+mendeley.client_library.UserLibrary
+
+"""
+
+#Standard Library
+import json
+import sqlite3
+import threading
+
+#Third Party Imports
+import pandas as pd
+
+#Local Imports
+from .. import utils
+
+
+class LibraryStore(object):
+    """
+    Keyed storage of the raw JSON of a user's documents.
+
+    Tables
+    ------
+    documents : id, created, last_modified, json
+    info : key, value
+        Values are stored as JSON. The 'file_version' key holds the version
+        the file was written with. The 'revision' key is incremented on every
+        change to the documents.
+    data_frame : id, <one column per column of the DataFrame>
+        Cache of values parsed from the documents, so that they don't need
+        to be parsed again from the JSON. See save_data_frame()
+
+    Attributes
+    ----------
+    file_path : string
+    file_version : int
+        If the version in an existing file does not match this value, the
+        file's contents are discarded.
+
+    """
+
+    def __init__(self, file_path, file_version):
+        """
+        Parameters
+        ----------
+        file_path : string
+        file_version : int
+        """
+        self.file_path = file_path
+        self.file_version = file_version
+
+        # Syncing may happen from a thread other than the one that created
+        # the store, so access is serialized with a lock instead
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(file_path, check_same_thread=False)
+
+        with self.lock, self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS documents ('
+                            'id TEXT PRIMARY KEY, created TEXT, '
+                            'last_modified TEXT, json TEXT)')
+            self.db.execute('CREATE TABLE IF NOT EXISTS info ('
+                            'key TEXT PRIMARY KEY, value TEXT)')
+
+        if self.get_value('file_version') != file_version:
+            self.clear()
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+
+    def __contains__(self, doc_id):
+        with self.lock:
+            row = self.db.execute('SELECT 1 FROM documents WHERE id = ?',
+                                  (doc_id,)).fetchone()
+        return row is not None
+
+    @property
+    def is_empty(self):
+        return len(self) == 0
+
+    def get_ids(self):
+        with self.lock:
+            return [x[0] for x in self.db.execute('SELECT id FROM documents')]
+
+    def get_json(self, doc_id):
+        """
+        Returns the JSON dict of a single document or None if the document
+        is not in the store.
+        """
+        with self.lock:
+            row = self.db.execute('SELECT json FROM documents WHERE id = ?',
+                                  (doc_id,)).fetchone()
+        if row is None:
+            return None
+        else:
+            return json.loads(row[0])
+
+    def get_many_json(self, doc_ids):
+        """
+        Returns a list of the JSON dicts of the requested documents, in the
+        same order as doc_ids. Entries are None for missing documents.
+        """
+        found = {}
+        # SQLite limits the number of parameters in a single statement
+        chunk_size = 500
+        with self.lock:
+            for i in range(0, len(doc_ids), chunk_size):
+                chunk = doc_ids[i:i + chunk_size]
+                query = ('SELECT id, json FROM documents WHERE id IN (%s)' %
+                         ','.join('?' * len(chunk)))
+                for doc_id, value in self.db.execute(query, chunk):
+                    found[doc_id] = value
+
+        return [json.loads(found[x]) if x in found else None for x in doc_ids]
+
+    def iter_raw(self):
+        """
+        Yields the JSON dict of every document, in the order they were
+        stored.
+        """
+        with self.lock:
+            rows = self.db.execute('SELECT json FROM documents ORDER BY rowid').fetchall()
+        for row in rows:
+            yield json.loads(row[0])
+
+    def load_raw(self):
+        """
+        Returns
+        -------
+        list of dicts
+        """
+        return list(self.iter_raw())
+
+    def get_newest_modified(self):
+        """
+        Returns the most recent 'last_modified' value (as a string) or None
+        if the store is empty.
+        """
+        with self.lock:
+            return self.db.execute('SELECT MAX(last_modified) FROM documents').fetchone()[0]
+
+    def replace_all(self, raw):
+        """
+        Replaces all documents with those in raw.
+        """
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM documents')
+            self._insert(raw)
+            self._increment_revision()
+
+    def update(self, new_and_updated=None, removed_ids=None, values=None, data_frame=None):
+        """
+        Parameters
+        ----------
+        new_and_updated : list (or iterable) of dicts
+            Documents that are added, or that replace an existing document
+            with the same id.
+        removed_ids : list of strings
+            Ids of the documents to remove. Ids that are not in the store
+            are ignored.
+        values : dict (default None)
+            Values to set (see set_value). These are written in the same
+            transaction as the documents, so that e.g. a sync checkpoint
+            always matches the documents that have been stored.
+        data_frame : pandas.DataFrame (default None)
+            Rows of the cached DataFrame (see save_data_frame) for the
+            documents in new_and_updated. If the cache matched the documents
+            before this update, only these rows are written and the cache
+            remains valid. Otherwise the cache remains out of date.
+        """
+        with self.lock, self.db:
+            header = self.get_value('data_frame')
+            update_cache = data_frame is not None and header is not None and \
+                header['revision'] == self.get_value('revision', 0)
+
+            if removed_ids:
+                removed = [(x,) for x in removed_ids]
+                self.db.executemany('DELETE FROM documents WHERE id = ?', removed)
+                if update_cache:
+                    self.db.executemany('DELETE FROM data_frame WHERE id = ?', removed)
+            if new_and_updated:
+                self._insert(new_and_updated)
+            if values:
+                for key, value in values.items():
+                    self._set_value(key, value)
+            self._increment_revision()
+
+            if update_cache:
+                self._insert_rows(data_frame, header['columns'])
+                header['revision'] = self.get_value('revision')
+                self._set_value('data_frame', header)
+
+    def _insert(self, raw):
+        self.db.executemany(
+            'INSERT OR REPLACE INTO documents (id, created, last_modified, json) '
+            'VALUES (?, ?, ?, ?)',
+            ((x['id'], x.get('created'), x.get('last_modified'), json.dumps(x))
+             for x in raw))
+
+    def _increment_revision(self):
+        self._set_value('revision', self.get_value('revision', 0) + 1)
+
+    def save_data_frame(self, df, version):
+        """
+        Caches values parsed from the documents currently in the store, so
+        that they don't need to be parsed again.
+
+        The rows are written to the 'data_frame' table. A header with the
+        version, the revision of the documents and the columns is kept in
+        the 'info' table. The cache is valid while the revision matches,
+        and can be kept valid by passing the changed rows to update().
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            Indexed by document id. Columns are stored as is, except for
+            datetime columns which are stored as integers (nanoseconds).
+            Nested values (e.g. lists of authors) are not supported.
+        version : int
+            Version of the parsing code that created df. The cache is not
+            used if this changes.
+        """
+        columns = [str(x) for x in df.columns]
+        header = {'version': version,
+                  'columns': columns,
+                  'datetime_columns': [x for x in columns if _is_datetime(df[x])]}
+
+        with self.lock, self.db:
+            self.db.execute('DROP TABLE IF EXISTS data_frame')
+            self.db.execute('CREATE TABLE data_frame (id TEXT PRIMARY KEY%s)' %
+                            ''.join(', "%s"' % x for x in columns))
+            self._insert_rows(df, columns)
+            header['revision'] = self.get_value('revision', 0)
+            self._set_value('data_frame', header)
+
+    def _insert_rows(self, df, columns):
+        if len(df) == 0:
+            return
+        values = [df[x].values.view('i8').tolist() if _is_datetime(df[x]) else df[x].tolist()
+                  for x in columns]
+        self.db.executemany(
+            'INSERT OR REPLACE INTO data_frame VALUES (?%s)' % (', ?' * len(columns)),
+            zip(df.index.tolist(), *values))
+
+    def load_data_frame(self, version):
+        """
+        Returns the cached DataFrame, or None if there is no cache or if it
+        is out of date. The header is checked before any rows are read.
+
+        See Also
+        --------
+        save_data_frame
+        """
+        with self.lock:
+            header = self.get_value('data_frame')
+            if header is None or header['version'] != version or \
+                    header['revision'] != self.get_value('revision', 0):
+                return None
+
+            rows = self.db.execute('SELECT * FROM data_frame ORDER BY rowid').fetchall()
+
+        columns = header['columns']
+        df = pd.DataFrame.from_records(rows, columns=['id'] + columns, index='id')
+        for name in header['datetime_columns']:
+            df[name] = pd.to_datetime(df[name], unit='ns')
+        return df
+
+    def get_value(self, key, default=None):
+        with self.lock:
+            row = self.db.execute('SELECT value FROM info WHERE key = ?',
+                                  (key,)).fetchone()
+        if row is None:
+            return default
+        else:
+            return json.loads(row[0])
+
+    def set_value(self, key, value):
+        with self.lock, self.db:
+            self._set_value(key, value)
+
+    def _set_value(self, key, value):
+        # The caller is responsible for the transaction
+        self.db.execute('INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)',
+                        (key, json.dumps(value)))
+
+    def clear(self):
+        """
+        Removes all documents and stored values. Only the file version is
+        retained.
+        """
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM documents')
+            self.db.execute('DELETE FROM info')
+            self.db.execute('DROP TABLE IF EXISTS data_frame')
+            self.db.execute('INSERT INTO info (key, value) VALUES (?, ?)',
+                            ('file_version', json.dumps(self.file_version)))
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def __repr__(self):
+        pv = ['file_path', self.file_path,
+              'file_version', self.file_version,
+              'n_documents', '%d' % len(self)]
+        return utils.property_values_to_string(pv)
+
+
+def _is_datetime(values):
+    return pd.api.types.is_datetime64_any_dtype(values)
@@ -11,10 +11,12 @@ Features:
 """
 
 #Standard Library Imports
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from timeit import default_timer as ctime
 import os
 import pickle
+import time
 
 #Third Party Imports
 import pandas as pd
@@ -24,6 +26,10 @@ from .api import API
 from . import errors
 from . import models
 from . import utils
+from .client import metrics as sync_metrics
+from .client.index import IdentifierIndex
+from .client.records import LibraryRecords
+from .client.store import LibraryStore
 from .optional import rr
 
 fstr = utils.float_or_none_to_string
@@ -40,23 +46,51 @@ class UserLibrary:
     sync_result :
     doc_objects :
     docs : Pandas entry
+        The creation and modification times and the identifiers of the
+        documents (see DATA_FRAME_COLUMNS), indexed by document id. Other
+        values are available from records, or as JSON from the store.
     raw : list of json object dicts
+        This is loaded from the store when requested.
     raw_trash : list of dicts
+    store : client.store.LibraryStore
+        On disk storage of the documents.
+    identifier_index : client.index.IdentifierIndex
+        Used to find documents by DOI, PMID, etc.
+    records : client.records.LibraryRecords
+        Compact records of all documents, created when first requested and
+        kept up to date by sync(). These hold the titles, authors, etc. that
+        are not in docs. Intended for large libraries, where holding a
+        models.Document for each document is expensive.
 
     """
 
-    FILE_VERSION = 1
+    # Version 1 - all documents pickled to a single file
+    # Version 2 - documents stored in a SQLite database, see LibraryStore
+    FILE_VERSION = 2
 
-    def __init__(self, user_name=None, verbose=False):
-        self.api = API(user_name=user_name)
+    def __init__(self, user_name=None, verbose=False, api=None):
+        """
+        Parameters
+        ----------
+        user_name : string (default None)
+            See API
+        verbose : bool (default False)
+        api : API (default None)
+            If passed in, this is used instead of creating an API for
+            user_name, e.g. an API for mendeley.mock_server.MockServer
+        """
+        if api is None:
+            api = API(user_name=user_name)
+        self.api = api
         self.user_name = self.api.user_name
         self.verbose = verbose
 
         # path handling
         # -------------
         root_path = utils.get_save_root(['client_library'], True)
-        save_name = utils.user_name_to_file_name(self.user_name) + '.pickle'
-        self.file_path = os.path.join(root_path, save_name)
+        save_name = utils.user_name_to_file_name(self.user_name)
+        self.file_path = os.path.join(root_path, save_name + '.sqlite')
+        self.old_file_path = os.path.join(root_path, save_name + '.pickle')
 
         self._load()
 
@@ -66,33 +100,177 @@ class UserLibrary:
         pv = ['api',        cld(self.api),
               'user_name',  self.user_name,
               'docs',       cld(self.docs),
-              'raw',        cld(self.raw)]
+              'store',      cld(self.store)]
         return utils.property_values_to_string(pv)
 
+    @property
+    def raw(self):
+        return self.store.load_raw()
+
+    @property
+    def records(self):
+        if self._records is None:
+            self._records = LibraryRecords(self.store, self.api)
+        return self._records
+
     def sync(self):
         """
         Syncing approach:
         
-        ? How do we know if something has been restored from the trash?
+        Documents that have been trashed, deleted, modified or added since
+        the last sync are requested and applied to the local copy. The ids of
+        documents in the trash are tracked, so that documents restored from
+        the trash (which are returned as modified documents) are added back
+        to the library. See Sync for details.
         
+        Changes are written to the store by Sync.
         """
 
-        sync_result = Sync(self.api, self.raw, verbose=self.verbose)
+        sync_result = Sync(self.api, None, verbose=self.verbose, store=self.store,
+                           index=self.identifier_index)
         self.sync_result = sync_result
-        self.raw = sync_result.raw
         self.docs = sync_result.docs
-        self._save()
+        self.identifier_index = sync_result.index
+
+        if self._records is not None:
+            if sync_result.time_update_sync is None:
+                # Full sync, the records are rebuilt when next requested
+                self._records = None
+            else:
+                self._records.update(sync_result.new_and_updated_raw,
+                                     sync_result.removed_ids)
+
+    def create_documents(self, docs_data, max_workers=8):
+        """
+        Creates documents (see api.Documents.create_many) and adds those that
+        were created to the local copy of the library, without a sync.
+
+        Parameters
+        ----------
+        docs_data : list of dicts
+        max_workers : int (default 8)
+
+        Returns
+        -------
+        list of api.BulkResult
+            The value of each successful result is the JSON of the document.
+        """
+        results = self.api.documents.create_many(docs_data, max_workers, return_json=True)
+        self.apply_changes(new_and_updated=[x.value for x in results if x.ok])
+        return results
+
+    def update_documents(self, updates, max_workers=8):
+        """
+        Updates documents (see api.Documents.update_many) and applies the
+        updates to the local copy of the library, without a sync.
+
+        Parameters
+        ----------
+        updates : list of (doc_id, new_data)
+        max_workers : int (default 8)
+
+        Returns
+        -------
+        list of api.BulkResult
+        """
+        results = self.api.documents.update_many(updates, max_workers, return_json=True)
+        self.apply_changes(new_and_updated=[x.value for x in results if x.ok])
+        return results
+
+    def update_document(self, doc_id, new_data):
+        """
+        Updates a document, see api.Documents.update. The updated document
+        returned by the server replaces the local copy.
+
+        Returns
+        -------
+        models.Document
+        """
+        doc_json = self.api.documents.update(doc_id, dict(new_data, _return_type='json'))
+        self.apply_changes(new_and_updated=[doc_json])
+        return models.Document(doc_json, self.api)
+
+    def move_to_trash(self, doc_id):
+        """
+        Moves a document to the trash and removes it from the local copy.
+        """
+        self.api.documents.move_to_trash(doc_id)
+        self.apply_changes(removed_ids=[doc_id])
+
+    def apply_changes(self, new_and_updated=None, removed_ids=None):
+        """
+        Applies changes made through the API (e.g. by create_documents) to
+        the local copy of the library, i.e. docs, the store, the identifier
+        index and the records. Only the changed documents are written to
+        the store.
+
+        The responses to creating and updating documents are not the 'all'
+        view that is stored by a sync. The response to an update is merged
+        into the stored JSON of the document, and the documents are
+        requested in full by the next sync, see Sync.REFRESH_IDS_KEY.
+
+        The next sync still requests all changes since the last sync, so
+        changes made by other clients in the meantime are not missed. See
+        Sync.MODIFIED_TIME_KEY.
+
+        Parameters
+        ----------
+        new_and_updated : list of dicts
+            JSON of documents as returned by the server, which are added or
+            update the local copy.
+        removed_ids : list of strings
+        """
+        new_and_updated = new_and_updated or []
+        removed_ids = removed_ids or []
+        if not new_and_updated and not removed_ids:
+            return
+
+        store = self.store
+        changed_ids = [x['id'] for x in new_and_updated]
+        stored = store.get_many_json(changed_ids)
+        new_and_updated = [x if old is None else dict(old, **x)
+                           for x, old in zip(new_and_updated, stored)]
+
+        refresh_ids = set(store.get_value(Sync.REFRESH_IDS_KEY) or [])
+        refresh_ids.update(changed_ids)
+        refresh_ids.difference_update(removed_ids)
+        values = {Sync.REFRESH_IDS_KEY: sorted(refresh_ids)}
+
+        # The local changes must not move the point from which the next
+        # sync requests changes
+        if store.get_value(Sync.MODIFIED_TIME_KEY) is None:
+            values[Sync.MODIFIED_TIME_KEY] = store.get_newest_modified()
+
+        df = _raw_to_data_frame(new_and_updated, include_json=False,
+                                columns=DATA_FRAME_COLUMNS)
+
+        docs = self.docs
+        if docs is None or len(docs) == 0:
+            self.docs = df
+        else:
+            docs = docs[~docs.index.isin(removed_ids + changed_ids)]
+            self.docs = pd.concat([docs, df]) if len(df) > 0 else docs
+
+        self.identifier_index.remove(removed_ids)
+        self.identifier_index.add_data_frame(df)
+
+        store.update(new_and_updated, removed_ids, values, data_frame=df)
+
+        if self._records is not None:
+            self._records.update(new_and_updated, removed_ids)
 
     def get_document(self, doi=None, index=None, return_json=False):
         """
         Returns the document (i.e. metadata) for a given DOI,
         if the DOI is found in the library.
 
-        #TODO: Build in support for other identifier searches
+        DOIs are matched case insensitively.
 
         Parameters
         ----------
         doi : str
+        index : int
+            Position of the document in self.docs
         return_json : bool
 
         Returns
@@ -102,6 +280,10 @@ class UserLibrary:
         JSON
             If return_json is True
 
+        See Also
+        --------
+        get_documents
+
         """
         
         if index is not None:
@@ -109,42 +291,73 @@ class UserLibrary:
             if index < 0 or index >= len(self.docs):
                 raise Exception('Out of bounds index request')
             
-            document_json = self.docs.ix[index]['json']
+            doc_id = self.docs.index[index]
         elif doi is not None:
-
-            #JAH: Yikes, was upper vs lower ever an issue? It seems this this
-            #would be invalid. i.e. ABC is not the same as abc
-            #Please document accordingly
-            temp = self.docs[self.docs['doi'] == doi]
-            
-            #TODO: check for a match here, if not, do these other checks
-            #TODO: Eventually, once we know the rules on case sensitivity, store
-            #the DOIs accordingly and do the conversion on the input DOI            
-            
-            temp_upper = self.docs[self.docs['doi'] == doi.upper()]
-            temp_lower = self.docs[self.docs['doi'] == doi.lower()]
-            if len(temp) == 0 and len(temp_upper) == 0 and len(temp_lower) == 0:
-                raise errors.DOINotFoundError("DOI not found in library")
-                
             #TODO: Check for > 1 - throw a warning?
-            if len(temp) !=0:
-                document_json = temp['json'][0]
-            elif len(temp_upper) !=0:
-                document_json = temp_upper['json'][0]
-            elif len(temp_lower) !=0:
-                document_json = temp_lower['json'][0]
+            doc_ids = self.identifier_index.get_ids('doi', doi)
+            if len(doc_ids) == 0:
+                raise errors.DOINotFoundError("DOI not found in library")
+
+            doc_id = doc_ids[0]
         else:
             raise Exception('Unrecognized search option')
         
+        document_json = self.store.get_json(doc_id)
+
         if return_json:
             return document_json
         else:
             return models.Document(document_json, self.api)
 
+    def get_documents(self, dois=None, pmids=None, issns=None, isbns=None,
+                      arxivs=None, return_json=False):
+        """
+        Returns the documents for a list of identifiers. Only one type of
+        identifier may be specified per call.
+
+        Parameters
+        ----------
+        dois : list
+        pmids : list
+        issns : list
+        isbns : list
+        arxivs : list
+        return_json : bool
+
+        Returns
+        -------
+        list
+            One entry per requested identifier, in the same order. Each entry
+            is a models.Document (or JSON if return_json is True) or None if
+            the identifier was not found in the library.
+
+        Examples
+        --------
+        docs = library.get_documents(dois=['10.1002/biot.201400046', '10.1/missing'])
+        """
+
+        id_type, values = _get_identifier_list(dois=dois, pmids=pmids, issns=issns,
+                                               isbns=isbns, arxivs=arxivs)
+
+        doc_ids = self.identifier_index.get_first_ids(id_type, values)
+
+        found_ids = [x for x in doc_ids if x is not None]
+        json_by_id = dict(zip(found_ids, self.store.get_many_json(found_ids)))
+
+        output = []
+        for doc_id in doc_ids:
+            if doc_id is None:
+                output.append(None)
+            elif return_json:
+                output.append(json_by_id[doc_id])
+            else:
+                output.append(models.Document(json_by_id[doc_id], self.api))
+
+        return output
+
     def check_for_document(self, doi):
         """
-        Attempts to call self.get_document and checks for error.
-        If no error, the DOI has been found.
+        Checks whether a document with the given DOI is in the library.
 
         Parameters
         ----------
@@ -155,11 +368,26 @@ class UserLibrary:
         bool - True if DOI is found in the Mendeley library.
             False otherwise.
         """
-        try:
-            self.get_document(doi=doi)
-            return True
-        except errors.DOINotFoundError:
-            return False
+        return len(self.identifier_index.get_ids('doi', doi)) > 0
+
+    def contains_many(self, dois=None, pmids=None, issns=None, isbns=None, arxivs=None):
+        """
+        Checks which of the given identifiers are in the library. Only one
+        type of identifier may be specified per call.
+
+        Returns
+        -------
+        list of bools
+            One entry per requested identifier, in the same order.
+
+        Examples
+        --------
+        in_library = library.contains_many(dois=reference_dois)
+        """
+        id_type, values = _get_identifier_list(dois=dois, pmids=pmids, issns=issns,
+                                               isbns=isbns, arxivs=arxivs)
+
+        return [x is not None for x in self.identifier_index.get_first_ids(id_type, values)]
 
     def add_to_library(self, doi, check_in_lib=False, add_pdf=True):
         """
@@ -176,7 +404,7 @@ class UserLibrary:
         
         """
         if check_in_lib:
-            if self.check_for_document():
+            if self.check_for_document(doi):
                 print('Already in library.')
                 return
 
@@ -185,7 +413,11 @@ class UserLibrary:
         paper_info = rr.resolve_doi(doi)
 
         formatted_entry = self._format_doc_entry(paper_info.entry)
-        new_document = self.api.documents.create(formatted_entry)
+        doc_json = self.api.documents.create(dict(formatted_entry, _return_type='json'))
+
+        # Available locally without a sync
+        self.apply_changes(new_and_updated=[doc_json])
+        new_document = models.Document(doc_json, self.api)
 
         # Get pdf
         if add_pdf:
@@ -272,23 +504,33 @@ class UserLibrary:
         return entry
 
     def _load(self):
-        # TODO: Check that the file is not empty ...
-        if os.path.isfile(self.file_path):
-            with open(self.file_path, 'rb') as pickle_file:
-                d = pickle.load(pickle_file)
+        self.store = LibraryStore(self.file_path, self.FILE_VERSION)
+        self.docs = None
+        self.identifier_index = None
+        self._records = None
 
-            self.raw = d['raw']
-        else:
-            self.raw = None
-            self.docs = None
+        if self.store.is_empty and os.path.isfile(self.old_file_path):
+            self._migrate_pickle()
+
+    def _migrate_pickle(self):
+        """
+        Copies the documents from a version 1 (pickle) save file into the
+        store. The pickle file is renamed afterwards so that it is not
+        migrated again.
+        """
+        self.verbose_print('Migrating library from %s' % self.old_file_path)
+
+        with open(self.old_file_path, 'rb') as pickle_file:
+            d = pickle.load(pickle_file)
 
-    def _save(self):
-        d = dict()
-        d['file_version'] = self.FILE_VERSION
-        d['raw'] = self.raw
-        # d['raw_trash'] = self.raw_trash
-        with open(self.file_path, 'wb') as pickle_file:
-            pickle.dump(d, pickle_file)
+        if d.get('file_version') == 1 and d.get('raw') is not None:
+            self.store.replace_all(d['raw'])
+
+        os.rename(self.old_file_path, self.old_file_path + '.old')
+
+    def verbose_print(self, msg):
+        if self.verbose:
+            print(msg)
 
 
 class Sync(object):
@@ -301,26 +543,128 @@ class Sync(object):
     time_deleted_check
     time_full_retrieval
     time_modified_check
+        Time to retrieve new and modified documents.
+    time_modified_processing
+        Time to merge the new and modified documents into docs.
     time_trash_retrieval
+    time_update_retrieval
+        Wall clock time for the retrieval steps of an update sync. When
+        these are run in parallel this is roughly the longest of
+        time_trash_retrieval, time_deleted_check and time_modified_check.
     time_update_sync
+    trash_state : dict or None
+        Maps the id of each document in the trash to its 'last_modified'
+        value. This is used to only request changes to the trash. It is
+        saved in the store. If None, the entire trash is requested.
+    trash_ids : list
+        Ids of the documents that were found in the trash by this sync.
+    restored_ids : list
+        Ids of documents that were restored from the trash since the last
+        sync.
+    new_and_updated_raw : list or None
+        JSON of the new and updated documents received by an update sync,
+        excluding those that are the same as the local copy. Model objects
+        for these are built on request by new_and_updated_docs.
+    resumed_full_sync : bool
+        Whether this sync continued a full sync that was interrupted. See
+        full_sync()
+    metrics : client.metrics.SyncMetrics
+        Timings of each phase of the sync, and counts of requests, pages
+        and documents. These are passed to the hooks registered with
+        client.metrics once the sync is done.
     
     #TODO: Update with other attributes in this class
     
     """
 
-    def __init__(self, api, raw, verbose=False):
+    # If true, the trash, deleted documents and modified documents are
+    # requested at the same time during an update sync
+    PARALLEL_RETRIEVAL = True
+
+    # Normally only changes to the trash are requested. As a safeguard
+    # against missing changes the entire trash is requested if it hasn't
+    # been for this many seconds.
+    TRASH_FULL_CHECK_INTERVAL = 24 * 60 * 60
+
+    # Key in the store of the 'next' link of the last page stored by a full
+    # sync. This is only set while a full sync is in progress.
+    FULL_SYNC_CURSOR_KEY = 'full_sync_next_url'
+
+    # Key in the store of the most recent 'last_modified' value received by
+    # a sync. Changes since this time are requested by the next sync. This
+    # is kept separately from the documents as documents may be added to the
+    # store without a sync (see UserLibrary.apply_changes), and these may be
+    # newer than changes made elsewhere that haven't been synced yet.
+    MODIFIED_TIME_KEY = 'sync_modified_time'
+
+    # Key in the store of the ids of documents that were written without a
+    # sync, from responses that are not the 'all' view (see
+    # UserLibrary.apply_changes). The next sync processes these documents
+    # even if they are the same as the local copy, so that the stored JSON
+    # is replaced by the 'all' view.
+    REFRESH_IDS_KEY = 'refresh_ids'
+
+    def __init__(self, api, raw, verbose=False, store=None, index=None):
+        """
+        Parameters
+        ----------
+        api : API
+        raw : list of dicts or None
+            The documents currently in the library. If None (and there
+            are no documents in the store) a full sync is run.
+        verbose : bool
+        store : client.store.LibraryStore (default None)
+            If passed in, documents are loaded from the store when raw is
+            None, and all changes are written to the store. In this case
+            docs only has the DATA_FRAME_COLUMNS, which are cached in the
+            store as well so that the raw JSON doesn't need to be loaded.
+        index : client.index.IdentifierIndex (default None)
+            Index of the documents in raw/store from a previous sync. It is
+            updated with the changes found by this sync. If None, an index
+            is built from the documents.
+        """
         self.time_full_retrieval = None
         self.time_deleted_check = None
         self.time_trash_retrieval = None
         self.time_modified_check = None
         self.time_modified_processing = None
+        self.time_update_retrieval = None
         self.newest_modified_time = None
+        self.refresh_ids = set()
         self.n_docs_removed = 0
+        self.resumed_full_sync = False
 
         self.time_update_sync = None
 
         self.api = api
         self.verbose = verbose
+        self.store = store
+        self.index = index
+        self.docs = None
+        self.include_json = store is None
+
+        self.metrics = sync_metrics.SyncMetrics(getattr(api, 'user_name', None))
+        transport = getattr(api, 'transport', None)
+        start_counts = None if transport is None else transport.get_counts()
+
+        if store is None:
+            self.trash_state = None
+            self.trash_full_check_time = None
+        else:
+            self.trash_state = store.get_value('trash')
+            self.trash_full_check_time = store.get_value('trash_full_check_time')
+
+        #An interrupted full sync needs to be finished before the documents in
+        #the store can be used
+        full_sync_in_progress = store is not None and \
+            store.get_value(self.FULL_SYNC_CURSOR_KEY) is not None
+
+        if raw is None and store is not None and not store.is_empty and \
+                not full_sync_in_progress:
+            self.docs = store.load_data_frame(DATA_FRAME_VERSION)
+            if self.docs is None:
+                self.verbose_print('Cached documents are out of date, loading from store')
+                raw = store.load_raw()
 
         self.raw = raw
 
@@ -328,12 +672,37 @@ class Sync(object):
         # -----------------
         self.deleted_ids = None
         self.trash_ids = None
-        self.new_and_updated_docs = None
+        self.restored_ids = []
+        self.removed_ids = None
+        self.new_and_updated_raw = None
 
-        if self.raw is None:
+        if self.raw is None and self.docs is None:
+            self.metrics.sync_type = 'full'
             self.full_sync()
+            self.metrics.add_span('total', self.time_full_retrieval)
         else:
+            self.metrics.sync_type = 'update'
             self.update_sync()
+            self.metrics.add_span('total', self.time_update_sync)
+
+        if start_counts is not None:
+            end_counts = transport.get_counts()
+            for name, start, end in zip(['n_requests', 'n_retries', 'n_bytes'],
+                                        start_counts, end_counts):
+                self.metrics.increment(name, end - start)
+
+        sync_metrics.export(self.metrics)
+
+    @property
+    def new_and_updated_docs(self):
+        """
+        models.AllDocument for each of the new and updated documents (over
+        all pages), or None if there was no update sync. These are built on
+        each access, the sync itself only uses new_and_updated_raw.
+        """
+        if self.new_and_updated_raw is None:
+            return None
+        return [models.AllDocument(x, self.api) for x in self.new_and_updated_raw]
 
     def __repr__(self):
         pv = ['raw', cld(self.raw), 
@@ -345,33 +714,112 @@ class Sync(object):
             'time_trash_retrieval', fstr(self.time_trash_retrieval),
             'time_modified_check', fstr(self.time_modified_check),
             'time_modified_processing', fstr(self.time_modified_processing),
+            'time_update_retrieval', fstr(self.time_update_retrieval),
             'deleted_ids', cld(self.deleted_ids),
             'trash_ids', cld(self.trash_ids),
+            'restored_ids', cld(self.restored_ids),
             'n_docs_removed', '%d' % self.n_docs_removed,
-            'new_and_updated_docs', cld(self.new_and_updated_docs)]
+            'new_and_updated_raw', cld(self.new_and_updated_raw),
+            'metrics', cld(self.metrics)]
 
         return utils.property_values_to_string(pv)
 
     def full_sync(self):
+        """
+        Retrieves all documents.
+
+        When there is a store, each page is written to the store as soon as
+        it is received, along with the link to the next page. If the sync is
+        interrupted (e.g. by a failed request), the next sync resumes from
+        the page after the last one that was stored.
+        """
 
         t1 = ctime()
-        self.verbose_print('Starting retrieval of all documents')
+        metrics = self.metrics
+
+        with metrics.span('retrieval'):
+            if self.store is None:
+                self.verbose_print('Starting retrieval of all documents')
 
-        # TODO: Change limit to -1, build in support for getting all
-        # within the caller
-        doc_set = self.api.documents.get(limit=500, view='all')
+                # TODO: Change limit to -1, build in support for getting all
+                # within the caller
+                doc_set = self.api.documents.get(limit=500, view='all', stream=True)
+                self.raw = list(self._iter_json(doc_set))
+            else:
+                self._retrieve_all_to_store()
+                self.raw = self.store.load_raw()
+
+        with metrics.span('parse'):
+            self.docs = self._to_data_frame(self.raw)
+            self.index = IdentifierIndex.from_data_frame(self.docs)
+        metrics.increment('n_docs_parsed', len(self.docs))
+        metrics.increment('n_docs_added', len(self.docs))
+
+        # The entire trash is retrieved so that later syncs only need to
+        # request changes to it
+        self.trash_state = None
+        self.get_trash_ids()
 
-        self.raw = [x.json for x in doc_set]
-        self.docs = _raw_to_data_frame(self.raw)
+        if self.store is not None:
+            with metrics.span('save'):
+                self.store.save_data_frame(self.docs, DATA_FRAME_VERSION)
+                self._save_trash_state()
+                self.store.set_value(self.MODIFIED_TIME_KEY, self.store.get_newest_modified())
+                self.store.set_value(self.REFRESH_IDS_KEY, None)
 
-        self.full_retrieval_time = ctime() - t1
+        self.time_full_retrieval = ctime() - t1
 
         if self.raw is not None:
             self.verbose_print('Finished retrieving all documents (n=%d) in %s seconds'
-                                % (len(self.raw), fstr(self.full_retrieval_time)))
+                                % (len(self.raw), fstr(self.time_full_retrieval)))
         else:
             self.verbose_print('No documents found in %s seconds'
-                               % fstr(self.full_retrieval_time))
+                               % fstr(self.time_full_retrieval))
+
+    def _to_data_frame(self, raw):
+        if self.store is None:
+            return _raw_to_data_frame(raw, self.include_json)
+        else:
+            return _raw_to_data_frame(raw, include_json=False, columns=DATA_FRAME_COLUMNS)
+
+    def _iter_json(self, doc_set, prefetch=None):
+        """
+        DocumentSet.iter_json, counting the pages retrieved
+        """
+        for page in doc_set.iter_pages(prefetch):
+            self.metrics.increment('n_pages')
+            for json in page.iter_page_json():
+                yield json
+
+    def _retrieve_all_to_store(self):
+        cursor_key = self.FULL_SYNC_CURSOR_KEY
+        next_url = self.store.get_value(cursor_key)
+
+        if next_url is None:
+            self.verbose_print('Starting retrieval of all documents')
+            self.store.replace_all([])
+            doc_set = self.api.documents.get(limit=500, view='all', stream=True)
+        else:
+            self.verbose_print('Resuming retrieval of all documents (n=%d already retrieved)'
+                               % len(self.store))
+            try:
+                doc_set = self.api.documents.get(page_url=next_url, limit=500, view='all',
+                                                 stream=True)
+            except errors.CallFailedException:
+                #The link may no longer be valid, in which case we start over
+                self.verbose_print('Unable to resume retrieval, starting over')
+                self.store.set_value(cursor_key, None)
+                return self._retrieve_all_to_store()
+            self.resumed_full_sync = True
+
+        #Storing a page overlaps with the request for the next one. Documents
+        #are written to the store as they are decoded from the response.
+        for page in doc_set.iter_pages(prefetch=1):
+            self.metrics.increment('n_pages')
+            next_link = page.links.get('next')
+            next_url = None if next_link is None else next_link['url']
+            self.store.update(page.iter_page_json(),
+                              values={cursor_key: next_url})
 
     def update_sync(self):
 
@@ -380,32 +828,96 @@ class Sync(object):
         start_sync_time = ctime()
 
         #Let's work with everything as a dataframe
-        self.docs = _raw_to_data_frame(self.raw)
-
-        #self.raw = self.docs['json'].tolist()
+        #The dataframe has already been loaded if it was cached in the store
+        with self.metrics.span('parse'):
+            # If not, the cache in the store is rewritten once the sync
+            # is done
+            is_cached = self.docs is not None
+            if not is_cached:
+                self.docs = self._to_data_frame(self.raw)
+                self.metrics.increment('n_docs_parsed', len(self.docs))
+
+            if self.index is None:
+                self.index = IdentifierIndex.from_data_frame(self.docs)
 
         #Determine the document that was updated most recently. We'll ask for
         #everything that changed after that time. This avoids time sync
         #issues with the server and the local computer since everything
         #is done relative to the timestamps from the server.
-        newest_modified_time = self.docs['last_modified'].max()
+        sync_modified_time = None
+        if self.store is not None:
+            sync_modified_time = self.store.get_value(self.MODIFIED_TIME_KEY)
+            if sync_modified_time is None:
+                sync_modified_time = self.store.get_newest_modified()
+            self.refresh_ids = set(self.store.get_value(self.REFRESH_IDS_KEY) or [])
+
+        if sync_modified_time is None:
+            newest_modified_time = self.docs['last_modified'].max()
+        else:
+            newest_modified_time = parse_datetime(sync_modified_time)
         self.newest_modified_time = newest_modified_time
 
+        #Retrieve changes
+        #------------------------------------
+        #Each of these only depends on newest_modified_time, not on the
+        #results of the others
+        retrieval_start_time = ctime()
+        retrieval_steps = [(self.get_trash_ids, (newest_modified_time,)),
+                           (self.get_deleted_ids, (newest_modified_time,)),
+                           (self.retrieve_updates_and_new_entries, (newest_modified_time,))]
+        if self.PARALLEL_RETRIEVAL:
+            with ThreadPoolExecutor(max_workers=len(retrieval_steps)) as executor:
+                futures = [executor.submit(fcn, *args) for fcn, args in retrieval_steps]
+            #Raises any errors from the steps
+            for future in futures:
+                future.result()
+        else:
+            for fcn, args in retrieval_steps:
+                fcn(*args)
+        self.time_update_retrieval = ctime() - retrieval_start_time
+        self.metrics.add_span('update_retrieval', self.time_update_retrieval)
+
         #Remove old ids
         #------------------------------------
-        self.get_trash_ids()
-        self.get_deleted_ids(newest_modified_time)
-        self.remove_old_ids()
+        with self.metrics.span('remove'):
+            self.remove_old_ids()
 
         #Process new and updated documents
         # ------------------------------------
+        #Documents that are the same as the local copy are dropped when
+        #processed, but still count towards the time of the next sync
+        received_raw = self.new_and_updated_raw
         updates_and_new_entries_start_time = ctime()
-        self.verbose_print('Checking for modified or new documents')
-        self.get_updates_and_new_entries(newest_modified_time)
+        self.process_updates_and_new_entries(newest_modified_time)
         self.time_modified_processing = ctime() - updates_and_new_entries_start_time
+        self.metrics.add_span('modified_processing', self.time_modified_processing)
         self.verbose_print('Done updating modified and new documents')
 
-        self.raw = self.docs['json'].tolist()
+        if self.store is None:
+            self.raw = self.docs['json'].tolist()
+        else:
+            self.raw = None
+            # Timestamps from the server all have the same format, so the
+            # strings can be compared
+            modified_times = [x['last_modified'] for x in received_raw
+                              if x.get('last_modified')]
+            if sync_modified_time is not None:
+                modified_times.append(sync_modified_time)
+            values = {self.REFRESH_IDS_KEY: sorted(self.refresh_ids.difference(
+                [x['id'] for x in received_raw], self.removed_ids))}
+            if modified_times:
+                values[self.MODIFIED_TIME_KEY] = max(modified_times)
+            with self.metrics.span('save'):
+                if is_cached:
+                    # Only the rows of the changed documents are written
+                    changed_ids = [x['id'] for x in self.new_and_updated_raw]
+                    changed_df = self.docs[self.docs.index.isin(changed_ids)]
+                    self.store.update(self.new_and_updated_raw, self.removed_ids, values,
+                                      data_frame=changed_df)
+                else:
+                    self.store.update(self.new_and_updated_raw, self.removed_ids, values)
+                    self.store.save_data_frame(self.docs, DATA_FRAME_VERSION)
+                self._save_trash_state()
 
         self.time_update_sync = ctime() - start_sync_time
 
@@ -419,57 +931,135 @@ class Sync(object):
         #to the newest last modified value, rather than worrying about
         #mismatches in time between the client and the server
         """
+        self.retrieve_updates_and_new_entries(newest_modified_time)
+        self.process_updates_and_new_entries(newest_modified_time)
+
+    def retrieve_updates_and_new_entries(self, newest_modified_time):
 
         start_modified_time = ctime()
+        self.verbose_print('Checking for modified or new documents')
         
         # TODO: Include -1 here ...
         doc_set = self.api.documents.get(modified_since=newest_modified_time, view='all')
         
-        raw_au_docs = [x.json for x in doc_set]
-        self.new_and_updated_docs = doc_set.docs
+        self.new_and_updated_raw = list(self._iter_json(doc_set))
         self.time_modified_check = ctime() - start_modified_time
+        self.metrics.add_span('modified_check', self.time_modified_check)
+
+    def process_updates_and_new_entries(self, newest_modified_time):
+
+        # Changes made locally since the last sync (see
+        # UserLibrary.apply_changes) are returned again. Documents that are
+        # the same as the local copy are left alone, unless they need to be
+        # refreshed (see REFRESH_IDS_KEY).
+        raw_au_docs = self._remove_unchanged(self.new_and_updated_raw)
+        self.new_and_updated_raw = raw_au_docs
 
         if len(raw_au_docs) == 0:
             return
 
         # TODO: Update name, I thought this was referring to our official copy
         # which is currently self.docs
-        df = _raw_to_data_frame(raw_au_docs)
-
-        is_new_mask = df['created'] > newest_modified_time
-        new_rows_df = df[is_new_mask]
-        updated_rows_df = df[~is_new_mask]
+        #
+        # Only the new and updated documents are parsed
+        df = self._to_data_frame(raw_au_docs)
+        self.metrics.increment('n_docs_parsed', len(df))
+
+        is_local_mask = df.index.isin(self.docs.index)
+        is_new_mask = (df['created'] > newest_modified_time) & ~is_local_mask
+
+        # Documents restored from the trash are returned as modified
+        # documents, but aren't in our copy of the library
+        is_restored_mask = ~is_new_mask & ~is_local_mask
+        self.restored_ids = df.index[is_restored_mask].tolist()
+        if len(self.restored_ids) > 0:
+            self.verbose_print('%d documents restored from the trash' % len(self.restored_ids))
+            if self.trash_state is not None:
+                for doc_id in self.restored_ids:
+                    self.trash_state.pop(doc_id, None)
+
+        new_rows_df = df[is_new_mask | is_restored_mask]
+        updated_rows_df = df[~is_new_mask & ~is_restored_mask]
+        self.metrics.increment('n_docs_added', len(new_rows_df))
+        self.metrics.increment('n_docs_updated', len(updated_rows_df))
         if len(new_rows_df) > 0:
             self.verbose_print('%d new documents found' % len(new_rows_df))
-            self.docs = self.docs.append(new_rows_df)
+            self.docs = pd.concat([self.docs, new_rows_df])
 
         if len(updated_rows_df) > 0:
             self.verbose_print('%d updated documents found' % len(updated_rows_df))
-            in_old_mask = updated_rows_df.index.isin(self.docs.index)
-            if not in_old_mask.all():
-                print('Logic error, updated entries are not in the original')
-                raise Exception('Logic error, updated entries are not in the original')
-
             updated_indices = updated_rows_df.index
             self.docs.drop(updated_indices, inplace=True)
 
             self.docs = pd.concat([self.docs, updated_rows_df])
 
-    def get_trash_ids(self):
+        # Replaces any existing entries for the updated documents
+        self.index.add_data_frame(df)
+
+    def _remove_unchanged(self, raw):
+        """
+        Returns the documents in raw that differ from the local copy, i.e.
+        that are new or have a different 'last_modified' value, and the
+        documents that need to be refreshed.
+        """
+        if len(raw) == 0 or len(self.docs) == 0 or not self.docs.index.is_unique:
+            return raw
+
+        ids = [x['id'] for x in raw]
+        modified = _parse_datetimes(pd.Series([x.get('last_modified') for x in raw], index=ids))
+        local_modified = self.docs['last_modified'].reindex(ids)
+        is_unchanged = (modified == local_modified).values
+        if self.refresh_ids:
+            is_unchanged &= ~modified.index.isin(self.refresh_ids)
+
+        n_unchanged = int(is_unchanged.sum())
+        if n_unchanged == 0:
+            return raw
+        self.metrics.increment('n_docs_unchanged', n_unchanged)
+        return [x for x, unchanged in zip(raw, is_unchanged) if not unchanged]
+
+    def get_trash_ids(self, newest_modified_time=None):
         """
         Here we are looking for documents that have been moved to the trash.
         
-        ??? Can we check the trash that's been moved back to the main
+        If the trash has been retrieved previously (i.e. we have a
+        trash_state) only documents that were modified since the last
+        check are requested. Otherwise, or if the entire trash hasn't been
+        requested within TRASH_FULL_CHECK_INTERVAL, the entire trash is
+        requested.
+        
+        Only the default view is requested, since we only need the
+        id and modification time of each document.
+        
+        Documents that have been restored from the trash are found
+        in process_updates_and_new_entries().
+
+        Parameters
+        ----------
+        newest_modified_time : datetime (default None)
+            Most recent modification time of the documents in the library.
         """
 
         trash_start_time = ctime()
-        self.verbose_print('Checking trash')
 
-        trash_set = self.api.trash.get(limit=500, view='all')
-        self.trash_ids = [x.doc_id for x in trash_set]
+        if self.trash_state is None or self.trash_full_check_time is None or \
+                time.time() - self.trash_full_check_time > self.TRASH_FULL_CHECK_INTERVAL:
+            self.verbose_print('Checking entire trash')
+            self.trash_state = {}
+            self.trash_full_check_time = time.time()
+            trash_set = self.api.trash.get(limit=500)
+        else:
+            since = _get_trash_check_time(self.trash_state, newest_modified_time)
+            self.verbose_print('Checking trash for documents modified since %s' % since)
+            trash_set = self.api.trash.get(limit=500, modified_since=since)
+
+        new_entries = dict((x['id'], x.get('last_modified')) for x in self._iter_json(trash_set))
+        self.trash_ids = list(new_entries)
+        self.trash_state.update(new_entries)
 
         self.verbose_print('Finished checking trash, %d documents found' % len(self.trash_ids))
         self.time_trash_retrieval = ctime() - trash_start_time
+        self.metrics.add_span('trash_retrieval', self.time_trash_retrieval)
 
     def get_deleted_ids(self, newest_modified_time):
 
@@ -484,26 +1074,111 @@ class Sync(object):
 
         self.verbose_print('Done requesting deleted file IDs, %d found' % len(self.deleted_ids))
         self.time_deleted_check = ctime() - deletion_start_time
+        self.metrics.add_span('deleted_check', self.time_deleted_check)
 
     def remove_old_ids(self):
         # Removal of ids
         # --------------
         ids_to_remove = self.trash_ids + self.deleted_ids
+        self.removed_ids = ids_to_remove
+
+        # Deleted documents may have been deleted from the trash
+        for doc_id in self.deleted_ids:
+            self.trash_state.pop(doc_id, None)
+
         if len(ids_to_remove) > 0:
             delete_mask = self.docs.index.isin(ids_to_remove)
             keep_mask = ~delete_mask
             self.n_docs_removed = sum(delete_mask)
+            self.metrics.increment('n_docs_removed', int(self.n_docs_removed))
             self.docs = self.docs[keep_mask]
+            self.index.remove(ids_to_remove)
+
+    def _save_trash_state(self):
+        self.store.set_value('trash', self.trash_state)
+        self.store.set_value('trash_full_check_time', self.trash_full_check_time)
 
     def verbose_print(self, msg):
         if self.verbose:
             print(msg)
 
 
-def _raw_to_data_frame(raw, include_json=True):
+# This should be incremented whenever the output of _raw_to_data_frame changes
+# so that cached data frames are not used.
+#
+# Version 2 - added isbn, arxiv and scopus columns
+# Version 3 - only DATA_FRAME_COLUMNS are cached, in the store's database
+DATA_FRAME_VERSION = 3
+
+# 2010-03-16T16:39:02.000Z
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+# Keys of a document's 'identifiers' dict that get their own column
+IDENTIFIER_TYPES = ['issn', 'pmid', 'doi', 'isbn', 'arxiv', 'scopus']
+
+# Columns of the documents parsed when there is a store (see Sync). Other
+# values are read from the JSON in the store when they are needed.
+DATA_FRAME_COLUMNS = ['created', 'last_modified'] + IDENTIFIER_TYPES
+
+
+def _get_trash_check_time(trash_state, newest_modified_time):
     """
-    
+    Returns the time after which changes to the trash need to be requested.
+    This is the most recent modification of any document we know of, either
+    in the trash or in the library. Like the other update checks this uses
+    the server's times rather than the local clock.
+    """
+    times = [parse_datetime(x) for x in trash_state.values() if x is not None]
+    if newest_modified_time is not None:
+        times.append(newest_modified_time)
+
+    if len(times) == 0:
+        return None
+    else:
+        return max(times)
+
+
+def _get_identifier_list(**kwargs):
+    """
+    Used to resolve the identifier arguments of UserLibrary.get_documents
+    and UserLibrary.contains_many
+
+    Returns
+    -------
+    (id_type, values)
+        id_type is a key of identifiers.NORMALIZERS, e.g. 'doi' for dois
+    """
+    specified = [(key, value) for key, value in kwargs.items() if value is not None]
+    if len(specified) != 1:
+        raise ValueError('Exactly one type of identifier must be specified')
+
+    key, values = specified[0]
+    # dois => doi
+    return key[:-1], values
+
+
+def _raw_to_data_frame(raw, include_json=True, columns=None):
+    """
+    Parameters
+    ----------
+    raw : list of dicts
+        JSON of the documents
+    include_json : bool (default True)
+        If true, the JSON of each document is placed in the 'json' column.
+    columns : list of strings (default None)
+        If passed in, only these columns are created (see
+        DATA_FRAME_COLUMNS) rather than a column for each key of the JSON.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Indexed by document id. The 'created' and 'last_modified' columns
+        are converted to datetimes and each of the IDENTIFIER_TYPES gets its
+        own column ('' if the document doesn't have that identifier).
     """
+    if columns is not None:
+        return _raw_to_columns(raw, include_json, columns)
+
     # Note that I'm not using the local attribute
     # as we can then use this for updating new information
     df = pd.DataFrame(raw)
@@ -518,25 +1193,64 @@ def _raw_to_data_frame(raw, include_json=True):
     if include_json:
         df['json'] = raw
 
-    # 2010-03-16T16:39:02.000Z
-    # https://github.com/closeio/ciso8601
-    # t2 = time.clock()
-    df['created'] = df['created'].apply(parse_datetime)
-    # print(time.clock() - t2)
-    # strptime("2008-09-03T20:56:35.450686Z", "%Y-%m-%dT%H:%M:%S.%fZ")
+    df['created'] = _parse_datetimes(df['created'])
+    df['last_modified'] = _parse_datetimes(df['last_modified'])
+
+    # The identifier dicts are normalized once (missing or null identifiers
+    # become empty dicts) and then each identifier column is pulled out of
+    # them. This is faster than running a separate apply() per column.
+    if 'identifiers' in df:
+        empty = {}
+        identifiers = [x if isinstance(x, dict) else empty for x in df['identifiers']]
+    else:
+        identifiers = [{}] * len(df)
 
-    # t2 = time.clock()
-    df['last_modified'] = df['last_modified'].apply(parse_datetime)
-    # print(time.clock() - t2)
-    df['issn'] = df['identifiers'].apply(parse_issn)
-    df['pmid'] = df['identifiers'].apply(parse_pmid)
-    df['doi'] = df['identifiers'].apply(parse_doi)
+    for key in IDENTIFIER_TYPES:
+        df[key] = [x.get(key, '') for x in identifiers]
 
     return df
 
 
+def _raw_to_columns(raw, include_json, columns):
+    """
+    Creates only the requested columns, without building a column for every
+    value in the JSON, see _raw_to_data_frame
+    """
+    ids = [x['id'] for x in raw]
+    empty = {}
+    identifiers = [x.get('identifiers') or empty for x in raw]
+
+    data = {}
+    for key in columns:
+        if key in ('created', 'last_modified'):
+            values = pd.Series([x.get(key) for x in raw], dtype=object)
+            data[key] = _parse_datetimes(values).values
+        elif key in IDENTIFIER_TYPES:
+            data[key] = [x.get(key, '') for x in identifiers]
+        else:
+            data[key] = [x.get(key) for x in raw]
+
+    df = pd.DataFrame(data, index=pd.Index(ids, name='id'), columns=columns)
+    if include_json:
+        df['json'] = raw
+    return df
+
+
+def _parse_datetimes(values):
+    """
+    Converts a Series of timestamp strings (see DATETIME_FORMAT) to
+    datetimes. This gives the same result as calling parse_datetime on each
+    value.
+
+    Without the trailing 'Z' the values can be parsed by pandas' ISO 8601
+    parser, which is roughly 10x faster than parsing with DATETIME_FORMAT
+    or calling parse_datetime on each value.
+    """
+    return pd.to_datetime(values.str.rstrip('Z'), format="%Y-%m-%dT%H:%M:%S.%f")
+
+
 def parse_datetime(x):
-    return datetime.strptime(x, "%Y-%m-%dT%H:%M:%S.%fZ")
+    return datetime.strptime(x, DATETIME_FORMAT)
 
 
 # def datetime_to_string(x):
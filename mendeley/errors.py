@@ -20,3 +20,6 @@ class PDFError(Exception):
 
 class AuthException(Exception):
     pass
+
+class FileHashError(Exception):
+    pass
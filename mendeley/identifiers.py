@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Normalization of document identifiers (DOI, PMID, etc.).
+
+Identifiers are normalized so that the same identifier written in different
+ways is treated as a single value, for example DOIs regardless of case (DOIs
+are case insensitive) or of a leading 'https://doi.org/'.
+
+See Also
+--------
+mendeley.client.index.IdentifierIndex
+mendeley.api.API.catalog_many
+
+"""
+
+
+DOI_PREFIXES = ['https://doi.org/', 'http://doi.org/',
+                'https://dx.doi.org/', 'http://dx.doi.org/', 'doi:']
+
+
+def normalize_doi(value):
+    value = value.strip().lower()
+    for prefix in DOI_PREFIXES:
+        if value.startswith(prefix):
+            return value[len(prefix):]
+    return value
+
+
+def normalize_pmid(value):
+    return value.strip()
+
+
+def normalize_issn(value):
+    # 1751-7214 and 17517214 are treated as the same value
+    return value.strip().replace('-', '').upper()
+
+
+def normalize_isbn(value):
+    return value.strip().replace('-', '').replace(' ', '').upper()
+
+
+def normalize_arxiv(value):
+    value = value.strip().lower()
+    if value.startswith('arxiv:'):
+        return value[6:]
+    return value
+
+
+# Identifier types along with their normalization function.
+# The names match the columns created by client_library._raw_to_data_frame
+NORMALIZERS = {'doi': normalize_doi,
+               'pmid': normalize_pmid,
+               'issn': normalize_issn,
+               'isbn': normalize_isbn,
+               'arxiv': normalize_arxiv}
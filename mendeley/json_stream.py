@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental decoding of JSON arrays. This allows the documents of a page to
+be processed as the response is received, rather than after the entire
+response has been received and decoded.
+
+Only the top level array is parsed incrementally. Each element (e.g. a
+document) is decoded with the standard json module once all of its text has
+been received.
+
+See Also
+--------
+mendeley.models.DocumentSet.iter_page_json
+
+"""
+
+#Standard Library
+import codecs
+import json
+import re
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Characters that can follow a complete value
+_DELIMITERS = ' \t\n\r,]'
+
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_array(chunks):
+    """
+    Yields the elements of a JSON array.
+
+    Parameters
+    ----------
+    chunks : iterable of strings
+        Consecutive pieces of the JSON text. These can be split anywhere.
+
+    Raises
+    ------
+    ValueError
+        If the text is not a valid JSON array.
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+
+    # The unprocessed text is buffer[pos:]
+    buffer = ''
+    pos = 0
+    exhausted = False
+
+    # 'start' : expecting '['
+    # 'first' : expecting the first value or ']'
+    # 'value' : expecting a value
+    # 'separator' : expecting ',' or ']'
+    state = 'start'
+
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+
+        if pos == len(buffer):
+            if exhausted:
+                raise ValueError('Incomplete JSON array')
+            buffer, pos, exhausted = _read_more(chunks, buffer, pos)
+            continue
+
+        char = buffer[pos]
+        if state == 'start':
+            if char != '[':
+                raise ValueError('Expected a JSON array, found: %r' % buffer[pos:pos + 20])
+            pos += 1
+            state = 'first'
+        elif state == 'separator':
+            if char == ',':
+                pos += 1
+                state = 'value'
+            elif char == ']':
+                return
+            else:
+                raise ValueError('Expected "," or "]", found: %r' % buffer[pos:pos + 20])
+        elif state == 'first' and char == ']':
+            return
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                # Most likely the value hasn't been fully received yet
+                if exhausted:
+                    raise
+                buffer, pos, exhausted = _read_more(chunks, buffer, pos)
+                continue
+
+            if not exhausted and (end == len(buffer) or buffer[end] not in _DELIMITERS):
+                # The value may continue in the next chunk, e.g. '1' of '1.5'
+                buffer, pos, exhausted = _read_more(chunks, buffer, pos)
+                continue
+
+            pos = end
+            state = 'separator'
+            yield value
+
+
+def _read_more(chunks, buffer, pos):
+    """
+    Returns (buffer, pos, exhausted) with the next chunk appended to the
+    buffer. The processed part of the buffer is discarded.
+    """
+    try:
+        chunk = next(chunks)
+    except StopIteration:
+        return buffer, pos, True
+    return buffer[pos:] + chunk, 0, False
+
+
+def iter_response_array(response, chunk_size=CHUNK_SIZE):
+    """
+    Yields the elements of a JSON array from a response made with
+    stream=True.
+
+    Parameters
+    ----------
+    response : requests.Response
+    chunk_size : int
+        Number of bytes to read at a time.
+    """
+    return iter_array(_iter_text(response, chunk_size))
+
+
+def _iter_text(response, chunk_size):
+    # JSON from the API is UTF-8. The decoder handles characters that are
+    # split between chunks.
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in response.iter_content(chunk_size):
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
@@ -0,0 +1,807 @@
+# -*- coding: utf-8 -*-
+"""
+A local stand-in for the Mendeley API. This allows the API, the client
+library and the benchmarks to be run without credentials for (or requests to)
+api.mendeley.com.
+
+The server runs in a background thread and keeps its state in memory. The
+following are implemented:
+
+    /oauth/token
+    /documents
+    /trash
+    /deleted_documents
+    /catalog
+    /files
+    /folders
+    /academic_statuses, /subject_areas, /document_types
+
+Responses are paginated using 'Link' headers (as done by Mendeley). JSON
+responses to GET requests have an ETag, and conditional requests
+(If-None-Match) are answered with 304 when the response is unchanged. Latency,
+library size and failures (e.g. 503 or 429 with Retry-After) can be
+configured.
+
+General Usage
+-------------
+from mendeley.mock_server import MockServer
+
+with MockServer(n_documents=5000, latency=0.01) as server:
+    m = server.get_api()
+    doc_set = m.documents.get(limit=500, view='all')
+
+    server.modify_documents(2)
+    server.fail_next(status=503)
+
+    from mendeley.client_library import UserLibrary
+    lib = UserLibrary(api=m)
+
+Entering the server (or calling install()) points api.BASE_URL at the
+server. This is undone on exit (or by uninstall()).
+
+See Also
+--------
+benchmarks/
+
+"""
+
+#Standard Library
+import datetime
+import hashlib
+import json
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qsl, urlencode, urlparse
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib import urlencode
+    from urlparse import parse_qsl, urlparse
+
+#Third party
+import pytz
+
+#Local Imports
+from . import api
+from . import async_api
+from . import auth
+from . import cache
+from . import utils
+
+
+BASE_TIME = datetime.datetime(2010, 1, 1)
+
+PROFILE_ID = '11111111-1111-1111-1111-111111111111'
+
+# Fields returned when no view is specified
+DEFAULT_VIEW_FIELDS = ['id', 'title', 'type', 'profile_id', 'group_id',
+                       'created', 'last_modified', 'abstract', 'source',
+                       'year', 'authors', 'identifiers', 'keywords']
+
+CATALOG_FIELDS = ['title', 'type', 'authors', 'year', 'source',
+                  'identifiers', 'keywords', 'abstract']
+
+CATALOG_IDENTIFIERS = ['doi', 'pmid', 'issn', 'isbn', 'arxiv', 'scopus']
+
+# Returned by the definitions endpoints
+DEFINITIONS = {
+    'academic_statuses': [{'description': 'Student  > Ph. D. Student'},
+                          {'description': 'Researcher'},
+                          {'description': 'Professor'}],
+    'subject_areas': [{'id': '%d' % i, 'name': name} for i, name in
+                      enumerate(['Biological Sciences', 'Chemistry',
+                                 'Computer Science', 'Engineering'])],
+    'document_types': [{'name': name, 'description': name.replace('_', ' ').title()}
+                       for name in ['journal', 'book', 'book_section', 'conference_proceedings',
+                                    'thesis', 'patent', 'report', 'web_page']]}
+
+
+def format_time(value):
+    # 2010-03-16T16:39:02.000Z
+    return value.strftime('%Y-%m-%dT%H:%M:%S.') + '%03dZ' % (value.microsecond // 1000)
+
+
+def _normalize_time(value):
+    """
+    Times in queries may have more digits for the fraction of a second
+    (e.g. from datetime.strftime) than the times of the documents. They are
+    converted to the same format so that they can be compared as strings.
+    """
+    if value is None:
+        return None
+    return format_time(datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%fZ'))
+
+
+def make_document(i):
+    """
+    Returns the JSON of a fake document, structured like those returned with
+    view='all'. The same value of i always gives the same document.
+    """
+    created = BASE_TIME + datetime.timedelta(minutes=i)
+    last_modified = created + datetime.timedelta(days=i % 30)
+
+    identifiers = {'doi': '10.1000/J.TEST.%d' % i,
+                   'issn': '1234567%d' % (i % 10)}
+    if i % 2 == 0:
+        identifiers['pmid'] = str(10000000 + i)
+    if i % 7 == 0:
+        identifiers['isbn'] = '978316148%04d' % (i % 10000)
+    if i % 11 == 0:
+        identifiers['arxiv'] = '1501.%05d' % (i % 100000)
+
+    return {'id': '00000000-0000-0000-0000-%012d' % i,
+            'title': 'Document %d' % i,
+            'type': 'journal',
+            'profile_id': PROFILE_ID,
+            'created': format_time(created),
+            'last_modified': format_time(last_modified),
+            'year': 2000 + i % 17,
+            'source': 'Journal %d' % (i % 50),
+            'identifiers': identifiers,
+            'authors': [{'first_name': 'First%d' % j, 'last_name': 'Last%d' % j}
+                        for j in range(i % 5 + 1)],
+            'keywords': ['keyword%d' % (i % 13)],
+            'abstract': 'Abstract of document %d. ' % i * 5,
+            'hidden': False,
+            'file_attached': i % 3 == 0,
+            'read': False,
+            'starred': False,
+            'authored': False,
+            'confirmed': True}
+
+
+def make_documents(n):
+    return [make_document(i) for i in range(n)]
+
+
+class MockServer(object):
+    """
+    Attributes
+    ----------
+    url : string
+        e.g. 'http://127.0.0.1:51234'. Only valid once started.
+    latency : float
+        Seconds to wait before responding to each request.
+    failure_rate : float
+        Fraction (0 - 1) of requests that randomly fail with failure_status.
+    failure_status : int
+    max_page_size : int
+        The largest 'limit' honored when paginating.
+    token_lifetime : int
+        Seconds until issued access tokens expire.
+    documents : dict
+        Documents in the library (id => JSON), in order of creation.
+    trash : dict
+        Documents in the trash (id => JSON).
+    deleted : list of (id, deletion time) tuples
+    files : dict
+        File id => {'json': file JSON, 'content': bytes}
+    folders : dict
+        Folder id => JSON
+    n_requests : int
+    request_counts : dict
+        (method, first path segment) => number of requests, e.g.
+        ('GET', 'documents') => 12
+    last_headers : dict
+        (method, first path segment) => headers of the last request
+
+    """
+
+    def __init__(self, n_documents=1000, latency=0, failure_rate=0,
+                 failure_status=503, max_page_size=500, token_lifetime=3600,
+                 seed=0, host='127.0.0.1', port=0):
+        """
+        Parameters
+        ----------
+        n_documents : int (default 1000)
+            Number of (generated) documents initially in the library.
+        latency : float (default 0)
+        failure_rate : float (default 0)
+        failure_status : int (default 503)
+        max_page_size : int (default 500)
+        token_lifetime : int (default 3600)
+        seed : int (default 0)
+            Seed for the random failures.
+        host : string (default '127.0.0.1')
+        port : int (default 0)
+            0 means any free port.
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.max_page_size = max_page_size
+        self.token_lifetime = token_lifetime
+        self.host = host
+        self.port = port
+        self.url = None
+
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+
+        self.documents = dict((x['id'], x) for x in make_documents(n_documents))
+        self.n_generated = n_documents
+        self.trash = {}
+        self.deleted = []
+        self.files = {}
+        self.folders = {}
+        self.tokens = set()
+
+        self.n_requests = 0
+        self.request_counts = {}
+        self.last_headers = {}
+
+        self._scheduled_failures = []
+        # Sorted and filtered document lists, so that each page of a large
+        # library doesn't require sorting the entire library again
+        self._list_cache = {}
+        self._last_time = None
+        self._http_server = None
+        self._thread = None
+        self._old_base_url = None
+
+        self.routes = [
+            ('POST', r'/oauth/token', self._create_token),
+            ('GET', r'/documents', self._get_documents),
+            ('POST', r'/documents', self._create_document),
+            ('GET', r'/documents/([^/]+)', self._get_document),
+            ('PATCH', r'/documents/([^/]+)', self._update_document),
+            ('DELETE', r'/documents/([^/]+)', self._delete_document),
+            ('POST', r'/documents/([^/]+)/trash', self._trash_document),
+            ('GET', r'/trash', self._get_trash),
+            ('GET', r'/trash/([^/]+)', self._get_trashed_document),
+            ('DELETE', r'/trash/([^/]+)', self._delete_trashed_document),
+            ('POST', r'/trash/([^/]+)/restore', self._restore_document),
+            ('GET', r'/deleted_documents', self._get_deleted_documents),
+            ('GET', r'/catalog', self._get_catalog),
+            ('GET', r'/catalog/([^/]+)', self._get_catalog_document),
+            ('GET', r'/files', self._get_files),
+            ('POST', r'/files', self._create_file),
+            ('GET', r'/files/([^/]+)', self._get_file_content),
+            ('DELETE', r'/files/([^/]+)', self._delete_file),
+            ('GET', r'/folders', self._get_folders),
+            ('POST', r'/folders', self._create_folder),
+            ('GET', r'/folders/([^/]+)', self._get_folder),
+            ('GET', r'/(academic_statuses|subject_areas|document_types)', self._get_definitions)]
+        self.routes = [(method, re.compile(pattern + '$'), fcn)
+                       for method, pattern, fcn in self.routes]
+
+    #Server control
+    #--------------------------------------------------------------------------
+    def start(self):
+        handler = type('_Handler', (_RequestHandler,), {'mock': self})
+        self._http_server = _ThreadingHTTPServer((self.host, self.port), handler)
+        host, port = self._http_server.server_address[:2]
+        self.url = 'http://%s:%d' % (host, port)
+
+        self._thread = threading.Thread(target=self._http_server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._http_server is not None:
+            self._http_server.shutdown()
+            self._http_server.server_close()
+            self._thread.join()
+            self._http_server = None
+
+    def install(self):
+        """
+        Directs requests made by mendeley.api (and async_api) to this server.
+        """
+        if self._old_base_url is None:
+            self._old_base_url = api.BASE_URL
+        api.BASE_URL = self.url
+
+    def uninstall(self):
+        if self._old_base_url is not None:
+            api.BASE_URL = self._old_base_url
+            self._old_base_url = None
+
+    def __enter__(self):
+        self.start()
+        self.install()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.uninstall()
+        self.stop()
+
+    def get_api(self, user_name='mock', **kwargs):
+        """
+        Returns an API instance authorized by this server. Keyword arguments
+        are passed to API (e.g. transport). Unless given, the catalog cache
+        of the API is only held in memory.
+        """
+        token = MockAuthorization(self, user_name)
+        kwargs.setdefault('catalog_cache', cache.TTLCache())
+        return api.API(access_token=token, **kwargs)
+
+    def get_async_api(self, user_name='mock', **kwargs):
+        """
+        Returns an async_api.AsyncAPI instance authorized by this server,
+        see get_api(). It needs to be closed once done.
+        """
+        token = MockAuthorization(self, user_name)
+        kwargs.setdefault('catalog_cache', cache.TTLCache())
+        return async_api.AsyncAPI(access_token=token, **kwargs)
+
+    #Changing the library
+    #--------------------------------------------------------------------------
+    def fail_next(self, n=1, status=503, retry_after=None, skip=0):
+        """
+        Makes the next n requests fail with the given status, after 'skip'
+        requests that are handled normally.
+        """
+        with self.lock:
+            self._scheduled_failures.extend([None] * skip + [(status, retry_after)] * n)
+
+    def add_documents(self, n):
+        """
+        Adds n generated documents, created now. Returns their ids.
+        """
+        with self.lock:
+            self._list_cache.clear()
+            ids = []
+            for i in range(n):
+                doc = make_document(self.n_generated)
+                self.n_generated += 1
+                doc['created'] = doc['last_modified'] = self._now()
+                self.documents[doc['id']] = doc
+                ids.append(doc['id'])
+            return ids
+
+    def modify_documents(self, n=None, doc_ids=None):
+        """
+        Modifies either the specified documents or n randomly chosen ones.
+        Returns the ids of the modified documents.
+        """
+        with self.lock:
+            self._list_cache.clear()
+            if doc_ids is None:
+                doc_ids = self.random.sample(sorted(self.documents), n)
+            for doc_id in doc_ids:
+                doc = self.documents[doc_id]
+                doc['title'] += ' (modified)'
+                doc['last_modified'] = self._now()
+            return doc_ids
+
+    def trash_documents(self, n=None, doc_ids=None):
+        with self.lock:
+            self._list_cache.clear()
+            if doc_ids is None:
+                doc_ids = self.random.sample(sorted(self.documents), n)
+            for doc_id in doc_ids:
+                self._move_to_trash(doc_id)
+            return doc_ids
+
+    def restore_documents(self, doc_ids):
+        """
+        Moves documents from the trash back to the library.
+        """
+        with self.lock:
+            self._list_cache.clear()
+            for doc_id in doc_ids:
+                doc = self.trash.pop(doc_id)
+                doc['last_modified'] = self._now()
+                self.documents[doc_id] = doc
+            return doc_ids
+
+    def delete_documents(self, n=None, doc_ids=None):
+        with self.lock:
+            self._list_cache.clear()
+            if doc_ids is None:
+                doc_ids = self.random.sample(sorted(self.documents), n)
+            for doc_id in doc_ids:
+                del self.documents[doc_id]
+                self.deleted.append((doc_id, self._now()))
+            return doc_ids
+
+    def _move_to_trash(self, doc_id):
+        doc = self.documents.pop(doc_id)
+        doc['last_modified'] = self._now()
+        self.trash[doc_id] = doc
+
+    def _now(self):
+        # Times are unique so that 'modified since' queries are exact
+        now = datetime.datetime.utcnow()
+        now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        if self._last_time is not None and now <= self._last_time:
+            now = self._last_time + datetime.timedelta(milliseconds=1)
+        self._last_time = now
+        return format_time(now)
+
+    #Request handling
+    #--------------------------------------------------------------------------
+    def handle(self, method, path, query, headers, body):
+        """
+        Returns
+        -------
+        (status, headers, body)
+            body is a JSON compatible value, bytes, or None
+        """
+        with self.lock:
+            self.n_requests += 1
+            key = (method, path.strip('/').split('/')[0])
+            self.request_counts[key] = self.request_counts.get(key, 0) + 1
+            self.last_headers[key] = headers
+
+            if self._scheduled_failures:
+                failure = self._scheduled_failures.pop(0)
+            elif self.failure_rate and self.random.random() < self.failure_rate:
+                failure = (self.failure_status, None)
+            else:
+                failure = None
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if failure is not None:
+            status, retry_after = failure
+            response_headers = {}
+            if retry_after is not None:
+                response_headers['Retry-After'] = '%s' % retry_after
+            return status, response_headers, {'message': 'Injected failure'}
+
+        path = path.rstrip('/')
+        if path != '/oauth/token' and not self._is_authorized(headers):
+            return 401, {}, {'message': 'Missing or invalid access token'}
+
+        for route_method, pattern, fcn in self.routes:
+            match = pattern.match(path)
+            if match and route_method == method:
+                with self.lock:
+                    if method != 'GET':
+                        self._list_cache.clear()
+                    return fcn(query, headers, body, *match.groups())
+
+        return 404, {}, {'message': 'Not found: %s %s' % (method, path)}
+
+    def _is_authorized(self, headers):
+        value = headers.get('Authorization', '')
+        if not value.lower().startswith('bearer '):
+            return False
+        with self.lock:
+            return value[7:] in self.tokens
+
+    def _paginate(self, path, items, query):
+        """
+        The marker is the offset of the first item of the page.
+        """
+        limit = min(int(query.get('limit', 20)), self.max_page_size)
+        offset = int(query.get('marker', 0))
+        page = items[offset:offset + limit]
+
+        headers = {'Mendeley-Count': '%d' % len(items)}
+        if offset + limit < len(items):
+            next_query = dict(query, marker=offset + limit)
+            next_url = '%s%s?%s' % (self.url, path, urlencode(sorted(next_query.items())))
+            headers['Link'] = '<%s>; rel="next"' % next_url
+
+        return 200, headers, page
+
+    def _get_document_list(self, path, source, query):
+        modified_since = _normalize_time(query.get('modified_since'))
+        view = query.get('view')
+
+        key = (path, modified_since, view)
+        if key not in self._list_cache:
+            docs = sorted(source.values(), key=lambda x: (x['created'], x['id']))
+            if modified_since is not None:
+                docs = [x for x in docs if x['last_modified'] > modified_since]
+            self._list_cache[key] = [_apply_view(x, view) for x in docs]
+
+        return self._paginate(path, self._list_cache[key], query)
+
+    def _create_token(self, query, headers, body):
+        token = uuid.uuid4().hex
+        self.tokens.add(token)
+        return 200, {}, {'access_token': token,
+                         'token_type': 'bearer',
+                         'expires_in': self.token_lifetime,
+                         'refresh_token': uuid.uuid4().hex}
+
+    def _get_documents(self, query, headers, body):
+        deleted_since = _normalize_time(query.get('deleted_since'))
+        if deleted_since is not None:
+            items = [{'id': doc_id} for doc_id, t in self.deleted if t > deleted_since]
+            return self._paginate('/documents', items, query)
+        return self._get_document_list('/documents', self.documents, query)
+
+    def _create_document(self, query, headers, body):
+        doc = json.loads(body.decode('utf-8'))
+        doc['id'] = str(uuid.uuid4())
+        doc['profile_id'] = PROFILE_ID
+        doc['created'] = doc['last_modified'] = self._now()
+        for key in ['hidden', 'file_attached', 'read', 'starred', 'authored']:
+            doc.setdefault(key, False)
+        self.documents[doc['id']] = doc
+        # As with the API, the response is not the 'all' view
+        return 201, {}, _apply_view(doc, None)
+
+    def _get_document(self, query, headers, body, doc_id):
+        if doc_id not in self.documents:
+            return 404, {}, {'message': 'Document not found'}
+        return 200, {}, _apply_view(self.documents[doc_id], query.get('view'))
+
+    def _update_document(self, query, headers, body, doc_id):
+        if doc_id not in self.documents:
+            return 404, {}, {'message': 'Document not found'}
+        doc = self.documents[doc_id]
+        doc.update(json.loads(body.decode('utf-8')))
+        doc['last_modified'] = self._now()
+        return 200, {}, _apply_view(doc, None)
+
+    def _delete_document(self, query, headers, body, doc_id):
+        if doc_id not in self.documents:
+            return 404, {}, {'message': 'Document not found'}
+        self.delete_documents(doc_ids=[doc_id])
+        return 204, {}, None
+
+    def _trash_document(self, query, headers, body, doc_id):
+        if doc_id not in self.documents:
+            return 404, {}, {'message': 'Document not found'}
+        self._move_to_trash(doc_id)
+        return 204, {}, None
+
+    def _get_trash(self, query, headers, body):
+        return self._get_document_list('/trash', self.trash, query)
+
+    def _get_trashed_document(self, query, headers, body, doc_id):
+        if doc_id not in self.trash:
+            return 404, {}, {'message': 'Document not found'}
+        return 200, {}, _apply_view(self.trash[doc_id], query.get('view'))
+
+    def _delete_trashed_document(self, query, headers, body, doc_id):
+        if doc_id not in self.trash:
+            return 404, {}, {'message': 'Document not found'}
+        del self.trash[doc_id]
+        self.deleted.append((doc_id, self._now()))
+        return 204, {}, None
+
+    def _restore_document(self, query, headers, body, doc_id):
+        if doc_id not in self.trash:
+            return 404, {}, {'message': 'Document not found'}
+        self.restore_documents([doc_id])
+        return 204, {}, None
+
+    def _get_deleted_documents(self, query, headers, body):
+        since = _normalize_time(query.get('since')) or ''
+        return 200, {}, [{'id': doc_id} for doc_id, t in self.deleted if t > since]
+
+    def _get_catalog(self, query, headers, body):
+        matches = []
+        for id_type in CATALOG_IDENTIFIERS:
+            value = query.get(id_type)
+            if value is None:
+                continue
+            value = value.lower()
+            for doc in self.documents.values():
+                if doc.get('identifiers', {}).get(id_type, '').lower() == value:
+                    matches.append(_to_catalog_entry(doc, query.get('view')))
+        return 200, {}, matches
+
+    def _get_catalog_document(self, query, headers, body, catalog_id):
+        for doc in self.documents.values():
+            if _get_catalog_id(doc) == catalog_id:
+                return 200, {}, _to_catalog_entry(doc, query.get('view'))
+        return 404, {}, {'message': 'Catalog document not found'}
+
+    def _get_files(self, query, headers, body):
+        doc_id = query.get('document_id')
+        files = [x['json'] for x in self.files.values()
+                 if doc_id is None or x['json']['document_id'] == doc_id]
+        return self._paginate('/files', files, query)
+
+    def _create_file(self, query, headers, body):
+        # Link: <https://api.mendeley.com/documents/{id}>; rel="document"
+        match = re.search(r'/documents/([^/>]+)>', headers.get('Link', ''))
+        if match is None:
+            return 400, {}, {'message': 'Missing document link'}
+        doc_id = match.group(1)
+        if doc_id not in self.documents:
+            return 404, {}, {'message': 'Document not found'}
+
+        match = re.search(r'filename="?([^";]+)"?', headers.get('Content-Disposition', ''))
+        file_name = 'file.pdf' if match is None else match.group(1)
+
+        file_json = {'id': str(uuid.uuid4()),
+                     'document_id': doc_id,
+                     'mime_type': headers.get('Content-Type', 'application/pdf'),
+                     'file_name': file_name,
+                     'size': len(body),
+                     'filehash': hashlib.sha1(body).hexdigest()}
+        self.files[file_json['id']] = {'json': file_json, 'content': body}
+        self.documents[doc_id]['file_attached'] = True
+        return 201, {}, file_json
+
+    def _get_file_content(self, query, headers, body, file_id):
+        if file_id not in self.files:
+            return 404, {}, {'message': 'File not found'}
+        entry = self.files[file_id]
+        response_headers = {'Content-Type': entry['json']['mime_type'],
+                            'Content-Disposition': 'attachment; filename="%s"'
+                                                   % entry['json']['file_name']}
+        return 200, response_headers, entry['content']
+
+    def _delete_file(self, query, headers, body, file_id):
+        if file_id not in self.files:
+            return 404, {}, {'message': 'File not found'}
+        del self.files[file_id]
+        return 204, {}, None
+
+    def _get_folders(self, query, headers, body):
+        return self._paginate('/folders', list(self.folders.values()), query)
+
+    def _create_folder(self, query, headers, body):
+        folder = json.loads(body.decode('utf-8'))
+        folder['id'] = str(uuid.uuid4())
+        folder['created'] = self._now()
+        self.folders[folder['id']] = folder
+        return 201, {}, folder
+
+    def _get_folder(self, query, headers, body, folder_id):
+        if folder_id not in self.folders:
+            return 404, {}, {'message': 'Folder not found'}
+        return 200, {}, self.folders[folder_id]
+
+    def _get_definitions(self, query, headers, body, name):
+        return 200, {}, DEFINITIONS[name]
+
+    def __repr__(self):
+        pv = ['url', self.url,
+              'latency', self.latency,
+              'failure_rate', self.failure_rate,
+              'n_documents', '%d' % len(self.documents),
+              'n_trash', '%d' % len(self.trash),
+              'n_deleted', '%d' % len(self.deleted),
+              'n_files', '%d' % len(self.files),
+              'n_requests', '%d' % self.n_requests]
+        return utils.property_values_to_string(pv)
+
+
+class MockAuthorization(auth._Authorization):
+    """
+    Access token from a MockServer. Unlike the other authorization classes
+    this is never saved to disk.
+    """
+
+    def __init__(self, server, user_name='mock'):
+        self.user_name = user_name
+        self.AUTH_URL = server.url + '/oauth/token'
+        self.populate_session()
+        self.renew_token()
+
+    def renew_token(self):
+        r = self.session.post(self.AUTH_URL, data={'grant_type': 'client_credentials'})
+        json = r.json()
+        self.access_token = json['access_token']
+        self.token_type = json['token_type']
+        self.expires = datetime.datetime.now(pytz.utc) + \
+            datetime.timedelta(seconds=json['expires_in'])
+
+    def save(self):
+        pass
+
+    def get_lock_path(self):
+        return None
+
+    def __repr__(self):
+        pv = ['user_name', self.user_name,
+              'access_token', self.access_token,
+              'expires', str(self.expires)]
+        return utils.property_values_to_string(pv)
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        # Avoids a slow reverse DNS lookup done by HTTPServer.server_bind
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(self.server_address)
+        self.server_address = self.socket.getsockname()
+        self.server_name = self.server_address[0]
+        self.server_port = self.server_address[1]
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+
+    # Keep-alive, so that sessions reuse connections as they would with
+    # the real API
+    protocol_version = 'HTTP/1.1'
+
+    # Set for each server, see MockServer.start
+    mock = None
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def _handle(self, method):
+        url = urlparse(self.path)
+        query = dict(parse_qsl(url.query))
+        body = self._read_body()
+
+        status, headers, content = self.mock.handle(method, url.path, query,
+                                                    self.headers, body)
+
+        if content is None:
+            data = b''
+        elif isinstance(content, bytes):
+            data = content
+        else:
+            data = json.dumps(content).encode('utf-8')
+            headers.setdefault('Content-Type', 'application/json')
+            if method == 'GET' and status == 200:
+                headers['ETag'] = '"%s"' % hashlib.md5(data).hexdigest()
+                if self.headers.get('If-None-Match') == headers['ETag']:
+                    status = 304
+                    data = b''
+
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', '%d' % len(data))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip().split(b';')[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b''.join(chunks)
+
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length) if length else b''
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _apply_view(doc, view):
+    if view is None:
+        return dict((k, doc[k]) for k in DEFAULT_VIEW_FIELDS if k in doc)
+    else:
+        return doc
+
+
+def _get_catalog_id(doc):
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, doc['id']))
+
+
+def _to_catalog_entry(doc, view):
+    entry = dict((k, doc[k]) for k in CATALOG_FIELDS if k in doc)
+    entry['id'] = _get_catalog_id(doc)
+    entry['link'] = 'https://www.mendeley.com/catalogue/%s/' % entry['id']
+    if view in ('bib', 'all'):
+        entry.update(issue='1', pages='1-10', volume='1')
+    if view in ('stats', 'all'):
+        entry.update(reader_count=int(hashlib.md5(doc['id'].encode('utf-8')).hexdigest()[:4], 16),
+                     group_count=0,
+                     reader_count_by_academic_status={},
+                     reader_count_by_country={},
+                     reader_count_by_subdiscipline={})
+    return entry
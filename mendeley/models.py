@@ -15,6 +15,10 @@ mendeley.api => contains the code that makes requests for these models
 
 """
 
+#Standard Library
+import queue
+import threading
+
 #Local Imports
 from .utils import get_truncated_display_string as td
 from .utils import get_list_class_display as cld
@@ -59,6 +63,25 @@ class ResponseObject(object):
     # Persons
     object_fields = {}
 
+    # If true, the result of processing an object field is stored on the
+    # instance, so that it is only processed on the first access
+    cache_object_fields = True
+
+    # The names returned by fields(), so that the list of fields isn't built
+    # on every attribute access. Each class gets its own set, which is
+    # created on first use rather than when the class is created, as fields()
+    # of a subclass refers to the subclass by name (via super).
+    _field_set = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super(ResponseObject, cls).__init_subclass__(**kwargs)
+        cls._field_set = None
+
+    @classmethod
+    def _init_field_set(cls):
+        cls._field_set = frozenset(cls.fields())
+        return cls._field_set
+
     def __init__(self, json):
         """
         This class stores the raw JSON in case an attribute from this instance
@@ -81,7 +104,11 @@ class ResponseObject(object):
         spelling errors don't return none:
         e.g. document.yeear <= instead of document.year
         """
-        if name in self.fields():
+        field_set = self._field_set
+        if field_set is None:
+            field_set = self._init_field_set()
+
+        if name in field_set:
             value = self.json.get(name)
             
             #We don't call object construction methods on None values
@@ -95,7 +122,12 @@ class ResponseObject(object):
                 #Any other information needs to be explicitly bound
                 #to the method
                 method_fh = self.object_fields[name]
-                return method_fh(value)
+                value = method_fh(value)
+                if self.cache_object_fields:
+                    #Normal attribute lookup finds this value next time,
+                    #so __getattr__ isn't called again for this name
+                    self.__dict__[name] = value
+                return value
             else:
                 return value
         else:
@@ -231,31 +263,58 @@ class ProfileInfo(object):
 class DocumentSet(object):
     """
     Responsible for managing a set of documents.
+
+    Attributes
+    ----------
+    json : list of dicts
+        The documents of this page, as returned by the API.
+    docs : list
+        The documents of this page as objects (e.g. Document). These are only
+        constructed when first accessed.
     """
 
     def __init__(self, json, m, params):
         """
         Parameters
         ----------
-        json : dict
+        json : list or iterator
+            An iterator is given when the response is streamed. The documents
+            are then decoded as they are requested, see iter_page_json
         m : mendeley.api._APIMethods
         
         
         """
         # TODO: build in next and prev support
-        self.links = m.last_response.links
+        if 'links' in params:
+            self.links = params['links']
+        else:
+            self.links = m.last_response.links
         self.api = m
         self.response_params = params
+        self.prefetch = params.get('prefetch', 0)
 
-        fcn = params['fcn']
+        self.fcn = params['fcn']
+        if isinstance(json, list):
+            self._json = json
+            self._json_stream = None
+        else:
+            self._json = None
+            self._json_stream = json
+        self._docs = None
+        self.view = params['view']
 
-        import pdb
-        #pdb.set_trace()
+    @property
+    def json(self):
+        if self._json is None:
+            self._json = list(self.iter_page_json())
+        return self._json
 
-        # TODO: Figure out how to support lazy loading
-        # TODO: Support view construction
-        self.docs = [fcn(x, m) for x in json]
-        self.view = params['view']
+    @property
+    def docs(self):
+        if self._docs is None:
+            # TODO: Support view construction
+            self._docs = [self.fcn(x, self.api) for x in self.json]
+        return self._docs
 
     # TODO: These will need to call some common function
     # That function will need to figure out how to call pages
@@ -263,14 +322,78 @@ class DocumentSet(object):
 
     def __iter__(self):
         """
-        
+        Iterates over all documents, starting with this page and continuing
+        through all following pages.
+
+        See Also
+        --------
+        iter_pages
         """
-        page = self
-        while page:
+        for page in self.iter_pages():
             for single_doc in page.docs:
                 yield single_doc
 
-            page = page.next_page()
+    def iter_json(self, prefetch=None):
+        """
+        Iterates over the JSON of all documents, starting with this page and
+        continuing through all following pages. Unlike iterating over the set
+        no objects are constructed for the documents.
+
+        Parameters
+        ----------
+        prefetch : int (default None)
+            See iter_pages
+        """
+        for page in self.iter_pages(prefetch):
+            for json in page.iter_page_json():
+                yield json
+
+    def iter_page_json(self):
+        """
+        Iterates over the JSON of the documents of this page only.
+
+        If the response is being streamed, documents are decoded as they are
+        received and are not kept, so the page can only be iterated over
+        once. Accessing 'json' or 'docs' first keeps the documents.
+        """
+        if self._json is not None:
+            return iter(self._json)
+
+        stream = self._json_stream
+        if stream is None:
+            raise ValueError('The documents of a streamed page can only be read once')
+        self._json_stream = None
+        return stream
+
+    def iter_pages(self, prefetch=None):
+        """
+        Yields this page followed by all subsequent pages, in order.
+
+        Parameters
+        ----------
+        prefetch : int (default None)
+            The maximum number of pages that may be requested ahead of the
+            page currently being consumed. The requests are made by a
+            background thread. If None, the value passed to the original
+            request is used (generally 0, i.e. no prefetching).
+
+            Each page is only located via the 'next' link of the page before
+            it, so pages are still requested one after another. Prefetching
+            allows these requests to overlap with the processing of earlier
+            pages. Besides the page being processed by the caller, at most
+            'prefetch' pages are held in memory at once.
+        """
+        if prefetch is None:
+            prefetch = self.prefetch
+
+        if prefetch > 0:
+            for page in _PagePrefetcher(self, prefetch):
+                yield page
+        else:
+            page = self
+            while page:
+                yield page
+                page = page.next_page()
 
     @classmethod
     def create(cls, json, m, params):
@@ -282,11 +405,11 @@ class DocumentSet(object):
         This however needs to be clarified.
         """
 
-        if isinstance(json, list):
-            return DocumentSet(json, m, params)
-        else:
+        if isinstance(json, dict):
             fcn = params['fcn']
             return fcn(json, m)
+        else:
+            return cls(json, m, params)
 
     # TODO: We should probably include a navigation method, similar
     # to Page in mendeley.pagination
@@ -299,7 +422,7 @@ class DocumentSet(object):
             return None
         else:
             next_url = self.links['next']['url']
-            return self.api.make_get_request(next_url, DocumentSet, None, self.response_params)
+            return self.api.make_get_request(next_url, self.__class__, None, self.response_params)
 
     def previous_page(self):
         pass
@@ -312,6 +435,74 @@ class DocumentSet(object):
         return utils.property_values_to_string(pv)
 
 
+class _PagePrefetcher(object):
+    """
+    Iterates over the pages of a DocumentSet while a background thread
+    retrieves the following pages.
+
+    The background thread takes a slot from a semaphore before requesting a
+    page, and a slot is returned when the consumer takes a page. At most
+    'max_pages' pages have therefore been retrieved but not yet consumed,
+    including a page that is being requested.
+
+    See Also
+    --------
+    DocumentSet.iter_pages
+    """
+
+    # How often (in seconds) a waiting thread checks if it should stop
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, first_page, max_pages):
+        self.first_page = first_page
+        self.pages = queue.Queue()
+        self.slots = threading.Semaphore(max_pages)
+        self.stop_event = threading.Event()
+
+    def __iter__(self):
+        first_page = self.first_page
+        thread = threading.Thread(target=self._retrieve_pages)
+        thread.daemon = True
+        thread.start()
+
+        try:
+            yield first_page
+            first_page = None
+            while True:
+                page, error = self.pages.get()
+                self.slots.release()
+                if error is not None:
+                    raise error
+                elif page is None:
+                    return
+                yield page
+                page = None
+        finally:
+            # Reached if the caller stops iterating early, in which case
+            # the background thread needs to be told to stop as well
+            self.stop_event.set()
+
+    def _retrieve_pages(self):
+        # The reference is dropped so that the first page can be released
+        # once the caller is done with it
+        page = self.first_page
+        self.first_page = None
+        while page is not None:
+            while not self.slots.acquire(timeout=self.POLL_INTERVAL):
+                if self.stop_event.is_set():
+                    return
+            if self.stop_event.is_set():
+                return
+
+            try:
+                page = page.next_page()
+                entry = (page, None)
+            except Exception as e:
+                page = None
+                entry = (None, e)
+            self.pages.put(entry)
+
+
 class DeletedDocument(ResponseObject):
     def __init__(self, json, m):
         super(DeletedDocument, self).__init__(json)
@@ -346,7 +537,8 @@ class File(ResponseObject):
 
     @classmethod
     def fields(cls):
-        return ['id', 'document_id', 'created', 'file_name', 'authors', 'doi']
+        return ['id', 'document_id', 'created', 'file_name', 'authors', 'doi',
+                'filehash', 'mime_type', 'size']
 
     def __repr__(self):
         return u'' + \
@@ -473,7 +665,7 @@ class Document(ResponseObject):
         """
         return DocumentSet(json, m)
 
-    def add_file(self, file_content=None, download_file_url=None):
+    def add_file(self, file_content=None, download_file_url=None, file_path=None):
         """
 
         Parameters
@@ -486,10 +678,16 @@ class Document(ResponseObject):
         download_file_url : str
             URL to the download page
 
+        file_path : str
+            Path of a local file, which is streamed from disk.
+
         Returns
         -------
 
         """
+        if file_path is not None:
+            return self.add_file(file_content={'file': file_path})
+
         if file_content is not None:
             params = dict()
             params['title'] = self.title
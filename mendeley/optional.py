@@ -6,6 +6,7 @@ throws an error when you try and use it.
 
 rr
 pub_objects
+aiohttp
 """
 
 from .errors import OptionalLibraryError
@@ -40,3 +41,7 @@ try:
 except ImportError:
     pub_objects = MissingModule('The method called requires the library "pypub" from the Scholar Tools Github repo')
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = MissingModule('The method called requires the library "aiohttp", which can be installed using pip')
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming of file content for uploads and downloads, see api.Files.
+
+Content is read and written in fixed size pieces, so the memory needed for a
+transfer does not depend on the size of the file.
+
+Progress callbacks are called as progress(n_bytes_done, n_bytes_total),
+where n_bytes_total is None if the size is not known.
+
+See Also
+--------
+mendeley.api.Files.upload
+mendeley.api.Files.download
+
+"""
+
+#Standard Library
+import hashlib
+import io
+import os
+import re
+import tempfile
+
+#Local Imports
+from .errors import FileHashError
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ProgressReader(object):
+    """
+    File-like wrapper used as the body of an upload. Reading is done by the
+    HTTP library in small blocks. The length allows the Content-Length of
+    the request to be set, and seek(0) allows the request to be retried.
+    """
+
+    def __init__(self, file, size, progress=None):
+        self.file = file
+        self.size = size
+        self.progress = progress
+        self.n_bytes_read = 0
+        # The upload starts at the current position of the file
+        self.start = file.tell()
+
+    def __len__(self):
+        return self.size
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        self.n_bytes_read += len(data)
+        if self.progress is not None:
+            self.progress(self.n_bytes_read, self.size)
+        return data
+
+    def seek(self, offset):
+        # Used to rewind the body when the request is retried
+        self.file.seek(self.start + offset)
+        self.n_bytes_read = offset
+
+    def tell(self):
+        return self.file.tell() - self.start
+
+
+def get_upload_body(source, progress=None, chunk_size=CHUNK_SIZE):
+    """
+    Returns (body, file) for the given source. If not None, 'file' was opened
+    here and needs to be closed once the upload is done.
+
+    Parameters
+    ----------
+    source : string, bytes, file-like object or iterable of bytes
+        A string is a file path. An iterable is sent using chunked transfer
+        encoding, and can't be rewound to retry the request.
+    """
+    if isinstance(source, bytes):
+        return ProgressReader(io.BytesIO(source), len(source), progress), None
+
+    if isinstance(source, str):
+        f = open(source, 'rb')
+        return ProgressReader(f, os.fstat(f.fileno()).st_size, progress), f
+
+    if hasattr(source, 'read'):
+        size = _get_remaining_size(source)
+        if size is None:
+            return _iter_file(source, chunk_size, progress), None
+        return ProgressReader(source, size, progress), None
+
+    return _iter_with_progress(source, progress), None
+
+
+def _get_remaining_size(f):
+    try:
+        position = f.tell()
+        end = f.seek(0, os.SEEK_END)
+        f.seek(position)
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+    return end - position
+
+
+def _iter_file(f, chunk_size, progress):
+    return _iter_with_progress(iter(lambda: f.read(chunk_size), b''), progress)
+
+
+def _iter_with_progress(chunks, progress):
+    n_bytes = 0
+    for chunk in chunks:
+        n_bytes += len(chunk)
+        if progress is not None:
+            progress(n_bytes, None)
+        yield chunk
+
+
+def compute_filehash(source, chunk_size=CHUNK_SIZE):
+    """
+    Returns the SHA-1 hex digest of a file, as used for Mendeley's
+    'filehash'. The source is a file path or a file-like object.
+    """
+    sha1 = hashlib.sha1()
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                sha1.update(chunk)
+    else:
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def save_response(response, dest, filehash=None, progress=None, chunk_size=CHUNK_SIZE,
+                  rate_limiter=None):
+    """
+    Writes the body of a streamed response to a file.
+
+    The content is written to a temporary file next to the destination,
+    which is moved into place once the download is complete (and verified).
+    An existing file at the destination is therefore only replaced by a
+    complete file. See DownloadWriter
+
+    Parameters
+    ----------
+    response : requests.Response
+        Made with stream=True
+    dest : string
+        File path, or a directory in which case the file name is taken from
+        the response's Content-Disposition.
+    filehash : string (default None)
+        Expected SHA-1 of the content.
+    progress : function (default None)
+    chunk_size : int
+    rate_limiter : transport.TokenBucket (default None)
+        Bucket with a token per byte, which limits the bandwidth. It may be
+        shared by concurrent downloads.
+
+    Returns
+    -------
+    string
+        The path of the file
+
+    Raises
+    ------
+    FileHashError
+        If the content does not match filehash. Nothing is written.
+    """
+    try:
+        dest = get_download_path(dest, response.headers, response.url)
+        writer = DownloadWriter(dest, filehash, progress,
+                                get_content_length(response.headers))
+        try:
+            for chunk in response.iter_content(chunk_size):
+                if rate_limiter is not None:
+                    rate_limiter.acquire(len(chunk))
+                writer.write(chunk)
+            writer.finish()
+        except:
+            writer.abort()
+            raise
+    finally:
+        response.close()
+
+    return dest
+
+
+class DownloadWriter(object):
+    """
+    Writes downloaded content to a temporary file next to the destination,
+    computing its SHA-1 along the way. finish() moves the file into place,
+    abort() removes it. Used by save_response, and by the async version of
+    Files.download.
+    """
+
+    def __init__(self, dest, filehash=None, progress=None, total=None):
+        """
+        Parameters
+        ----------
+        dest : string
+            File path
+        filehash : string (default None)
+            Expected SHA-1 of the content.
+        progress : function (default None)
+        total : int (default None)
+            Size of the content, if known. Passed to progress.
+        """
+        self.dest = dest
+        self.filehash = filehash
+        self.progress = progress
+        self.total = total
+        self.sha1 = hashlib.sha1()
+        self.n_bytes = 0
+        fd, self.temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(dest)),
+                                              suffix='.part')
+        self.file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk):
+        self.file.write(chunk)
+        self.sha1.update(chunk)
+        self.n_bytes += len(chunk)
+        if self.progress is not None:
+            self.progress(self.n_bytes, self.total)
+
+    def finish(self):
+        """
+        Raises
+        ------
+        FileHashError
+            If the content does not match filehash. The temporary file is
+            left for abort() to remove.
+        """
+        self.file.close()
+        if self.filehash is not None and self.sha1.hexdigest() != self.filehash.lower():
+            raise FileHashError('Downloaded content has filehash %s, expected %s'
+                                % (self.sha1.hexdigest(), self.filehash))
+        os.replace(self.temp_path, self.dest)
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+def get_download_path(dest, headers, url):
+    """
+    Returns dest, or if dest is a directory the path of the file in it with
+    the name from the Content-Disposition of the response (or from the url).
+    """
+    if os.path.isdir(dest):
+        dest = os.path.join(dest, _get_file_name(headers, url))
+    return dest
+
+
+def get_content_length(headers):
+    content_length = headers.get('Content-Length')
+    return None if content_length is None else int(content_length)
+
+
+def _get_file_name(headers, url):
+    disposition = headers.get('Content-Disposition', '')
+    match = re.search(r'filename="?([^";]+)"?', disposition)
+    if match is None:
+        return str(url).rstrip('/').split('/')[-1].split('?')[0]
+    # The name comes from the server, don't allow it to leave the directory
+    return os.path.basename(match.group(1))
@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+"""
+This module handles sending HTTP requests for the API. It sits below
+API.make_get_request (and the other make_*_request methods) and is
+responsible for:
+
+    1) Retrying failed requests (connection errors and statuses such as 503)
+       with exponential backoff and jitter
+    2) Honoring the 'Retry-After' header sent with 429 (too many requests)
+       and 503 responses
+    3) Limiting the rate at which requests are sent, using a token bucket
+       which can be shared between API instances and threads
+
+General Usage
+-------------
+from mendeley import API
+from mendeley.transport import Transport, RetryPolicy, TokenBucket
+
+# Default behavior
+m = API()
+
+# At most 5 requests per second, shared between two users
+limiter = TokenBucket(rate=5, capacity=5)
+m1 = API(transport=Transport(rate_limiter=limiter))
+m2 = API(user_name='testing', transport=Transport(rate_limiter=limiter))
+
+# No retries
+m = API(transport=Transport(retry_policy=RetryPolicy(max_retries=0)))
+
+"""
+
+#Standard Library
+import email.utils
+import random
+import threading
+import time
+
+#Third party
+import requests
+
+#Local Imports
+from . import utils
+
+
+class RetryPolicy(object):
+    """
+    Determines which failed requests are retried and how long to wait before
+    doing so.
+
+    The wait before retry i (starting at 0) is:
+        min(max_backoff, backoff_factor * 2**i)
+    If jitter is enabled, a random value between 0 and that value is used
+    instead ("full jitter"), so that clients that fail together don't retry
+    together.
+
+    A 'Retry-After' header on the response takes precedence over the computed
+    wait, up to max_retry_after.
+
+    Attributes
+    ----------
+    max_retries : int
+    backoff_factor : float
+        Seconds.
+    max_backoff : float
+        Seconds.
+    jitter : bool
+    status_codes : set
+        Response statuses that cause a retry.
+    methods : set
+        Methods that are retried on connection errors or any of status_codes.
+        Other methods (i.e. non-idempotent ones like POST) are only retried on
+        a 429, as the request was rejected without being processed.
+    max_retry_after : float
+        Seconds. Requests with a longer 'Retry-After' value are not retried.
+
+    """
+
+    def __init__(self, max_retries=5, backoff_factor=0.5, max_backoff=60,
+                 jitter=True, status_codes=(429, 500, 502, 503, 504),
+                 methods=('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'),
+                 max_retry_after=300):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.status_codes = set(status_codes)
+        self.methods = set(methods)
+        self.max_retry_after = max_retry_after
+
+    def should_retry(self, method, attempt, status_code=None):
+        """
+        Parameters
+        ----------
+        method : string
+        attempt : int
+            Number of retries already made.
+        status_code : int or None
+            None indicates the request failed without a response (e.g. a
+            connection error).
+        """
+        if attempt >= self.max_retries:
+            return False
+
+        if status_code == 429:
+            return True
+        elif method.upper() not in self.methods:
+            return False
+        elif status_code is None:
+            return True
+        else:
+            return status_code in self.status_codes
+
+    def get_wait(self, attempt, retry_after=None):
+        """
+        Returns the number of seconds to wait before the next retry, or None
+        if the server asked for a wait longer than max_retry_after.
+        """
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                return None
+            return retry_after
+
+        wait = min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+        if self.jitter:
+            wait = random.uniform(0, wait)
+        return wait
+
+    def __repr__(self):
+        pv = ['max_retries', self.max_retries,
+              'backoff_factor', self.backoff_factor,
+              'max_backoff', self.max_backoff,
+              'jitter', self.jitter,
+              'status_codes', sorted(self.status_codes),
+              'methods', sorted(self.methods),
+              'max_retry_after', self.max_retry_after]
+        return utils.property_values_to_string(pv)
+
+
+class TokenBucket(object):
+    """
+    Thread safe token bucket rate limiter.
+
+    Tokens are added at 'rate' per second up to 'capacity'. Each request
+    takes a token, so bursts of up to 'capacity' requests are allowed after
+    which requests are limited to 'rate' per second. A bucket can also limit
+    bandwidth, with a token per byte, see transfer.save_response.
+
+    When the server asks us to back off (429 with 'Retry-After') the bucket
+    is paused, so that other threads sharing the bucket wait as well rather
+    than continuing to trip the server's limit.
+
+    Attributes
+    ----------
+    rate : float
+        Tokens per second.
+    capacity : float
+
+    """
+
+    def __init__(self, rate=10, capacity=None):
+        self.rate = float(rate)
+        if capacity is None:
+            capacity = rate
+        self.capacity = float(capacity)
+
+        self.tokens = self.capacity
+        self.paused_until = 0
+        self.last_time = time.time()
+        self.lock = threading.Lock()
+
+    def reserve(self, n=1):
+        """
+        Takes n tokens and returns how long (in seconds) the caller needs to
+        wait before using them. This does not block, which allows the wait to
+        be done with time.sleep or asyncio.sleep as appropriate.
+        """
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.last_time) * self.rate)
+            self.last_time = now
+            self.tokens -= n
+
+            wait = max(0, self.paused_until - now)
+            if self.tokens < 0:
+                wait = max(wait, -self.tokens / self.rate)
+            return wait
+
+    def acquire(self, n=1):
+        """
+        Blocks until a request can be made (n tokens are available).
+        """
+        wait = self.reserve(n)
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        Prevents requests from being made for the given number of seconds.
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.time() + seconds)
+
+    def __repr__(self):
+        pv = ['rate', self.rate,
+              'capacity', self.capacity,
+              'tokens', '%0.2f' % self.tokens]
+        return utils.property_values_to_string(pv)
+
+
+class Transport(object):
+    """
+    Sends requests using a requests.Session, retrying and rate limiting them
+    as necessary.
+
+    Attributes
+    ----------
+    session : requests.Session
+        Connections are reused across requests and threads. A session
+        created here keeps up to pool_size connections open, see
+        DEFAULT_POOL_SIZE.
+    retry_policy : RetryPolicy
+    rate_limiter : TokenBucket or None
+        If None requests are not rate limited (other than by the server).
+    n_retries : int
+        The total number of retries made by this transport.
+    n_requests : int
+        The total number of requests sent, including retries.
+    n_bytes : int
+        The total size of the response bodies, as given by their
+        Content-Length. For responses without a Content-Length only bodies
+        that have already been read (i.e. not streamed) are counted.
+
+    """
+
+    # Connections kept open to each host. This should be at least the number
+    # of threads making requests at the same time (e.g. max_workers of
+    # Documents.create_many), otherwise connections are closed after use
+    # rather than reused.
+    DEFAULT_POOL_SIZE = 16
+
+    def __init__(self, session=None, retry_policy=None, rate_limiter=None, pool_size=None):
+        if session is None:
+            if pool_size is None:
+                pool_size = self.DEFAULT_POOL_SIZE
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+
+        self.session = session
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
+        self.n_retries = 0
+        self.n_requests = 0
+        self.n_bytes = 0
+        # The counts are updated from multiple threads
+        self.lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        """
+        Parameters
+        ----------
+        method : string
+        url : string
+        **kwargs
+            Passed to requests.Session.request
+
+        Returns
+        -------
+        requests.Response
+            The response to the last attempt. This may not be ok if the
+            request could not be retried (any more).
+
+        Raises
+        ------
+        requests.RequestException
+            If the last attempt failed without a response.
+        """
+        policy = self.retry_policy
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            try:
+                r = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self._count(0)
+                if not policy.should_retry(method, attempt) or not _rewind_body(kwargs):
+                    raise
+                wait = policy.get_wait(attempt)
+            else:
+                self._count(_get_body_size(r, kwargs.get('stream')))
+                if r.ok or not policy.should_retry(method, attempt, r.status_code):
+                    return r
+
+                retry_after = get_retry_after(r.headers)
+                wait = policy.get_wait(attempt, retry_after)
+                # A streamed body (e.g. an upload from an iterator) can't be
+                # sent again
+                if wait is None or not _rewind_body(kwargs):
+                    return r
+
+                if r.status_code == 429 and retry_after is not None and \
+                        self.rate_limiter is not None:
+                    self.rate_limiter.pause(retry_after)
+
+                # Releases the connection (of a streamed response) back to
+                # the pool before waiting
+                r.close()
+
+            attempt += 1
+            with self.lock:
+                self.n_retries += 1
+            time.sleep(wait)
+
+    def _count(self, n_bytes):
+        with self.lock:
+            self.n_requests += 1
+            self.n_bytes += n_bytes
+
+    def get_counts(self):
+        """
+        Returns (n_requests, n_retries, n_bytes)
+        """
+        with self.lock:
+            return self.n_requests, self.n_retries, self.n_bytes
+
+    def __repr__(self):
+        pv = ['session', self.session,
+              'retry_policy', self.retry_policy,
+              'rate_limiter', self.rate_limiter,
+              'n_retries', self.n_retries,
+              'n_requests', self.n_requests,
+              'n_bytes', self.n_bytes]
+        return utils.property_values_to_string(pv)
+
+
+def _get_body_size(r, stream):
+    content_length = r.headers.get('Content-Length')
+    if content_length is not None:
+        try:
+            return int(content_length)
+        except ValueError:
+            pass
+    if stream:
+        return 0
+    content = r.content
+    return 0 if content is None else len(content)
+
+
+def get_retry_after(headers):
+    """
+    Returns the number of seconds specified by a 'Retry-After' header, or
+    None if the header is missing or invalid.
+
+    The header is either a number of seconds or an HTTP date.
+    """
+    value = headers.get('Retry-After')
+    if value is None:
+        return None
+
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+
+    date = email.utils.parsedate_tz(value)
+    if date is None:
+        return None
+    return max(0, email.utils.mktime_tz(date) - time.time())
+
+
+def _rewind_body(kwargs):
+    """
+    Files that were (partially) read by a failed request need to be sent
+    from the start again. Returns False if the body can't be rewound.
+    """
+    files = kwargs.get('files')
+    if files:
+        for value in files.values():
+            if isinstance(value, tuple):
+                value = value[1]
+            if hasattr(value, 'seek'):
+                value.seek(0)
+
+    data = kwargs.get('data')
+    if data is None or isinstance(data, (bytes, str, dict, list, tuple)):
+        return True
+    if hasattr(data, 'seek'):
+        data.seek(0)
+        return True
+    return False
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Tests AsyncAPI against the local mock of the Mendeley API. No requests are
+made to api.mendeley.com, although a user_config.py is still needed to
+import the package.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.append('..')
+from mendeley import utils
+from mendeley.errors import FileHashError
+from mendeley.mock_server import MockServer
+
+
+def test_pagination():
+    with MockServer(n_documents=120) as server:
+
+        async def run():
+            async with server.get_async_api() as m:
+                doc_set = await m.documents.get(limit=50, view='all')
+                assert len(doc_set.docs) == 50
+                ids = [doc.id async for doc in doc_set]
+                assert ids == sorted(server.documents, key=lambda x: server.documents[x]['created'])
+
+                doc_set = await m.documents.get(limit=50)
+                sizes = [len(page.docs) async for page in doc_set.iter_pages(prefetch=1)]
+                assert sizes == [50, 50, 20]
+
+                doc_set = await m.documents.get(limit=50)
+                n_docs = 0
+                async for json in doc_set.iter_json(prefetch=2):
+                    n_docs += 1
+                assert n_docs == 120
+
+        asyncio.run(run())
+
+
+def test_documents():
+    with MockServer(n_documents=10) as server:
+
+        async def run():
+            async with server.get_async_api() as m:
+                # Several requests in flight at once
+                doc_sets = await asyncio.gather(*[m.documents.get(limit=5) for i in range(4)])
+                assert [len(x.docs) for x in doc_sets] == [5] * 4
+
+                doc = await m.documents.create({'title': 'New', 'type': 'journal',
+                                                '_return_type': 'json'})
+                assert server.documents[doc['id']]['title'] == 'New'
+
+                doc = await m.documents.update(doc['id'], {'title': 'Updated',
+                                                           '_return_type': 'json'})
+                assert doc['title'] == 'Updated'
+
+                await m.documents.move_to_trash(doc['id'])
+                assert doc['id'] in server.trash
+                trash_set = await m.trash.get()
+                assert [x.id for x in trash_set.docs] == [doc['id']]
+
+        asyncio.run(run())
+
+
+def test_files():
+    with MockServer(n_documents=1) as server:
+        doc_id = list(server.documents)[0]
+        content = os.urandom(300 * 1024)
+        temp_dir = tempfile.mkdtemp()
+        file_path = os.path.join(temp_dir, 'upload.pdf')
+        with open(file_path, 'wb') as f:
+            f.write(content)
+
+        async def run():
+            async with server.get_async_api() as m:
+                progress = []
+                f = await m.files.upload(doc_id, file_path, 'paper.pdf',
+                                         progress=lambda done, total: progress.append((done, total)))
+                assert progress[-1] == (len(content), len(content))
+                assert server.files[f.file_id]['content'] == content
+
+                chunks = (content[i:i + 1000] for i in range(0, len(content), 1000))
+                f2 = await m.files.upload(doc_id, chunks, 'paper2.pdf')
+                assert f2.filehash == f.filehash
+
+                with open(file_path, 'rb') as fh:
+                    f3 = await m.files.link_file({'file': fh}, {'id': doc_id, 'title': 'linked'})
+                assert server.files[f3.file_id]['content'] == content
+
+                # Listing, following the pages
+                n_requests = server.request_counts.get(('GET', 'files'), 0)
+                files = await m.files.get(limit=2)
+                assert sorted(x.file_id for x in files) == sorted(server.files)
+                assert server.request_counts[('GET', 'files')] == n_requests + 2
+                files = await m.files.get(document_id=doc_id, _return_type='json')
+                assert len(files) == 3
+                file_id = await m.files.get_single(document_id=doc_id)
+                assert file_id == files[0]['id']
+
+                path = await m.files.download(f, temp_dir)
+                assert path == os.path.join(temp_dir, 'paper.pdf')
+                with open(path, 'rb') as fh:
+                    assert fh.read() == content
+                headers = server.last_headers[('GET', 'files')]
+                assert headers['Development-Token'] == utils.dev_token
+
+                dest = os.path.join(temp_dir, 'bad.pdf')
+                try:
+                    await m.files.download(f.file_id, dest, filehash='0' * 40)
+                    assert False
+                except FileHashError:
+                    pass
+                assert not os.path.exists(dest)
+
+            async with server.get_async_api() as m:
+                # A failed upload is sent again
+                server.fail_next(1, 429, retry_after=0)
+                f4 = await m.files.upload(doc_id, content, 'paper4.pdf')
+                assert server.files[f4.file_id]['content'] == content
+
+        asyncio.run(run())
+        assert sorted(os.listdir(temp_dir)) == ['paper.pdf', 'upload.pdf']
+
+
+def test_bulk():
+    with MockServer(n_documents=5) as server:
+
+        async def run():
+            async with server.get_async_api() as m:
+                docs_data = [{'title': 'New %d' % i, 'type': 'journal'} for i in range(10)]
+                # Not retried, the other documents are still created
+                server.fail_next(1, status=400)
+                results = await m.documents.create_many(docs_data, max_workers=4)
+                assert [x.data for x in results] == docs_data
+                assert sum(1 for x in results if not x.ok) == 1
+                assert len(server.documents) == 14
+                doc = [x.value for x in results if x.ok][0]
+                assert server.documents[doc.id]['title'] == doc.title
+
+                updates = [(x.value.id, {'title': 'Updated'}) for x in results if x.ok]
+                results = await m.documents.update_many(updates, return_json=True)
+                assert all(x.ok and x.value['title'] == 'Updated' for x in results)
+                assert server.documents[updates[0][0]]['title'] == 'Updated'
+
+                assert await m.documents.create_many([]) == []
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    print('Running "Async API" tests')
+    test_pagination()
+    test_documents()
+    test_files()
+    test_bulk()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Tests the bulk attachment of files against the local mock of the Mendeley
+API. URLs are served from a temporary folder by a local HTTP server.
+"""
+
+import functools
+import http.server
+import os
+import sys
+import tempfile
+import threading
+
+import requests
+
+sys.path.append('..')
+from mendeley.client.attach import AttachmentPipeline
+from mendeley.mock_server import MockServer
+
+
+def _write_files(contents):
+    temp_dir = tempfile.mkdtemp()
+    for i, content in enumerate(contents):
+        with open(os.path.join(temp_dir, '%d.pdf' % i), 'wb') as f:
+            f.write(content)
+    return temp_dir
+
+
+def _serve(temp_dir):
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=temp_dir)
+    handler.log_message = lambda *args: None
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return httpd, 'http://127.0.0.1:%d/' % httpd.server_address[1]
+
+
+def test_attach():
+    contents = [os.urandom(50000) for i in range(3)]
+    temp_dir = _write_files(contents)
+    httpd, base_url = _serve(temp_dir)
+
+    try:
+        with MockServer(n_documents=3) as server:
+            m = server.get_api()
+            doc_ids = sorted(server.documents)
+            items = [(doc_ids[0], os.path.join(temp_dir, '0.pdf')),
+                     (doc_ids[1], base_url + '1.pdf'),
+                     (doc_ids[2], base_url + '1.pdf'),
+                     # Same content as the first item
+                     (doc_ids[0], base_url + '0.pdf'),
+                     (doc_ids[2], base_url + 'missing.pdf')]
+
+            manifest_path = os.path.join(temp_dir, 'manifest.jsonl')
+            pipeline = AttachmentPipeline(m, manifest_path=manifest_path, max_downloads=2,
+                                          max_uploads=2, retry_wait=0,
+                                          resolve_links=False)
+            results = pipeline.run(items)
+            assert [x.status for x in results[1:3]] == ['attached', 'attached']
+            # Either of the two items may be uploaded first
+            assert sorted([results[0].status, results[3].status]) == ['attached', 'duplicate']
+            assert results[4].status == 'failed'
+            assert results[4].n_attempts == 3
+            assert len(server.files) == 3
+            assert server.files[results[2].file_id]['content'] == contents[1]
+
+            # Only the failed item is processed again
+            with open(os.path.join(temp_dir, 'missing.pdf'), 'wb') as f:
+                f.write(contents[2])
+            results = pipeline.run(items)
+            assert [x.resumed for x in results] == [True, True, True, True, False]
+            assert results[4].status == 'attached'
+            assert len(server.files) == 4
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_concurrent_runs():
+    contents = [os.urandom(50000) for i in range(8)]
+    temp_dir = _write_files(contents)
+    httpd, base_url = _serve(temp_dir)
+
+    try:
+        with MockServer(n_documents=8) as server:
+            doc_ids = sorted(server.documents)
+            pipeline = AttachmentPipeline(server.get_api(), max_downloads=2, max_uploads=2,
+                                          retry_wait=0, resolve_links=False)
+            runs = [[(doc_ids[i], base_url + '%d.pdf' % i) for i in range(j, 8, 2)]
+                    for j in range(2)]
+            results = [None, None]
+
+            def run(j):
+                results[j] = pipeline.run(runs[j])
+
+            threads = [threading.Thread(target=run, args=(j,)) for j in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            for j in range(2):
+                assert [(x.status, x.n_attempts) for x in results[j]] == [('attached', 1)] * 4
+            assert len(server.files) == 8
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_ambiguous_upload():
+    content = os.urandom(50000)
+    file_path = os.path.join(_write_files([content]), '0.pdf')
+
+    with MockServer(n_documents=1) as server:
+        m = server.get_api()
+        doc_id = list(server.documents)[0]
+
+        # The first upload is stored, but no response is received
+        upload = m.files.upload
+        uploaded = []
+
+        def flaky_upload(*args, **kwargs):
+            uploaded.append(upload(*args, **kwargs))
+            if len(uploaded) == 1:
+                raise requests.exceptions.ReadTimeout('Timed out')
+            return uploaded[-1]
+
+        m.files.upload = flaky_upload
+        pipeline = AttachmentPipeline(m, retry_wait=0, resolve_links=False)
+        result = pipeline.run([(doc_id, file_path)])[0]
+        assert result.status == 'attached' and result.n_attempts == 2
+        # Found by listing the document's files rather than uploaded again
+        assert len(uploaded) == 1
+        assert list(server.files) == [result.file_id]
+
+
+if __name__ == '__main__':
+    print('Running "Attach" tests')
+    test_attach()
+    test_concurrent_runs()
+    test_ambiguous_upload()
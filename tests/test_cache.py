@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Tests the cache used for responses from the API. These tests do not make any
+requests.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append('..')
+from mendeley.cache import TTLCache
+
+
+def test_lru():
+    c = TTLCache(max_size=2)
+    c.set('a', 1)
+    c.set('b', 2)
+    assert c.get('a') == 1
+    # 'b' is the least recently used
+    c.set('c', 3)
+    assert 'b' not in c
+    assert c.get('a') == 1 and c.get('c') == 3
+    assert c.get('b', 'missing') == 'missing'
+
+
+def test_ttl():
+    c = TTLCache(ttl=0.05)
+    c.set('a', [1, 2])
+    assert c.get('a') == [1, 2]
+    time.sleep(0.1)
+    assert c.get('a') is None
+    assert len(c) == 0
+
+
+def test_file():
+    file_path = os.path.join(tempfile.mkdtemp(), 'cache.sqlite')
+    c = TTLCache(max_size=1, file_path=file_path)
+    c.set('a', {'title': 'A'})
+    c.set('b', [])
+    # 'a' is no longer in memory but is read from the file
+    assert len(c) == 1
+    assert c.get('a') == {'title': 'A'}
+    c.close()
+
+    c = TTLCache(file_path=file_path)
+    assert c.get('b') == []
+    c.remove('b')
+    assert 'b' not in c
+    c.close()
+
+
+if __name__ == '__main__':
+    print('Running "Cache" tests')
+    test_lru()
+    test_ttl()
+    test_file()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Tests the on disk storage used by the client library. These tests do not
+make any requests.
+"""
+
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.append('..')
+from mendeley.client.store import LibraryStore
+
+
+def _doc(doc_id, last_modified='2016-01-01T00:00:00.000Z'):
+    return {'id': doc_id,
+            'created': '2015-01-01T00:00:00.000Z',
+            'last_modified': last_modified,
+            'title': 'Title %s' % doc_id}
+
+
+def test_store():
+    file_path = os.path.join(tempfile.mkdtemp(), 'library.sqlite')
+
+    store = LibraryStore(file_path, 2)
+    assert store.is_empty
+
+    store.replace_all([_doc('a'), _doc('b'), _doc('c')])
+    assert len(store) == 3
+
+    store.update([_doc('b', '2016-02-01T00:00:00.000Z'), _doc('d')], ['a', 'missing'])
+    assert sorted(store.get_ids()) == ['b', 'c', 'd']
+    assert store.get_json('b')['last_modified'] == '2016-02-01T00:00:00.000Z'
+    assert store.get_json('a') is None
+    assert store.get_newest_modified() == '2016-02-01T00:00:00.000Z'
+
+    # Values can be written along with documents
+    store.update([_doc('e')], values={'cursor': {'url': 'next'}})
+    assert 'e' in store
+    store.update(removed_ids=['e'])
+    store.close()
+
+    # Reopening with the same version keeps the contents
+    store = LibraryStore(file_path, 2)
+    assert len(store) == 3
+    assert store.get_value('cursor') == {'url': 'next'}
+    store.close()
+
+    # A different version discards them
+    store = LibraryStore(file_path, 3)
+    assert store.is_empty
+    assert store.get_value('cursor') is None
+    store.close()
+
+    print('Finished running "Client Store" tests')
+
+
+def _data_frame(docs):
+    return pd.DataFrame({'created': pd.to_datetime([x['created'][:-1] for x in docs]),
+                         'title': [x['title'] for x in docs]},
+                        index=pd.Index([x['id'] for x in docs], name='id'))
+
+
+def test_data_frame_cache():
+    file_path = os.path.join(tempfile.mkdtemp(), 'library.sqlite')
+    store = LibraryStore(file_path, 2)
+    docs = [_doc('a'), _doc('b'), _doc('c')]
+    store.replace_all(docs)
+    assert store.load_data_frame(1) is None
+
+    df = _data_frame(docs)
+    store.save_data_frame(df, 1)
+    assert store.load_data_frame(1).equals(df)
+    # Parsed by a different version of the code
+    assert store.load_data_frame(2) is None
+
+    # Changed rows are written along with the documents
+    new_docs = [dict(_doc('b'), title='New title'), _doc('d')]
+    store.update(new_docs, ['a'], data_frame=_data_frame(new_docs))
+    df = store.load_data_frame(1)
+    assert df.index.tolist() == ['c', 'b', 'd']
+    assert df.loc['b', 'title'] == 'New title'
+    assert df.loc['d', 'created'] == pd.Timestamp('2015-01-01')
+    store.close()
+
+    # Changes without the rows make the cache out of date
+    store = LibraryStore(file_path, 2)
+    assert store.load_data_frame(1) is not None
+    store.update([_doc('e')])
+    assert store.load_data_frame(1) is None
+    store.update([_doc('f')], data_frame=_data_frame([_doc('f')]))
+    assert store.load_data_frame(1) is None
+    store.close()
+
+
+if __name__ == '__main__':
+    print('Running "Client Store" tests')
+    test_store()
+    test_data_frame_cache()
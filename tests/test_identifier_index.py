@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Tests lookup of documents by identifier. These tests do not make any
+requests.
+"""
+
+import sys
+
+sys.path.append('..')
+from mendeley import client_library
+from mendeley.client.index import IdentifierIndex
+
+
+def _doc(doc_id, identifiers):
+    return {'id': doc_id,
+            'created': '2015-01-01T00:00:00.000Z',
+            'last_modified': '2016-01-01T00:00:00.000Z',
+            'identifiers': identifiers}
+
+
+def test_identifier_index():
+    raw = [_doc('a', {'doi': '10.1002/BIT.25159', 'pmid': '123'}),
+           _doc('b', {'doi': '10.1002/biot.201400046', 'issn': '1751-7214'}),
+           _doc('c', None)]
+    df = client_library._raw_to_data_frame(raw, include_json=False)
+
+    index = IdentifierIndex.from_data_frame(df)
+    assert len(index) == 2
+
+    # DOIs are case insensitive
+    assert index.get_ids('doi', '10.1002/bit.25159') == ['a']
+    assert index.get_ids('doi', 'https://doi.org/10.1002/BIOT.201400046') == ['b']
+    assert index.get_ids('issn', '17517214') == ['b']
+    assert index.get_first_ids('pmid', ['123', '456', None]) == ['a', None, None]
+
+    # Updating a document replaces its old identifiers
+    index.add('a', {'doi': '10.1/new'})
+    assert index.get_ids('doi', '10.1002/bit.25159') == []
+    assert index.get_ids('pmid', '123') == []
+    assert index.get_ids('doi', '10.1/NEW') == ['a']
+
+    index.remove(['a', 'missing'])
+    assert index.get_ids('doi', '10.1/new') == []
+    assert len(index) == 1
+
+    print('Finished running "Identifier Index" tests')
+
+
+if __name__ == '__main__':
+    print('Running "Identifier Index" tests')
+    test_identifier_index()
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Tests incremental decoding of JSON arrays. These tests do not make any
+requests.
+"""
+
+import json
+import sys
+
+sys.path.append('..')
+from mendeley.json_stream import iter_array
+
+
+def _split(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_iter_array():
+    values = [{'id': 'a', 'title': u'caf\xe9 [1], "quoted"', 'n': 12345},
+              [], {}, 1.5, None, True, 'text', 1000]
+    text = ' \n' + json.dumps(values, indent=1) + '\n'
+
+    # The result must not depend on where the text is split
+    for size in range(1, len(text) + 1):
+        assert list(iter_array(_split(text, size))) == values
+
+    assert list(iter_array(['[]'])) == []
+    assert list(iter_array(['[', ' ', ']'])) == []
+
+    for bad_text in ['', '{}', '[1', '[1,', '[1 2]', '[{"a": }]']:
+        try:
+            list(iter_array(_split(bad_text, 2)))
+            assert False, bad_text
+        except ValueError:
+            pass
+
+
+if __name__ == '__main__':
+    print('Running "JSON Stream" tests')
+    test_iter_array()
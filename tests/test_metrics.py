@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Tests the sync metrics, including those recorded by a sync against the local
+mock of the Mendeley API.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.append('..')
+from mendeley import client_library
+from mendeley.client import metrics
+from mendeley.client.store import LibraryStore
+from mendeley.mock_server import MockServer
+
+
+def test_sync_metrics():
+    file_path = os.path.join(tempfile.mkdtemp(), 'library.sqlite')
+    store = LibraryStore(file_path, client_library.UserLibrary.FILE_VERSION)
+    exported = []
+    metrics.add_hook(exported.append)
+    try:
+        with MockServer(n_documents=1200, max_page_size=500) as server:
+            m = server.get_api()
+            sync = client_library.Sync(m, None, store=store)
+            full = sync.metrics
+            assert full.sync_type == 'full'
+            assert full.counters['n_pages'] == 3 + 1  # documents + trash
+            assert full.counters['n_docs_added'] == 1200
+            assert full.counters['n_requests'] >= 4
+            assert full.counters['n_bytes'] > 0
+            assert full.spans['total'] == sync.time_full_retrieval
+            for name in ['retrieval', 'parse', 'trash_retrieval', 'save']:
+                assert name in full.spans
+
+            server.add_documents(3)
+            server.delete_documents(2)
+            sync = client_library.Sync(m, None, store=store)
+            update = sync.metrics
+            assert update.sync_type == 'update'
+            assert update.counters['n_docs_added'] == 3
+            assert update.counters['n_docs_removed'] == 2
+            for name in ['trash_retrieval', 'deleted_check', 'modified_check',
+                         'update_retrieval', 'modified_processing', 'save', 'total']:
+                assert name in update.spans
+
+        assert exported == [full, update]
+    finally:
+        metrics.remove_hook(exported.append)
+        store.close()
+
+
+def test_prometheus_text():
+    m = metrics.SyncMetrics('user "1"', 'update')
+    m.add_span('total', 1.5)
+    m.increment('n_requests', 4)
+
+    text = metrics.to_prometheus_text([m])
+    assert 'mendeley_sync_phase_seconds{user="user \\"1\\"",type="update",phase="total"} 1.500000' in text
+    assert 'mendeley_sync_count{user="user \\"1\\"",type="update",name="n_requests"} 4' in text
+
+    file_path = os.path.join(tempfile.mkdtemp(), 'mendeley.prom')
+    hook = metrics.PrometheusTextfile(file_path)
+    hook(m)
+    with open(file_path) as f:
+        assert f.read() == text
+
+
+if __name__ == '__main__':
+    print('Running "Metrics" tests')
+    test_sync_metrics()
+    test_prometheus_text()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Tests mirroring of attached files against the local mock of the Mendeley
+API. The library file is written to the configured save path and removed
+afterwards.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.append('..')
+from mendeley import client_library
+from mendeley.client.mirror import AttachmentMirror
+from mendeley.mock_server import MockServer
+
+
+def test_mirror():
+    with MockServer(n_documents=5) as server:
+        m = server.get_api(user_name='mirror_test')
+        doc_ids = sorted(server.documents)
+        contents = [os.urandom(100000), os.urandom(1000)]
+        m.files.upload(doc_ids[0], contents[0], 'a.pdf')
+        m.files.upload(doc_ids[1], contents[0], 'b.pdf')
+        m.files.upload(doc_ids[2], contents[1], 'c.pdf')
+
+        lib = client_library.UserLibrary(api=m)
+        try:
+            mirror = AttachmentMirror(lib, root_path=tempfile.mkdtemp(),
+                                      bytes_per_second=10000000)
+            # The same content is only downloaded once
+            assert mirror.sync() == {'n_files': 3, 'n_downloaded': 2, 'n_linked': 0,
+                                     'n_removed': 0, 'n_failed': 0}
+            paths = mirror.get_paths(doc_ids[2])
+            with open(paths[0], 'rb') as f:
+                assert f.read() == contents[1]
+            assert mirror.get_paths(doc_ids[0]) == mirror.get_paths(doc_ids[1])
+
+            # Incremental, including when the index is loaded again
+            mirror = AttachmentMirror(lib, root_path=mirror.root_path)
+            assert mirror.sync()['n_downloaded'] == 0
+            n_requests = server.request_counts[('GET', 'files')]
+
+            server.trash_documents(doc_ids=[doc_ids[2]])
+            server.delete_documents(doc_ids=[doc_ids[0]])
+            lib.sync()
+            assert mirror.sync() == {'n_files': 1, 'n_downloaded': 0, 'n_linked': 0,
+                                     'n_removed': 2, 'n_failed': 0}
+            assert not os.path.exists(paths[0])
+            assert os.path.exists(mirror.get_paths(doc_ids[1])[0])
+            # Only the listing was requested
+            assert server.request_counts[('GET', 'files')] == n_requests + 1
+
+            # A file listed without a hash is skipped, the others are still
+            # stored
+            f = m.files.upload(doc_ids[3], contents[1], 'd.pdf')
+            m.files.upload(doc_ids[4], contents[0], 'e.pdf')
+            server.files[f.file_id]['json']['filehash'] = None
+            lib.sync()
+            assert mirror.sync() == {'n_files': 2, 'n_downloaded': 0, 'n_linked': 1,
+                                     'n_removed': 0, 'n_failed': 1}
+            assert list(mirror.errors) == [f.file_id]
+            assert os.path.exists(mirror.get_paths(doc_ids[4])[0])
+            assert os.path.exists(mirror.index_path)
+        finally:
+            lib.store.close()
+            if os.path.isfile(lib.file_path):
+                os.remove(lib.file_path)
+
+
+if __name__ == '__main__':
+    print('Running "Mirror" tests')
+    test_mirror()
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Tests the API and syncing of the client library against the local mock of
+the Mendeley API. No requests are made to api.mendeley.com, although a
+user_config.py is still needed to import the package.
+"""
+
+import datetime
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import pytz
+
+sys.path.append('..')
+from mendeley import client_library
+from mendeley import utils
+from mendeley.cache import ResponseCache
+from mendeley.client.store import LibraryStore
+from mendeley.errors import CallFailedException, FileHashError
+from mendeley.mock_server import MockServer
+from mendeley.transport import RetryPolicy, Transport
+
+
+def test_documents():
+    with MockServer(n_documents=120) as server:
+        m = server.get_api()
+        doc_set = m.documents.get(limit=50, view='all')
+        assert len(doc_set.docs) == 50
+        assert len(list(doc_set)) == 120
+        assert server.request_counts[('GET', 'documents')] == 3
+
+        ids = server.modify_documents(2)
+        doc_set = m.documents.get(modified_since=server.documents[ids[0]]['last_modified'])
+        assert [x.id for x in doc_set.docs] == ids[1:]
+
+
+def test_retry():
+    with MockServer(n_documents=10) as server:
+        policy = RetryPolicy(backoff_factor=0.01)
+        m = server.get_api(transport=Transport(retry_policy=policy))
+        server.fail_next(2, status=503)
+        assert len(m.documents.get().docs) == 10
+        assert m.transport.n_retries == 2
+
+
+def test_sync():
+    file_path = os.path.join(tempfile.mkdtemp(), 'library.sqlite')
+    store = LibraryStore(file_path, client_library.UserLibrary.FILE_VERSION)
+
+    with MockServer(n_documents=1200) as server:
+        m = server.get_api()
+        sync = client_library.Sync(m, None, store=store)
+        assert len(sync.docs) == 1200
+
+        modified_ids = server.modify_documents(3)
+        new_ids = server.add_documents(2)
+        trashed_ids = server.trash_documents(2)
+        deleted_ids = server.delete_documents(1)
+
+        sync = client_library.Sync(m, None, store=store)
+        assert len(sync.docs) == 1200 + 2 - 2 - 1
+        assert sorted(sync.trash_ids) == sorted(trashed_ids)
+        assert sync.deleted_ids == deleted_ids
+        for doc_id in modified_ids + new_ids:
+            if doc_id not in trashed_ids + deleted_ids:
+                assert doc_id in sync.docs.index
+
+        # Changes spanning several pages
+        modified_ids = server.modify_documents(30)
+        sync = client_library.Sync(m, None, store=store)
+        assert sorted(x.id for x in sync.new_and_updated_docs) == sorted(modified_ids)
+
+    store.close()
+
+
+def test_restore_from_trash():
+    file_path = os.path.join(tempfile.mkdtemp(), 'library.sqlite')
+    store = LibraryStore(file_path, client_library.UserLibrary.FILE_VERSION)
+
+    with MockServer(n_documents=30) as server:
+        m = server.get_api()
+        client_library.Sync(m, None, store=store)
+
+        doc_id = server.trash_documents(1)[0]
+        sync = client_library.Sync(m, None, store=store)
+        assert sync.trash_ids == [doc_id]
+        assert doc_id not in sync.docs.index and doc_id not in store
+
+        server.restore_documents([doc_id])
+        sync = client_library.Sync(m, None, store=store)
+        assert sync.restored_ids == [doc_id]
+        assert doc_id in sync.docs.index and doc_id in store
+        assert len(sync.docs) == 30
+
+        # It is not removed again by the next sync
+        sync = client_library.Sync(m, None, store=store)
+        assert sync.trash_ids == [] and sync.restored_ids == []
+        assert doc_id in sync.docs.index
+
+    store.close()
+
+
+def test_resume_full_sync():
+    file_path = os.path.join(tempfile.mkdtemp(), 'library.sqlite')
+    store = LibraryStore(file_path, client_library.UserLibrary.FILE_VERSION)
+
+    with MockServer(n_documents=2300) as server:
+        m = server.get_api(transport=Transport(retry_policy=RetryPolicy(max_retries=0)))
+
+        # The request for the third page fails
+        server.fail_next(1, status=503, skip=2)
+        try:
+            client_library.Sync(m, None, store=store)
+            assert False
+        except CallFailedException:
+            pass
+        assert len(store) == 1000
+        assert store.get_value(client_library.Sync.FULL_SYNC_CURSOR_KEY) is not None
+
+        # Only the remaining pages are requested
+        n_requests = server.request_counts[('GET', 'documents')]
+        sync = client_library.Sync(m, None, store=store)
+        assert sync.resumed_full_sync
+        assert server.request_counts[('GET', 'documents')] == n_requests + 3
+        assert len(sync.docs) == 2300 and sync.docs.index.is_unique
+        assert store.get_value(client_library.Sync.FULL_SYNC_CURSOR_KEY) is None
+
+    store.close()
+
+
+def test_catalog_many():
+    with MockServer(n_documents=20) as server:
+        m = server.get_api()
+        dois = [server.documents[doc_id]['identifiers']['doi']
+                for doc_id in sorted(server.documents)[:5]]
+        # Duplicates (after normalization) are only requested once
+        values = dois + [dois[0].lower(), 'https://doi.org/' + dois[1], '10.1000/missing']
+        results = m.catalog_many(dois=values)
+        assert len(results) == len(values)
+        assert [len(x) for x in results] == [1] * 7 + [0]
+        assert results[5][0].title == results[0][0].title
+        assert server.request_counts[('GET', 'catalog')] == 6
+
+        # Cached, including the missing DOI
+        assert m.catalog_many(dois=values, return_json=True)[-1] == []
+        assert server.request_counts[('GET', 'catalog')] == 6
+
+
+def test_response_cache():
+    with MockServer(n_documents=10) as server:
+        response_cache = ResponseCache(policies={'/subject_areas': 0,
+                                                 '/document_types': 3600})
+        m = server.get_api(response_cache=response_cache)
+        first = m.definitions.subject_areas()
+        # Revalidated on every call, the server responds with 304
+        assert m.definitions.subject_areas() == first
+        assert response_cache.n_revalidated == 1
+        assert server.request_counts[('GET', 'subject_areas')] == 2
+
+        m.definitions.document_types()
+        m.definitions.document_types()
+        assert response_cache.n_fresh == 1
+        assert server.request_counts[('GET', 'document_types')] == 1
+
+        # Not in the policies
+        m.definitions.academic_statuses()
+        m.definitions.academic_statuses()
+        assert server.request_counts[('GET', 'academic_statuses')] == 2
+
+
+def test_token_renewal():
+    with MockServer(n_documents=10) as server:
+        m = server.get_api()
+        token = m.access_token
+        old_access_token = token.access_token
+        n_token_requests = server.request_counts[('POST', 'oauth')]
+
+        # Expiring, requests wait for a single renewal
+        token.expires = datetime.datetime.now(pytz.utc) + datetime.timedelta(seconds=10)
+        threads = [threading.Thread(target=token.get_auth_headers) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert server.request_counts[('POST', 'oauth')] == n_token_requests + 1
+        assert token.access_token != old_access_token
+        assert not token.token_expiring
+
+        # Expiring soon, renewed in the background
+        old_access_token = token.access_token
+        token.expires = datetime.datetime.now(pytz.utc) + datetime.timedelta(minutes=3)
+        assert token.get_auth_headers()['Authorization'] == 'bearer ' + old_access_token
+        for i in range(100):
+            if token.access_token != old_access_token:
+                break
+            time.sleep(0.01)
+        assert server.request_counts[('POST', 'oauth')] == n_token_requests + 2
+        assert len(m.documents.get().docs) == 10
+
+
+def test_file_transfer():
+    with MockServer(n_documents=1) as server:
+        m = server.get_api()
+        doc_id = list(server.documents)[0]
+        content = os.urandom(300 * 1024)
+        temp_dir = tempfile.mkdtemp()
+        file_path = os.path.join(temp_dir, 'upload.pdf')
+        with open(file_path, 'wb') as f:
+            f.write(content)
+
+        progress = []
+        f = m.files.upload(doc_id, file_path, 'paper.pdf',
+                           progress=lambda done, total: progress.append((done, total)))
+        assert progress[-1] == (len(content), len(content))
+        assert server.files[f.file_id]['content'] == content
+
+        # From an iterator, sent using chunked transfer encoding
+        chunks = (content[i:i + 1000] for i in range(0, len(content), 1000))
+        f2 = m.files.upload(doc_id, chunks, 'paper2.pdf')
+        assert f2.filehash == f.filehash
+
+        progress = []
+        path = m.files.download(f, temp_dir,
+                                progress=lambda done, total: progress.append((done, total)))
+        assert path == os.path.join(temp_dir, 'paper.pdf')
+        assert progress[-1] == (len(content), len(content))
+        with open(path, 'rb') as f3:
+            assert f3.read() == content
+        # Sent with the same headers as other GET requests
+        headers = server.last_headers[('GET', 'files')]
+        assert headers['Development-Token'] == utils.dev_token
+
+        dest = os.path.join(temp_dir, 'bad.pdf')
+        try:
+            m.files.download(f.file_id, dest, filehash='0' * 40)
+            assert False
+        except FileHashError:
+            pass
+        assert not os.path.exists(dest)
+        assert sorted(os.listdir(temp_dir)) == ['paper.pdf', 'upload.pdf']
+
+
+def test_create_many():
+    with MockServer(n_documents=20) as server:
+        m = server.get_api(user_name='create_many_test')
+        lib = client_library.UserLibrary(api=m)
+        try:
+            # Changed elsewhere before the documents are created, so older
+            # than the created documents
+            modified_id = server.modify_documents(1)[0]
+
+            docs_data = [{'title': 'New %d' % i, 'type': 'journal',
+                          'identifiers': {'doi': '10.1000/new.%d' % i}} for i in range(10)]
+            # Not retried, the other documents are still created
+            server.fail_next(1, status=400)
+            results = lib.create_documents(docs_data, max_workers=4)
+            assert len(results) == 10
+            assert sum(1 for x in results if not x.ok) == 1
+            assert len(lib.docs) == 29
+            i = [x.ok for x in results].index(True)
+            assert lib.get_document(doi='10.1000/NEW.%d' % i, return_json=True)['title'] == 'New %d' % i
+
+            updates = [(x.value['id'], {'title': 'Updated'}) for x in results if x.ok]
+            results = m.documents.update_many(updates, return_json=True)
+            assert all(x.ok and x.value['title'] == 'Updated' for x in results)
+
+            lib.sync()
+            assert len(lib.docs) == 29 and lib.docs.index.is_unique
+            assert lib.store.get_json(updates[0][0])['title'] == 'Updated'
+            assert lib.docs.loc[modified_id, 'last_modified'] == \
+                client_library.parse_datetime(server.documents[modified_id]['last_modified'])
+        finally:
+            lib.store.close()
+            if os.path.isfile(lib.file_path):
+                os.remove(lib.file_path)
+
+
+def test_write_through():
+    with MockServer(n_documents=20) as server:
+        m = server.get_api(user_name='write_through_test')
+        lib = client_library.UserLibrary(api=m)
+        try:
+            doc_ids = sorted(server.documents)
+            doi = server.documents[doc_ids[0]]['identifiers']['doi']
+            lib.update_document(doc_ids[0], {'title': 'Updated'})
+            lib.move_to_trash(doc_ids[1])
+            new_id = lib.create_documents([{'title': 'New', 'type': 'journal'}])[0].value['id']
+
+            # Available without a sync
+            doc_json = lib.get_document(doi=doi, return_json=True)
+            assert doc_json['title'] == 'Updated'
+            # The update was merged into the 'all' view of the document
+            assert doc_json['read'] is False
+            assert doc_ids[1] not in lib.docs.index
+            assert len(lib.docs) == 20
+            assert lib.records[new_id].title == 'New'
+
+            # Changes made elsewhere are still found, and the documents
+            # written locally are refreshed
+            other_id = server.modify_documents(doc_ids=[doc_ids[2]])[0]
+            lib.sync()
+            counters = lib.sync_result.metrics.counters
+            assert counters['n_docs_updated'] == 3
+            assert counters['n_docs_added'] == 0
+            assert sorted(x['id'] for x in lib.sync_result.new_and_updated_raw) == \
+                sorted([doc_ids[0], new_id, other_id])
+            assert len(lib.docs) == 20 and lib.docs.index.is_unique
+            assert lib.get_document(doi=doi, return_json=True)['title'] == 'Updated'
+            assert 'read' in lib.store.get_json(new_id)
+
+            # Nothing is requested again
+            lib.sync()
+            assert lib.sync_result.new_and_updated_raw == []
+            assert lib.sync_result.metrics.counters['n_docs_unchanged'] == 0
+
+            # Documents that are skipped as unchanged still move the time
+            # from which changes are requested
+            lib.update_document(doc_ids[3], {'title': 'Updated'})
+            lib.store.set_value(client_library.Sync.REFRESH_IDS_KEY, None)
+            lib.sync()
+            assert lib.sync_result.metrics.counters['n_docs_unchanged'] == 1
+            lib.sync()
+            assert lib.sync_result.metrics.counters['n_docs_unchanged'] == 0
+        finally:
+            lib.store.close()
+            if os.path.isfile(lib.file_path):
+                os.remove(lib.file_path)
+
+
+if __name__ == '__main__':
+    print('Running "Mock Server" tests')
+    test_documents()
+    test_retry()
+    test_sync()
+    test_restore_from_trash()
+    test_resume_full_sync()
+    test_catalog_many()
+    test_response_cache()
+    test_token_renewal()
+    test_file_transfer()
+    test_create_many()
+    test_write_through()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Tests the objects built from the JSON returned by the API. These tests do not
+make any requests.
+"""
+
+import sys
+import threading
+import time
+
+sys.path.append('..')
+from mendeley import models
+from mendeley.mock_server import make_document
+
+
+def test_document_attributes():
+    doc = models.BibDocument(make_document(7), None)
+
+    assert doc.title == 'Document 7'
+    # Fields of the parent class and of the subclass
+    assert doc.year == 2007
+    assert doc.issue is None
+
+    try:
+        doc.yeear
+        assert False
+    except AttributeError:
+        pass
+
+    assert [x.last_name for x in doc.authors] == ['Last0', 'Last1', 'Last2']
+    # Object fields are processed once
+    assert doc.authors is doc.authors
+    assert doc.identifiers.doi == '10.1000/J.TEST.7'
+
+    assert 'volume' in dir(doc)
+
+
+class _Page(object):
+    # Stands in for a DocumentSet, counting the pages in memory
+    lock = threading.Lock()
+    n_alive = 0
+    max_alive = 0
+
+    def __init__(self, index, n_pages):
+        self.index = index
+        self.n_pages = n_pages
+        with self.lock:
+            _Page.n_alive += 1
+            _Page.max_alive = max(_Page.max_alive, _Page.n_alive)
+
+    def __del__(self):
+        with self.lock:
+            _Page.n_alive -= 1
+
+    def next_page(self):
+        if self.index + 1 == self.n_pages:
+            return None
+        return _Page(self.index + 1, self.n_pages)
+
+
+def test_page_prefetch():
+    indices = []
+    for page in models._PagePrefetcher(_Page(0, 20), 3):
+        indices.append(page.index)
+        page = None
+        # Slow consumer, so that the background thread gets ahead
+        time.sleep(0.005)
+    assert indices == list(range(20))
+    # The page being processed, plus the prefetched pages
+    assert _Page.max_alive <= 4
+
+
+if __name__ == '__main__':
+    print('Running "Models" tests')
+    test_document_attributes()
+    test_page_prefetch()
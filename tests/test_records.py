@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Tests the compact document records used by the client library. These tests
+do not make any requests.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.append('..')
+from mendeley import models
+from mendeley.client.records import DocumentRecord, LibraryRecords
+from mendeley.client.store import LibraryStore
+from mendeley.mock_server import make_document
+
+
+def test_record():
+    json = make_document(1)
+    r = DocumentRecord(json)
+    assert r.id == json['id']
+    assert r.title == json['title']
+    assert r.doi == json['identifiers']['doi']
+    assert r.authors[0] == (json['authors'][0]['last_name'],
+                            json['authors'][0]['first_name'])
+    assert not hasattr(r, '__dict__')
+
+    r = DocumentRecord({'id': 'a'})
+    assert r.title is None and r.authors is None and r.doi is None
+
+
+def test_library_records():
+    store = LibraryStore(os.path.join(tempfile.mkdtemp(), 'library.sqlite'), 2)
+    store.replace_all([make_document(i) for i in range(3)])
+    records = LibraryRecords(store)
+    assert len(records) == 3
+
+    doc_id = make_document(0)['id']
+    assert doc_id in records
+    doc = records.get_document(doc_id)
+    assert isinstance(doc, models.AllDocument)
+    assert doc.title == records[doc_id].title
+
+    updated = make_document(0)
+    updated['title'] = 'New title'
+    records.update([updated, make_document(3)], [make_document(1)['id']])
+    assert len(records) == 3
+    assert records[doc_id].title == 'New title'
+    assert make_document(1)['id'] not in records
+    store.close()
+
+
+if __name__ == '__main__':
+    print('Running "Records" tests')
+    test_record()
+    test_library_records()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Tests syncing of multiple users by the scheduler, against the local mock of
+the Mendeley API. Library files are written to the configured save path and
+removed afterwards.
+"""
+
+import os
+import sys
+import time
+
+sys.path.append('..')
+from mendeley import client_library
+from mendeley.client.scheduler import SyncScheduler
+from mendeley.mock_server import MockServer
+
+
+def _remove_libraries(scheduler):
+    for state in scheduler.get_states():
+        lib = state.library
+        if lib is None:
+            continue
+        lib.store.close()
+        if os.path.isfile(lib.file_path):
+            os.remove(lib.file_path)
+
+
+def test_run_pending():
+    with MockServer(n_documents=50) as server:
+        scheduler = SyncScheduler(max_workers=2, interval=3600, requests_per_second=1000)
+        try:
+            for i in range(3):
+                scheduler.add_user(api=server.get_api(user_name='scheduler_test_%d' % i),
+                                   priority=i)
+            synced = scheduler.run_pending()
+            # Highest priority first
+            assert [x.user_name for x in synced] == ['scheduler_test_2', 'scheduler_test_1',
+                                                     'scheduler_test_0']
+            for state in scheduler.get_states():
+                assert state.n_syncs == 1 and state.last_sync_type == 'full'
+                assert state.last_changes['n_docs'] == 50
+                assert state.library.api.transport.rate_limiter is scheduler.rate_limiter
+
+            # Nothing is due
+            assert scheduler.run_pending() == []
+
+            server.add_documents(2)
+            scheduler.request_sync('scheduler_test_0')
+            state = scheduler.run_pending()[0]
+            assert state.last_sync_type == 'update'
+            # The newest document from before may be returned again
+            assert state.last_changes['n_new_and_updated'] >= 2
+            assert state.last_changes['n_docs'] == 52
+        finally:
+            _remove_libraries(scheduler)
+
+
+def test_removed_count():
+    with MockServer(n_documents=20) as server:
+        scheduler = SyncScheduler(max_workers=1, interval=3600, requests_per_second=1000)
+        try:
+            scheduler.add_user(api=server.get_api(user_name='scheduler_test_removed'))
+            scheduler.run_pending()
+
+            server.trash_documents(doc_ids=sorted(server.documents)[:3])
+            scheduler.request_sync('scheduler_test_removed')
+            state = scheduler.run_pending()[0]
+            assert state.last_changes['n_removed'] == 3
+
+            # The entire trash is listed again, but nothing has changed
+            interval = client_library.Sync.TRASH_FULL_CHECK_INTERVAL
+            client_library.Sync.TRASH_FULL_CHECK_INTERVAL = -1
+            try:
+                scheduler.request_sync('scheduler_test_removed')
+                state = scheduler.run_pending()[0]
+            finally:
+                client_library.Sync.TRASH_FULL_CHECK_INTERVAL = interval
+            assert len(state.library.sync_result.trash_ids) == 3
+            assert state.last_changes['n_removed'] == 0
+            assert state.last_changes['n_docs'] == 17
+        finally:
+            _remove_libraries(scheduler)
+
+
+def test_background():
+    with MockServer(n_documents=20) as server:
+        scheduler = SyncScheduler(max_workers=2, interval=0.2)
+        try:
+            scheduler.add_user(api=server.get_api(user_name='scheduler_test_bg'))
+            scheduler.start()
+            state = scheduler.get_state('scheduler_test_bg')
+            for i in range(100):
+                if state.n_syncs >= 3:
+                    break
+                time.sleep(0.05)
+            scheduler.stop()
+            assert state.n_syncs >= 3
+            assert state.n_failures == 0
+        finally:
+            _remove_libraries(scheduler)
+
+
+if __name__ == '__main__':
+    print('Running "Scheduler" tests')
+    test_run_pending()
+    test_removed_count()
+    test_background()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Tests retrying and rate limiting of requests. These tests do not make any
+requests, responses come from a fake session.
+"""
+
+import sys
+import time
+
+import requests
+
+sys.path.append('..')
+from mendeley.transport import RetryPolicy, TokenBucket, Transport, get_retry_after
+
+
+class _FakeResponse(requests.Response):
+
+    def __init__(self):
+        super(_FakeResponse, self).__init__()
+        self.is_closed = False
+
+    def close(self):
+        self.is_closed = True
+
+
+class _FakeSession(object):
+
+    def __init__(self, statuses, headers=None):
+        self.statuses = list(statuses)
+        self.headers = headers or {}
+        self.n_requests = 0
+        self.responses = []
+
+    def request(self, method, url, **kwargs):
+        self.n_requests += 1
+        status = self.statuses.pop(0)
+        if status is None:
+            raise requests.ConnectionError('fake connection error')
+        r = _FakeResponse()
+        r.status_code = status
+        r.headers.update(self.headers)
+        self.responses.append(r)
+        return r
+
+
+def _transport(statuses, headers=None, **kwargs):
+    policy = RetryPolicy(backoff_factor=0, **kwargs)
+    return Transport(_FakeSession(statuses, headers), retry_policy=policy)
+
+
+def test_retries():
+    t = _transport([503, None, 200])
+    assert t.request('GET', 'url').status_code == 200
+    assert t.n_retries == 2
+    # Responses of failed attempts are closed, releasing their connections
+    assert [x.is_closed for x in t.session.responses] == [True, False]
+
+    # Not retried
+    t = _transport([404, 200])
+    assert t.request('GET', 'url').status_code == 404
+
+    # POST is only retried when rate limited
+    t = _transport([503, 200])
+    assert t.request('POST', 'url').status_code == 503
+    t = _transport([429, 200])
+    assert t.request('POST', 'url').status_code == 200
+
+    # Retries exhausted
+    t = _transport([503, 503, 503], max_retries=2)
+    assert t.request('GET', 'url').status_code == 503
+    assert t.session.n_requests == 3
+
+    t = _transport([None, None], max_retries=1)
+    try:
+        t.request('GET', 'url')
+        assert False
+    except requests.ConnectionError:
+        pass
+
+
+def test_retry_after():
+    assert get_retry_after({}) is None
+    assert get_retry_after({'Retry-After': '2'}) == 2
+    assert get_retry_after({'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}) == 0
+    assert get_retry_after({'Retry-After': 'soon'}) is None
+
+    # Too long of a wait is not retried
+    t = _transport([429, 200], {'Retry-After': '1000'})
+    assert t.request('GET', 'url').status_code == 429
+
+    limiter = TokenBucket(rate=1000)
+    t = _transport([429, 200], {'Retry-After': '0.1'})
+    t.rate_limiter = limiter
+    t1 = time.time()
+    assert t.request('GET', 'url').status_code == 200
+    assert time.time() - t1 >= 0.1
+    assert limiter.paused_until > 0
+
+
+def test_token_bucket():
+    limiter = TokenBucket(rate=10, capacity=2)
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 0
+    # Third request in a burst waits for a new token
+    wait = limiter.reserve()
+    assert 0.05 < wait <= 0.1
+
+
+if __name__ == '__main__':
+    print('Running "Transport" tests')
+    test_retries()
+    test_retry_after()
+    test_token_bucket()